@@ -1,102 +1,192 @@
 from strands import Agent, tool
-from strands.models.gemini import GeminiModel
-from .llm_model import Model
+from .llm_model import Model, run_validated
+from .agent_pool import AgentPool
+from .llm_cache import get_response_cache, response_cache_key
+from .agent_tracing import TraceHooks
+from .context_encoder import encode
+from .output_checks import parse_hotel, valid_hotel
+from .profile_store import get_profile_store, current_user
+from .prefetch import current_prefetch
+from .itinerary_days import parse_date
 from supabaseClient import supabase_client
+from travel_replica import get_travel_replica, HOTEL_AMENITIES
+from invoice_outbox import get_invoice_outbox
+from planner_writer import get_planner_writer, new_id, idempotency_key
+from reservations import get_reservation_desk, HELD, CONFIRMED
+from approvals import get_approval_queue
+from tracing import span, SampledLogger
 
+from datetime import timedelta
+
+import config
+import asyncio
 import json
-import requests
-import uuid
-import os
-from dotenv import load_dotenv
-load_dotenv()
 
-from rich.traceback import install
 from rich.console import Console
 console = Console()
-install(show_locals=True)
+log = SampledLogger(console)
+
+AMENITY_ALIASES = {
+    "wi-fi": "wifi",
+    "wifi": "wifi",
+    "pool": "swimming_pool",
+    "swimming pool": "swimming_pool",
+    "swimming_pool": "swimming_pool",
+    "restaurant": "restaurant",
+    "parking": "parking",
+    "gym": "gym",
+}
+
+CRITERIA_KEYS = {
+    "city": "city",
+    "rating": "rating",
+    "min_rating": "rating",
+    "max_price_per_night": "max_price_per_night",
+    "max_budget_per_night": "max_price_per_night",
+}
 
 class HotelAgent(Model):
-    def __init__(self, temperature):
-        super().__init__(temperature)
-        self.__import_prompt__()
+    def __init__(self, temperature=None, hitl=True):
+        super().__init__(temperature, agent="hotel")
+        self.__hitl = hitl
+        self.__profiles = get_profile_store()
+        self.__agent_pool = AgentPool(self.__build_agent)
+        self.__replica = get_travel_replica()
+        self.__cache = get_response_cache()
     
-    def __import_prompt__(self):
-        try:
-            with open("./system_prompts/agent-hotel-prompt.txt","r") as f:
-                self.__sys_prompt = f.read()
-
-            with open("./user_profile.json","r") as f:
-                user_profile = json.load(f)
-
-                if 'payment_method' in user_profile:
-                    self.__user_profile = {
-                        'email':user_profile['email'],
-                        'hotel_preferences':user_profile['preferences']['hotel'],
-                        'payment_method':user_profile['payment_method'],
-                    }
-                else:
-                    self.__user_profile = {
-                        'hotel_preferences':user_profile['preferences']['hotel'],
-                    }
-        
-        except Exception as e:
-            console.print(f"[red](agent_hotel.py) | Error importing prompt & user profile:[/red]: {e}")
-            return f"(agent_hotel.py) | Error importing prompt & user profile: {str(e)}"
+    def __user_profile(self):
+        # Email and payment stay here for booking, the model only gets the hotel preferences in its prompt
+        user_profile = self.__profiles.profile(current_user())
+
+        if 'payment_method' in user_profile:
+            return {
+                'email':user_profile['email'],
+                'hotel_preferences':user_profile['preferences']['hotel'],
+                'payment_method':user_profile['payment_method'],
+            }
+        return {
+            'hotel_preferences':user_profile['preferences']['hotel'],
+        }
     
-    def __initialize_agent(self):
+    def __build_agent(self):
         try:
-            # console.print(f"[cyan](agent.py) | SYSETM PROMPT:[/cyan]: {self.__sys_prompt}")
-            self.__sys_prompt = self.__sys_prompt.format(
-                user_profile=str(self.__user_profile),
-            )
-
-            self.__agent = Agent(
+            # The system prompt is the requesting user's, set on every acquire
+            return Agent(
                 model=self.model,
                 tools=[self.__pick_hotel],
-                system_prompt=self.__sys_prompt
+                hooks=[TraceHooks("hotel")]
             )
 
         except Exception as e:
             console.print(f"[red](agent_hotel.py) | Error initialize agent:[/red]: {e}")
-            return f"(agent_hotel.py) | Error initialize agent: {str(e)}"
+            raise
     
     def __send_invoice(self, data):
         try:
-            url = os.getenv('N8N_ENDPOINT')
-            payload = json.dumps({
-                "email": self.__user_profile['email'],
+            # Delivered by the outbox worker, booking never waits on the webhook
+            return get_invoice_outbox().enqueue({
+                "email": self.__user_profile()['email'],
                 "hotel_name": data['name'],
                 "hotel_price": data['price_per_night'],
                 "hotel_checkin": data['check-in']
             })
-            headers = {
-                'Content-Type': 'application/json'
-            }
-        
-            response = requests.request("POST", url, headers=headers, data=payload)
-            return response
 
         except Exception as e:
             console.print(f"[red](agent_hotel.py) | Error send invoice :[/red]: {e}")
             return {'message': 'error when send invoice', 'error':e}
 
 
-    def __book_hotel(self, data):
-        curr_balance = self.__user_profile['payment_method']['balance']
+    def __booking_key(self, data):
+        return idempotency_key("booking", self.__user_profile().get('email'), data.get('name'), data.get('check-in'), data.get('check-out'))
+
+    def __stay_nights(self, data):
+        # Nights as ISO dates, a stay without a readable check-out is one night
+        check_in, check_out = parse_date(data.get('check-in')), parse_date(data.get('check-out'))
+        if check_in is None:
+            return []
+        nights = max((check_out - check_in).days, 1) if check_out else 1
+        return [(check_in + timedelta(days=i)).isoformat() for i in range(nights)]
+
+    def __reserve(self, data):
+        """
+        Hold a room and the stay's price from the wallet before the user is asked to book.
+        Return (reservation_id, None), or (None, tool result) when the hotel cannot or need not be booked.
+        """
+        if not config.booking_reservations or not get_reservation_desk().available:
+            return None, None
+
+        nights = self.__stay_nights(data)
+        if not nights:
+            return None, {"ask_user": False, 'message':'hotel is found but the stay dates are unreadable, booking skipped', 'data': data}
+
+        try:
+            user_profile = self.__user_profile()
+            result = get_reservation_desk().hold(
+                new_id("RSV"), self.__booking_key(data), data['name'], user_profile['email'], nights,
+                data['price_per_night'], user_profile['payment_method']['balance'],
+            )
+        except Exception as e:
+            if not get_reservation_desk().available:
+                # Database without sql/reservations.sql, book the way it was booked before
+                return None, None
+            console.print(f"[red](agent_hotel.py) | Error holding hotel room:[/red]: {e}")
+            return None, {"ask_user": False, 'message': f'hotel is found but could not be reserved: {e}', 'data': data}
+
+        if result.get('status') == HELD:
+            return result['reservation_id'], None
+        if result.get('status') == CONFIRMED:
+            # A retry of a stay that is already booked
+            data["booking_id"] = result['booking_id']
+            return None, data
+        if result.get('status') == "insufficient_balance":
+            return None, {"ask_user": False, 'message':"Insufficient Balance: booking hotel failed", 'data': data}
+        return None, {"ask_user": False, 'message': f"hotel is found but cannot be booked: {result.get('status')}", 'data': data}
+
+    def __release(self, reservation_id):
+        if reservation_id is not None:
+            get_reservation_desk().release(reservation_id)
+
+    def __book_hotel(self, data, reservation_id=None):
+        if reservation_id is not None:
+            return self.__confirm_reservation(data, reservation_id)
+
+        curr_balance = self.__user_profile()['payment_method']['balance']
         if curr_balance < data['price_per_night']:
             return {'booked_hotel':'', 'message':"Insufficient Balance: booking hotel failed"}
         
-        book_id = "BOOK-" + str(uuid.uuid1()).split("-")[0]
-        data["booking_id"] = book_id
+        data["booking_id"] = new_id("BOOK")
         
         try:
-            supabase_client.schema('planner').table("bookings").insert([data]).execute()       
+            # Coordinates only route the itinerary, planner.bookings has no columns for them
+            booking = {key: value for key, value in data.items() if key not in ("latitude", "longitude")}
+            # Written before the invoice goes out, a retried booking of the same stay gets the first booking back
+            # and is not invoiced twice
+            booking, created = get_planner_writer().write_now("bookings", booking, self.__booking_key(data))
+            data["booking_id"] = booking["booking_id"]
+            if not created:
+                return {'booked_hotel':data, 'message':"hotel already booked"}
             self.__send_invoice(data)
             
             return {'booked_hotel':data, 'message':"booking hotel success"}
         except Exception as e:
             return {'booked_hotel':'', 'message': f"booking hotel failed: {e}"}
 
+    def __confirm_reservation(self, data, reservation_id):
+        # The booking row, room and balance debit are written by confirm_reservation in one transaction
+        booking = {key: value for key, value in data.items() if key not in ("latitude", "longitude")}
+        booking["booking_id"] = new_id("BOOK")
+        try:
+            result = get_reservation_desk().confirm(reservation_id, booking)
+            if result.get('status') != CONFIRMED:
+                return {'booked_hotel':'', 'message': f"booking hotel failed: reservation {result.get('status')}"}
+
+            data["booking_id"] = result['booking_id']
+            if result.get('created', True):
+                self.__send_invoice(data)
+            return {'booked_hotel':data, 'message':"booking hotel success"}
+        except Exception as e:
+            return {'booked_hotel':'', 'message': f"booking hotel failed: {e}"}
+
     @tool
     def call_hotel_agent_with_hitl(self, hotel_criteria, check_in:str, check_out:str):
         """
@@ -111,9 +201,15 @@ class HotelAgent(Model):
         """
         console.print(f"[cyan](agent_hotel.py) | HOTEL Check in:[/cyan]: {check_in}")
         console.print(f"[cyan](agent_hotel.py) | HOTEL Check out:[/cyan]: {check_out}")
-        console.print(f"[yellow](Human-in-the-loop) | Do you want to search for hotels?[/yellow]")
-        
-        user_input = input("Answer (y/n): ")
+        if self.__hitl and config.approval_mode == "queue":
+            # Called as a tool or from a worker thread, this thread waits while the decision is made on the dashboard
+            return asyncio.run(self.call_hotel_agent_async(hotel_criteria, check_in, check_out))
+
+        if self.__hitl:
+            console.print(f"[yellow](Human-in-the-loop) | Do you want to search for hotels?[/yellow]")
+            user_input = input("Answer (y/n): ")
+        else:
+            user_input = "y"
         
         if user_input.lower() != "y":
             console.print("[red]Hotel search cancelled by user.[/red]")
@@ -121,36 +217,30 @@ class HotelAgent(Model):
         
         try:
             console.print("[green]Proceeding with hotel search...[/green]")
-            response_text = self.__call_hotel_agent(hotel_criteria, check_in, check_out)
-            response_text = str(response_text)
-
-            hotel_json = ""
-            if '```json' in response_text:
-
-                if '```json' in response_text:
-                    response_text = response_text.split('```json')[1].split('```')[0]
-                elif '```' in response_text:
-                    response_text = response_text.split('```')[1].split('```')[0]
-                
-                # Handle escaped characters and clean up the JSON string
-                response_text = response_text.replace('\\n', '\n').replace('\\"', '"').strip()
-            
-            hotel_json = json.loads(response_text)
+            hotel_json = self.__find_hotel(hotel_criteria, check_in, check_out)
               
-            if "payment_method" in self.__user_profile:
+            if "payment_method" in self.__user_profile() and self.__hitl:
 
                 console.print(f"[cyan](agent_hotel.py) | HOTEL JSON:[/cyan]: {hotel_json}")        
-                console.print(f"[yellow](Human-in-the-loop) | Do you want book these hotels?[/yellow]")
-                user_input = input(f"Answer (y/n): ")
-                
-                if user_input.lower() != "y":
-                    console.print("[red]Hotel not booked.[/red]")
-                    return {"ask_user": False, 'message':'hotel is found, next to the next step', 'data': hotel_json}
-                
-                book_hotel = self.__book_hotel(hotel_json)
-
-                console.print("[green]Hotel booked.[/green]")
-                return book_hotel['booked_hotel']
+                reservation_id, reply = self.__reserve(hotel_json)
+                if reply is not None:
+                    return reply
+
+                try:
+                    console.print(f"[yellow](Human-in-the-loop) | Do you want book these hotels?[/yellow]")
+                    user_input = input(f"Answer (y/n): ")
+
+                    if user_input.lower() != "y":
+                        console.print("[red]Hotel not booked.[/red]")
+                        return {"ask_user": False, 'message':'hotel is found, next to the next step', 'data': hotel_json}
+
+                    book_hotel = self.__book_hotel(hotel_json, reservation_id)
+
+                    console.print("[green]Hotel booked.[/green]")
+                    return book_hotel['booked_hotel']
+                finally:
+                    # Declined, failed or interrupted: the room and balance are given back right away
+                    self.__release(reservation_id)
             
             console.print("[red]User not provide payment information.[/red]")
             return {"ask_user": False, 'message':'hotel is found, next to the next step', 'data': hotel_json}
@@ -161,6 +251,161 @@ class HotelAgent(Model):
             console.print(f"[red](agent_hotel.py) | Error finding hotels:[/red]: {e}")
             return {'message': 'error when finding hotels','error':e}
 
+    async def call_hotel_agent_async(self, hotel_criteria, check_in:str, check_out:str):
+        """
+        Same as call_hotel_agent_with_hitl, but search and booking are approved through the approval queue.
+        The plan is suspended while it waits, so any number of plans can wait for a human at once.
+        """
+        approvals = get_approval_queue()
+        request = {"hotel_criteria": hotel_criteria, "check_in": check_in, "check_out": check_out}
+
+        if self.__hitl and not await approvals.request("hotel_search", request):
+            console.print("[red]Hotel search cancelled by user.[/red]")
+            return {"cancelled": True, "message": "Hotel search cancelled by user, skip '__call_hotel_agent_tool' tool"}
+
+        try:
+            hotel_json = await asyncio.to_thread(self.__find_hotel, hotel_criteria, check_in, check_out)
+
+            if "payment_method" in self.__user_profile() and self.__hitl:
+                # The room and balance stay held while the booking waits for approval
+                reservation_id, reply = await asyncio.to_thread(self.__reserve, hotel_json)
+                if reply is not None:
+                    return reply
+
+                try:
+                    if not await approvals.request("hotel_booking", hotel_json):
+                        console.print("[red]Hotel not booked.[/red]")
+                        return {"ask_user": False, 'message':'hotel is found, next to the next step', 'data': hotel_json}
+
+                    book_hotel = await asyncio.to_thread(self.__book_hotel, hotel_json, reservation_id)
+                    console.print("[green]Hotel booked.[/green]")
+                    return book_hotel['booked_hotel']
+                finally:
+                    # Also runs when the plan is cancelled while waiting for approval
+                    await asyncio.to_thread(self.__release, reservation_id)
+
+            return {"ask_user": False, 'message':'hotel is found, next to the next step', 'data': hotel_json}
+
+        except Exception as e:
+            console.print_exception(show_locals=True)
+            console.print(f"[red](agent_hotel.py) | Error finding hotels:[/red]: {e}")
+            return {'message': 'error when finding hotels','error':e}
+
+    def __find_hotel(self, hotel_criteria, check_in, check_out):
+        hotel_json = self.__rank_hotels(hotel_criteria, check_in, check_out)
+        if hotel_json is not None:
+            return hotel_json
+
+        return parse_hotel(self.__call_hotel_agent(hotel_criteria, check_in, check_out))
+
+    def __parse_criteria(self, hotel_criteria):
+        """
+        Read hotel criteria as structured data (dict, JSON object or 'key: value' pairs).
+        Return None when the criteria is free text, so the hotel agent handles it.
+        """
+        criteria = hotel_criteria
+        if isinstance(criteria, str):
+            try:
+                criteria = json.loads(criteria)
+            except ValueError:
+                pairs = [part.split(":", 1) for part in criteria.split(",")]
+                if any(len(pair) != 2 for pair in pairs):
+                    return None
+                criteria = {key.strip(): value.strip() for key, value in pairs}
+
+        if not isinstance(criteria, dict):
+            return None
+
+        parsed = {}
+        for key, value in criteria.items():
+            key = CRITERIA_KEYS.get(str(key).strip().lower())
+            if key is None or value in ("", None):
+                return None
+            parsed[key] = value
+
+        if not isinstance(parsed.get("city"), str):
+            return None
+
+        try:
+            if "rating" in parsed:
+                parsed["rating"] = float(parsed["rating"])
+            if "max_price_per_night" in parsed:
+                parsed["max_price_per_night"] = int(parsed["max_price_per_night"])
+        except ValueError:
+            return None
+
+        return parsed
+
+    def __fetch_hotel_candidates(self, city, rating, max_price_per_night):
+        if self.__replica is not None:
+            return self.__replica.find_hotel_candidates(
+                city, rating, max_price_per_night, limit=config.hotel_fast_path_candidates
+            )
+
+        prefetch = current_prefetch()
+        if prefetch is not None:
+            hotels = prefetch.find_hotels(city, rating, max_price_per_night, limit=config.hotel_fast_path_candidates)
+            if hotels is not None:
+                return hotels
+
+        query = supabase_client.schema('travel')\
+                .table("hotels")\
+                .select("*")\
+                .eq("city",city)\
+                .gte("rating",rating)
+        if max_price_per_night is not None:
+            query = query.lte("price_per_night",max_price_per_night)
+        with span("supabase", "travel.hotels", op="select"):
+            return query.limit(config.hotel_fast_path_candidates).execute().data
+
+    def __rank_hotels(self, hotel_criteria, check_in, check_out):
+        """
+        Rule-based hotel pick without an LLM call.
+        Candidates are scored on rating, price headroom and preferred amenity match,
+        return None when the criteria is ambiguous or nothing matches.
+        """
+        if not config.hotel_fast_path:
+            return None
+
+        criteria = self.__parse_criteria(hotel_criteria)
+        if criteria is None:
+            return None
+
+        preferences = self.__user_profile()['hotel_preferences']
+        city = criteria['city'].capitalize()
+        rating = criteria.get('rating', preferences.get('min_rating', 0))
+        max_price = criteria.get('max_price_per_night', preferences.get('max_budget_per_night'))
+        wanted = {
+            AMENITY_ALIASES[name.strip().lower()]
+            for name in preferences.get('preferred_amenities', [])
+            if name.strip().lower() in AMENITY_ALIASES
+        }
+
+        candidates = self.__fetch_hotel_candidates(city, rating, max_price)
+        if not candidates:
+            return None
+
+        def score(row):
+            rating_score = (row.get('rating') or 0) / 5
+            price_score = 1 - (row.get('price_per_night') or 0) / max_price if max_price else 0
+            amenity_score = sum(1 for name in wanted if row.get(name)) / len(wanted) if wanted else 0
+            return 0.4 * rating_score + 0.3 * price_score + 0.3 * amenity_score
+
+        best = max(candidates, key=lambda row: (score(row), -row['id']))
+        console.print(f"[cyan](agent_hotel.py) | Hotel ranked without LLM:[/cyan]: {best['name']} ({len(candidates)} candidates)")
+
+        return {
+            "name": best['name'],
+            "check-in": check_in,
+            "check-out": check_out,
+            "facilities": ", ".join(name for name in HOTEL_AMENITIES if best.get(name)),
+            "price_per_night": best['price_per_night'],
+            "rating": best['rating'],
+            "city": best['city'],
+            "latitude": best.get('latitude'),
+            "longitude": best.get('longitude'),
+        }
+
     @tool
     def __pick_hotel(self, 
                     city:str, rating:int, swimming_pool:bool, 
@@ -183,37 +428,77 @@ class HotelAgent(Model):
             Dict of hotel that contain hotel attributes matched with params 
         """
         try:
-            console.print(f"[cyan](agent_hotel.py) | PARAMS - name:[/cyan] {name}")
-            console.print(f"[cyan](agent_hotel.py) | PARAMS - city:[/cyan] {city}")
-            console.print(f"[cyan](agent_hotel.py) | PARAMS - rating:[/cyan] {rating}")
-            console.print(f"[cyan](agent_hotel.py) | PARAMS - swimming_pool:[/cyan] {swimming_pool}")
-            console.print(f"[cyan](agent_hotel.py) | PARAMS - restaurant:[/cyan] {restaurant}")
-            console.print(f"[cyan](agent_hotel.py) | PARAMS - wifi:[/cyan] {wifi}")
-            console.print(f"[cyan](agent_hotel.py) | PARAMS - parking:[/cyan] {parking}")
-            console.print(f"[cyan](agent_hotel.py) | PARAMS - gym:[/cyan] {gym}")
-            console.print(f"[cyan](agent_hotel.py) | PARAMS - max_price_per_night:[/cyan] {max_price_per_night}")
+            log.print("pick_hotel.params",
+                      f"[cyan](agent_hotel.py) | PARAMS:[/cyan] name={name} city={city} rating={rating} "
+                      f"swimming_pool={swimming_pool} restaurant={restaurant} wifi={wifi} parking={parking} "
+                      f"gym={gym} max_price_per_night={max_price_per_night}")
             
-            fetch = supabase_client.schema('travel')\
-                    .table("hotels")\
-                    .select("*")\
-                    .eq("city",city.capitalize())\
-                    .gte("rating",rating)\
-                    .eq("swimming_pool",swimming_pool)\
-                    .eq("restaurant",restaurant)\
-                    .eq("wifi",wifi)\
-                    .eq("parking",parking)\
-                    .eq("gym",gym)\
-                    .lte("price_per_night",max_price_per_night)\
-                    .limit(1)\
-                    .execute()
-
-            console.print(f"[cyan](agent_hotel.py) | Hotel found:[/cyan]: {fetch.data}")
+            if self.__replica is not None:
+                hotels = self.__replica.find_hotels(
+                    city=city.capitalize(),
+                    rating=rating,
+                    amenities={
+                        'swimming_pool':swimming_pool,
+                        'restaurant':restaurant,
+                        'wifi':wifi,
+                        'parking':parking,
+                        'gym':gym,
+                    },
+                    max_price_per_night=max_price_per_night,
+                )
+                log.print("pick_hotel.found", f"[cyan](agent_hotel.py) | Hotel found (replica):[/cyan]: {hotels}")
+                return {"ask_user": False, 'data': hotels}
+
+            prefetch = current_prefetch()
+            if prefetch is not None:
+                hotels = prefetch.find_hotels(
+                    city=city.capitalize(),
+                    rating=rating,
+                    max_price_per_night=max_price_per_night,
+                    amenities={
+                        'swimming_pool':swimming_pool,
+                        'restaurant':restaurant,
+                        'wifi':wifi,
+                        'parking':parking,
+                        'gym':gym,
+                    },
+                )
+                if hotels is not None:
+                    log.print("pick_hotel.found", f"[cyan](agent_hotel.py) | Hotel found (prefetched):[/cyan]: {hotels}")
+                    return {"ask_user": False, 'data': hotels}
+
+            with span("supabase", "travel.hotels", op="select"):
+                fetch = supabase_client.schema('travel')\
+                        .table("hotels")\
+                        .select("*")\
+                        .eq("city",city.capitalize())\
+                        .gte("rating",rating)\
+                        .eq("swimming_pool",swimming_pool)\
+                        .eq("restaurant",restaurant)\
+                        .eq("wifi",wifi)\
+                        .eq("parking",parking)\
+                        .eq("gym",gym)\
+                        .lte("price_per_night",max_price_per_night)\
+                        .limit(1)\
+                        .execute()
+
+            log.print("pick_hotel.found", f"[cyan](agent_hotel.py) | Hotel found:[/cyan]: {fetch.data}")
             return {"ask_user": False, 'data': fetch.data}
 
         except Exception as e:
             console.print(f"[red](agent_hotel.py) | Error fetch hotel data:[/red]: {e}")
             return f"(agent_hotel.py) | Error fetch hotel data: {str(e)}"
 
+    def __run_agent(self, sys_prompt, hotel_criteria, check_in, check_out, model=None):
+        with self.__agent_pool.acquire() as agent:
+            agent.system_prompt = sys_prompt
+            agent.model = model or self.model
+            return agent(encode({
+                'hotel_criteria': hotel_criteria,
+                'check-in': check_in,
+                'check-out': check_out
+            }))
+
     @tool
     def __call_hotel_agent(self, hotel_criteria:str, check_in:str, check_out:str):
         """
@@ -227,15 +512,21 @@ class HotelAgent(Model):
             Dict of choosen one hotel, contain hotel attributes
         """
         try:
-            self.__initialize_agent()
-            agent = self.__agent(f"""
-            {{
-                'hotel_criteria':{hotel_criteria},
-                'check-in':{check_in},
-                'check-out':{check_out}
-            }}
-            """)
-            return agent
+            sys_prompt = self.__profiles.system_prompt(current_user(), "hotel")
+            # A reply that is not hotel JSON is asked again of the fallback model, and only cached once valid
+            def call():
+                return run_validated(
+                    "hotel",
+                    lambda model: self.__run_agent(sys_prompt, hotel_criteria, check_in, check_out, model),
+                    valid_hotel,
+                    self.fallback_model,
+                )
+
+            if self.__cache is not None:
+                key = response_cache_key(self.model, sys_prompt, hotel_criteria, check_in, check_out)
+                return self.__cache.get_or_call(key, call, valid_hotel)
+
+            return call()
             
         except Exception as e:
             console.print_exception(show_locals=True)
@@ -1,61 +1,53 @@
 from strands import Agent, tool
-from strands.models.gemini import GeminiModel
+from strands.agent import AgentResult
+from strands.telemetry.metrics import EventLoopMetrics
 from .llm_model import Model
+from .agent_pool import AgentPool
+from .itinerary_stream import ItineraryEntryParser
+from .agent_tracing import TraceHooks
+from .context_encoder import encode, trim, parse_loose, hotel_context, places_context
+from .profile_store import get_profile_store, current_user
+from .itinerary_days import trip_days, split_places, route_days, without_coordinates, format_date, merge_days
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import config
+import contextvars
 import json
-import os
-from dotenv import load_dotenv
-load_dotenv()
+import threading
 
-from rich.traceback import install
 from rich.console import Console
 console = Console()
-install(show_locals=True)
 
 class ItineraryAgent(Model):
-    def __init__(self, temperature):
-        super().__init__(temperature)
-        self.__import_prompt__()
+    def __init__(self, temperature=None):
+        super().__init__(temperature, agent="itinerary")
+        self.__profiles = get_profile_store()
+        self.__agent_pool = AgentPool(self.__build_agent)
     
-    def __import_prompt__(self):
+    def __build_agent(self):
         try:
-            with open("./system_prompts/agent-itinerary-prompt.txt","r") as f:
-                self.__sys_prompt = f.read()
-
-            with open("./user_profile.json","r") as f:
-                user_profile = json.load(f)
-                self.__user_profile = {
-                    'behavioral_style':user_profile['behavioral_style'],
-                    'constraints':user_profile['constraints']
-                }
-        
-        except Exception as e:
-            console.print(f"[red](agent_itinerary.py) | Error importing prompt & user profile:[/red]: {e}")
-            return f"(agent_itinerary.py) | Error importing prompt & user profile: {str(e)}"
-    
-    def __initialize_agent(self):
-        try:
-            self.__sys_prompt = self.__sys_prompt.format(
-                user_profile=str(self.__user_profile),
-            )
-            # console.print(f"[cyan](agent.py) | SYSETM PROMPT:[/cyan]: {self.__sys_prompt}")
-            self.__agent = Agent(
+            # The system prompt is the requesting user's, set on every acquire
+            return Agent(
                 model=self.model,
-                system_prompt=self.__sys_prompt
+                # Days stream concurrently, echoing them to the console would interleave
+                callback_handler=None,
+                hooks=[TraceHooks("itinerary")]
             )
 
         except Exception as e:
             console.print(f"[red](agent_itinerary.py) | Error initialize agent:[/red]: {e}")
-            return f"(agent_itinerary.py) | Error initialize agent: {str(e)}"
+            raise
     
     @tool
-    def call_itinerary_agent(self, vacation_period:int, places:list[dict], hotels:dict={}):
+    def call_itinerary_agent(self, vacation_period:int, places:list[dict] | str, hotels:dict | str = {}, start_date:str = ""):
         """
         Tool: call_itinerary_agent
         Description: Use this tool for run agent that help you make itinerary.
         Args:
             vacation_period (int): user vacation period (days)
-            hotels (dict): dict of choosen hotel data, contain hotel attribute
-            places (list[dict]): list of fetched places data, contain name and category
+            hotels (dict | str): dict of choosen hotel data, contain hotel attribute, or its "ref:..." from a tool result
+            places (list[dict] | str): list of fetched places data, contain name and category, or its "ref:..." from a tool result
+            start_date (str): first day of the vacation (ex, 2 December 2025), hotel check-in date when empty
         Return:
             Itenerary in JSON format
         """
@@ -63,16 +55,144 @@ class ItineraryAgent(Model):
             console.print(f"[cyan](agent_itinerary.py) | Vaction periode:[/cyan]: {vacation_period}")
             console.print(f"[cyan](agent_itinerary.py) | Places:[/cyan]: {places}")
             console.print(f"[cyan](agent_itinerary.py) | Hotels:[/cyan]: {hotels}")
-            
-            self.__initialize_agent()
-            agent = self.__agent(f"""
-            vacation_periode: {vacation_period}
-            hotels: {hotels}
-            places: {places}
-            """)
-            return agent
-            
+
+            return self.__plan_days(vacation_period, places, hotels, start_date)
+
         except Exception as e:
             console.print_exception(show_locals=True)
             console.print(f"[red](agent_itinerary.py) | Error processing your prompt:[/red]: {e}")
             return f"(agent_itinerary.py) | Error processing your prompt: {str(e)}"
+
+    def stream_itinerary(self, vacation_period, places, hotels, on_entry, start_date="", on_reset=None):
+        """
+        Same as call_itinerary_agent, but model tokens are parsed while they stream
+        and on_entry(key, value) is called as soon as each itinerary entry is complete.
+        Days are generated concurrently, so entries of different days arrive interleaved.
+        A day that is not valid JSON is generated again, on_reset(keys) first withdraws the entries it had published.
+        """
+        try:
+            console.print(f"[cyan](agent_itinerary.py) | Streaming itinerary, vaction periode:[/cyan]: {vacation_period}")
+
+            return self.__plan_days(vacation_period, places, hotels, start_date, on_entry, on_reset)
+
+        except Exception as e:
+            console.print_exception(show_locals=True)
+            console.print(f"[red](agent_itinerary.py) | Error processing your prompt:[/red]: {e}")
+            return f"(agent_itinerary.py) | Error processing your prompt: {str(e)}"
+
+    def __plan_days(self, vacation_period, places, hotels, start_date, on_entry=None, on_reset=None):
+        """
+        Split the places over the vacation days and generate every day with its own concurrent agent call,
+        then merge the days into one plan. Latency stays about one day's generation for trips up to
+        config.itinerary_day_workers days, and no single call comes close to the output token limit.
+        """
+        # Hotel and places may be refs from the root agent's history, only the fields an itinerary uses are sent
+        hotel = hotel_context(hotels)
+        if isinstance(hotel, list):
+            hotel = hotel[0] if hotel else {}
+        places = places_context(places)
+
+        if not hotel and not places:
+            return self.__result({"start": "", "end": "", "description": "", "booking_id": "", "itinerary": ""})
+
+        hotel = hotel if isinstance(hotel, dict) else {}
+        days = trip_days(vacation_period, start_date or hotel.get("check-in"))
+        if config.route_places:
+            # Visiting order is solved locally from coordinates, the model only fills in the times
+            day_places = route_days(hotel, places, len(days), config.route_speed_kmh)
+        else:
+            day_places = split_places(places, len(days))
+
+        if on_entry is not None:
+            # Day streams run in their own threads, the publisher gets one entry at a time
+            lock = threading.Lock()
+            def emit(key, value):
+                with lock:
+                    on_entry(key, value)
+
+            def reset(keys):
+                if on_reset is not None:
+                    with lock:
+                        on_reset(keys)
+        else:
+            emit = reset = None
+
+        # Each day runs in a copy of this context so its spans stay in the plan's trace
+        with ThreadPoolExecutor(max_workers=min(len(days), config.itinerary_day_workers)) as executor:
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run,
+                    self.__plan_day, number, days, day_places[number - 1], hotel, emit, reset
+                )
+                for number in range(1, len(days) + 1)
+            ]
+            results = [future.result() for future in futures]
+
+        return self.__result(merge_days(days, results, hotel.get("booking_id")))
+
+    def __plan_day(self, number, days, places, hotel, on_entry, on_reset):
+        prompt = self.__build_prompt(number, days, places, hotel)
+        sys_prompt = self.__profiles.system_prompt(current_user(), "itinerary")
+
+        # Entries this day has published, an entry is only published again when its value changed
+        published = {}
+        def publish(key, value):
+            if key in published and published[key] == value:
+                return
+            published[key] = value
+            on_entry(key, value)
+
+        # The second attempt runs on the tier's fallback model when there is one
+        for attempt, model in enumerate((self.model, self.fallback_model or self.model)):
+            if published:
+                # Clients drop the failed attempt's entries before the retry streams its own
+                on_reset(list(published))
+                published.clear()
+
+            with self.__agent_pool.acquire() as agent:
+                agent.system_prompt = sys_prompt
+                agent.model = model
+                if on_entry is None:
+                    result = agent(prompt)
+                else:
+                    result = asyncio.run(self.__stream(agent, prompt, publish))
+
+            day = parse_loose(str(result))
+            if isinstance(day, dict):
+                return day
+            console.print(f"[yellow](agent_itinerary.py) | Day {number} is not JSON, attempt {attempt + 1}:[/yellow] {str(result)[:200]}")
+
+        raise ValueError(f"day {number} itinerary is not JSON")
+
+    async def __stream(self, agent, prompt, on_entry):
+        parser = ItineraryEntryParser()
+        result = None
+        async for event in agent.stream_async(prompt):
+            if "data" in event:
+                for key, value in parser.feed(event["data"]):
+                    on_entry(key, value)
+            if "result" in event:
+                result = event["result"]
+        return result
+
+    def __build_prompt(self, number, days, places, hotel):
+        # Hotel is trimmed after places, only the fields an itinerary uses are sent
+        places = [without_coordinates(place) for place in places] if isinstance(places, list) else places
+        context = trim({"hotel": without_coordinates(hotel), "places": places}, config.context_budgets["itinerary_input"])
+        return (
+            f"day: {number} of {len(days)}\n"
+            f"date: {format_date(days[number - 1])}\n"
+            f"check_in: {str(number == 1 and bool(hotel)).lower()}\n"
+            f"check_out: {str(number == len(days) and bool(hotel)).lower()}\n"
+            f"hotel: {encode(context.get('hotel', {}))}\n"
+            f"places: {encode(context.get('places', []))}"
+        )
+
+    def __result(self, plan):
+        # Same shape as an agent invocation, callers read result.message['content'][0]['text']
+        return AgentResult(
+            stop_reason="end_turn",
+            message={"role": "assistant", "content": [{"text": json.dumps(plan, ensure_ascii=False)}]},
+            metrics=EventLoopMetrics(),
+            state={},
+        )
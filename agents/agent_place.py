@@ -1,94 +1,128 @@
 from strands import Agent, tool
-from strands.models.gemini import GeminiModel
-from .llm_model import Model
+from .llm_model import Model, run_validated
+from .agent_pool import AgentPool
+from .llm_cache import get_response_cache, response_cache_key
+from .agent_tracing import TraceHooks
+from .profile_store import get_profile_store, current_user
+from .output_checks import valid_places
+from .prefetch import current_prefetch
 from supabaseClient import supabase_client
+from travel_replica import get_travel_replica
+from travel_schema import select_places
+from tracing import span, SampledLogger
 
-import json
-import os
-from dotenv import load_dotenv
-load_dotenv()
+import config
 
-from rich.traceback import install
 from rich.console import Console
 console = Console()
-install(show_locals=True)
+log = SampledLogger(console)
 
 class PlaceAgent(Model):
-    def __init__(self, temperature):
-        super().__init__(temperature)
-        self.__import_prompt__()
+    def __init__(self, temperature=None):
+        super().__init__(temperature, agent="place")
+        self.__profiles = get_profile_store()
+        self.__agent_pool = AgentPool(self.__build_agent)
+        self.__replica = get_travel_replica()
+        self.__cache = get_response_cache()
+        if config.place_search:
+            # Starts building a missing place index now, searches use Supabase until it is ready
+            from place_index import get_place_index
+            get_place_index()
     
-    def __import_prompt__(self):
+    def __build_agent(self):
         try:
-            with open("./system_prompts/agent-place-prompt.txt","r") as f:
-                self.__sys_prompt = f.read()
-
-            with open("./user_profile.json","r") as f:
-                user_profile = json.load(f)
-                self.__user_profile = {
-                    'hotel_preferences':user_profile['preferences']['attractions'],
-                    'behavioral_style':user_profile['behavioral_style'],
-                    'constraint':user_profile['constraints']
-                }
-            
-        except Exception as e:
-            console.print(f"[red](agent_place.py) | Error importing prompt & user profile:[/red]: {e}")
-            return f"(agent_place.py) | Error importing prompt & user profile: {str(e)}"
-    
-    def __initialize_agent(self):
-        try:
-            self.__sys_prompt = self.__sys_prompt.format(
-                user_profile=str(self.__user_profile),
-            )
-
-            self.__agent = Agent(
+            # The system prompt is the requesting user's, set on every acquire
+            return Agent(
                 model=self.model,
                 tools=[self.__find_places],
-                system_prompt=self.__sys_prompt
+                hooks=[TraceHooks("place")]
             )
 
         except Exception as e:
             console.print(f"[red](agent_place.py) | Error initialize agent:[/red]: {e}")
-            return f"(agent_place.py) | Error initialize agent: {str(e)}"
+            raise
 
     @tool
     def __find_places(self, 
                     city:str, 
                     max_ticket_price:int,
                     category:list[str],
-                    name:str =""):
+                    name:str ="",
+                    description:str =""):
         """
         Tool: __find_places
         Description: Use this tools for fetching places data based on user profile.
         Args:
             name (str): place name (optional)
             city (str): place location (capitalize)
-            category (str): List contain: Beach|Cultural|Family|Historical|Landmark|Museum|Nature|Shopping|Theme Park
+            category (list[str]): List contain: Beach|Cultural|Family|Historical|Landmark|Museum|Nature|Shopping|Theme Park, empty list for any category
             max_ticket_price (int): maximum ticket price user preferences 
+            description (str): what the user wants to visit in their own words, places are ranked by how well they match it
         Return
             List all places name and description
         """
         try:
-            console.print(f"[cyan](agent_place.py) | PARAMS - name:[/cyan] {name}")
-            console.print(f"[cyan](agent_place.py) | PARAMS - city:[/cyan] {city}")
-            console.print(f"[cyan](agent_place.py) | PARAMS - category:[/cyan] {category}")
+            log.print("find_places.params",
+                      f"[cyan](agent_place.py) | PARAMS:[/cyan] name={name} city={city} category={category} description={description}")
+
+            index = None
+            if config.place_search and (description or name):
+                from place_index import get_place_index
+                index = get_place_index()
+            if index is not None:
+                places = index.search(
+                    f"{name} {description}",
+                    city=city.capitalize(),
+                    category=category,
+                    max_ticket_price=max_ticket_price,
+                    k=config.place_search_top_k,
+                )
+                log.print("find_places.found", f"[cyan](agent.py) | Place List (search):[/cyan]: {places}")
+                return places
             
-            fetch = supabase_client.schema('travel')\
-                    .table("places")\
-                    .select("name, category")\
-                    .eq("city",city.capitalize())\
-                    .in_("category",category)\
-                    .lte("ticket_price", max_ticket_price)\
-                    .limit(5)\
-                    .execute()
+            if self.__replica is not None:
+                places = self.__replica.find_places(
+                    city=city.capitalize(),
+                    category=category,
+                    max_ticket_price=max_ticket_price,
+                )
+                log.print("find_places.found", f"[cyan](agent.py) | Place List (replica):[/cyan]: {places}")
+                return places
+
+            prefetch = current_prefetch()
+            if prefetch is not None:
+                places = prefetch.find_places(city.capitalize(), category, max_ticket_price)
+                if places is not None:
+                    log.print("find_places.found", f"[cyan](agent.py) | Place List (prefetched):[/cyan]: {places}")
+                    return places
+
+            def select(columns):
+                query = supabase_client.schema('travel')\
+                        .table("places")\
+                        .select(columns)\
+                        .eq("city",city.capitalize())
+                if category:
+                    query = query.in_("category",category)
+                with span("supabase", "travel.places", op="select"):
+                    return query.lte("ticket_price", max_ticket_price)\
+                            .limit(5)\
+                            .execute()
+
+            fetch = select_places(select)
 
-            console.print(f"[cyan](agent.py) | Place List:[/cyan]: {fetch.data}")    
+            log.print("find_places.found", f"[cyan](agent.py) | Place List:[/cyan]: {fetch.data}")
             return fetch.data
 
         except Exception as e:
             console.print(f"[red](agent.py) | Error fetch place data:[/red]: {e}")
             return f"(agent.py) | Error fetch place data: {str(e)}"
 
+    def __run_agent(self, sys_prompt, place_description, model=None):
+        with self.__agent_pool.acquire() as agent:
+            agent.system_prompt = sys_prompt
+            agent.model = model or self.model
+            return agent(place_description)
+
     @tool
     def call_place_agent(self, place_description):
         """
@@ -100,9 +134,17 @@ class PlaceAgent(Model):
             Dictionary of all choosen places, contain name and category
         """
         try:
-            self.__initialize_agent()
-            agent = self.__agent(place_description)
-            return agent
+            sys_prompt = self.__profiles.system_prompt(current_user(), "place")
+            def call():
+                return run_validated(
+                    "place", lambda model: self.__run_agent(sys_prompt, place_description, model), valid_places, self.fallback_model
+                )
+
+            if self.__cache is not None:
+                key = response_cache_key(self.model, sys_prompt, place_description)
+                return self.__cache.get_or_call(key, call, valid_places)
+
+            return call()
             
         except Exception as e:
             console.print_exception(show_locals=True)
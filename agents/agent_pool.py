@@ -0,0 +1,54 @@
+from strands.agent.state import AgentState
+from strands.telemetry.metrics import EventLoopMetrics
+from contextlib import contextmanager
+
+import queue
+
+from rich.console import Console
+console = Console()
+
+
+class AgentPool:
+    """
+    Pool of pre-built strands Agents.
+    Agents are built once and reset between requests instead of rebuilt,
+    a new agent is only built when every pooled agent is busy.
+    A reset agent gets back its messages, state, conversation manager, metrics and model as built,
+    so nothing of one request reaches the next borrower.
+    """
+    def __init__(self, factory, size=1, max_idle=8):
+        self.__factory = factory
+        self.__max_idle = max_idle
+        self.__idle = queue.LifoQueue()
+
+        for _ in range(size):
+            self.__idle.put(self.__build())
+
+    def __build(self):
+        agent = self.__factory()
+        return agent, agent.model, agent.conversation_manager.get_state()
+
+    def __reset(self, agent, model, conversation_state):
+        agent.messages.clear()
+        agent.state = AgentState()
+        agent.conversation_manager.restore_from_session(conversation_state)
+        agent.event_loop_metrics = EventLoopMetrics()
+        # Callers may swap the model for one request, e.g. run_validated's fallback
+        agent.model = model
+
+    @contextmanager
+    def acquire(self):
+        try:
+            pooled = self.__idle.get_nowait()
+        except queue.Empty:
+            pooled = self.__build()
+
+        try:
+            yield pooled[0]
+        finally:
+            self.__reset(*pooled)
+            if self.__idle.qsize() < self.__max_idle:
+                self.__idle.put(pooled)
+
+    def idle_count(self):
+        return self.__idle.qsize()
@@ -0,0 +1,68 @@
+from strands.hooks import HookProvider
+from strands.hooks.events import BeforeInvocationEvent, AfterInvocationEvent, BeforeToolCallEvent, AfterToolCallEvent
+from tracing import Span, activate, deactivate
+
+import threading
+
+
+class TraceHooks(HookProvider):
+    """
+    Strands hooks that record a span per agent invocation (with its prompt and completion tokens)
+    and per tool call. Spans opened inside a tool, like Supabase queries, become its children.
+    """
+    def __init__(self, agent_name):
+        self.agent_name = agent_name
+        self.__spans = {}
+        self.__lock = threading.Lock()
+
+    def register_hooks(self, registry, **kwargs):
+        registry.add_callback(BeforeInvocationEvent, self.before_invocation)
+        registry.add_callback(AfterInvocationEvent, self.after_invocation)
+        registry.add_callback(BeforeToolCallEvent, self.before_tool)
+        registry.add_callback(AfterToolCallEvent, self.after_tool)
+
+    def __start(self, key, kind, name, **attributes):
+        span = Span(kind, name, attributes)
+        # Hooks run inside the agent's own task context, setting it here only scopes that invocation
+        token = activate(span)
+        with self.__lock:
+            self.__spans[key] = (span, token)
+
+    def __finish(self, key):
+        # The span's parent is current again, later tool calls and stages are not opened under a finished span
+        with self.__lock:
+            span, token = self.__spans.pop(key, (None, None))
+        if token is not None:
+            deactivate(token)
+        return span
+
+    def before_invocation(self, event):
+        self.__start(("agent", id(event.agent)), "agent", self.agent_name)
+
+    def after_invocation(self, event):
+        span = self.__finish(("agent", id(event.agent)))
+        if span is None:
+            return
+
+        if event.result is None:
+            span.fail("invocation ended without a result")
+        else:
+            invocation = event.result.metrics.latest_agent_invocation
+            if invocation is not None:
+                span.add_tokens(invocation.usage.get("inputTokens"), invocation.usage.get("outputTokens"))
+            span.set(stop_reason=event.result.stop_reason)
+        span.end()
+
+    def before_tool(self, event):
+        self.__start(("tool", event.tool_use["toolUseId"]), "tool", event.tool_use["name"], agent=self.agent_name)
+
+    def after_tool(self, event):
+        span = self.__finish(("tool", event.tool_use["toolUseId"]))
+        if span is None:
+            return
+
+        if event.exception is not None:
+            span.fail(event.exception)
+        elif event.result.get("status") == "error":
+            span.fail(event.result.get("content"))
+        span.end()
@@ -0,0 +1,237 @@
+from strands.hooks import HookProvider
+from strands.hooks.events import AfterToolCallEvent
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import ast
+import config
+import contextvars
+import itertools
+import json
+import threading
+
+# Only what each agent's prompt actually uses, as (output key, path in user_profile.json)
+PROFILE_FIELDS = {
+    "hotel": [("hotel", ("preferences", "hotel"))],
+    "place": [
+        ("attractions", ("preferences", "attractions")),
+        ("trip_style", ("behavioral_style", "trip_style")),
+        ("constraints", ("constraints",)),
+    ],
+    "itinerary": [("style", ("behavioral_style",)), ("constraints", ("constraints",))],
+}
+HOTEL_FIELDS = ("name", "city", "check-in", "check-out", "booking_id", "price_per_night", "rating", "facilities", "latitude", "longitude")
+PLACE_FIELDS = ("name", "category", "latitude", "longitude")
+
+EMPTY = (None, "", [], {})
+REF_PREFIX = "ref:"
+
+
+def count_tokens(text):
+    # Same ~4 characters per token heuristic the scheduler budgets with
+    return (len(text) + 3) // 4
+
+
+def compact(value):
+    """Drop empty fields and collapse whitespace, recursively."""
+    if isinstance(value, dict):
+        items = ((str(key).strip(), compact(item)) for key, item in value.items())
+        return {key: item for key, item in items if item not in EMPTY}
+    if isinstance(value, (list, tuple, set)):
+        return [item for item in (compact(item) for item in value) if item not in EMPTY]
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+def encode(value):
+    """Minimal, stable text for a prompt: compact JSON with sorted keys, so equal inputs give equal prompts."""
+    return json.dumps(compact(value), sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def shrink(value):
+    """Drop the last item of the longest list, or halve the longest string. Return False when nothing is left to cut."""
+    lists, strings = [], []
+
+    def walk(node, parent, key):
+        if isinstance(node, list):
+            lists.append(node)
+            for i, item in enumerate(node):
+                walk(item, node, i)
+        elif isinstance(node, dict):
+            for item_key, item in node.items():
+                walk(item, node, item_key)
+        elif isinstance(node, str) and parent is not None:
+            strings.append((parent, key, node))
+
+    walk(value, None, None)
+    longest_list = max(lists, key=len, default=None)
+    if longest_list is not None and len(longest_list) > 1:
+        longest_list.pop()
+        return True
+
+    parent, key, text = max(strings, key=lambda entry: len(entry[2]), default=(None, None, ""))
+    if len(text) > 16:
+        parent[key] = text[:len(text) // 2] + "..."
+        return True
+    return False
+
+
+def trim(value, budget):
+    """Compacted value cut down until its encoding fits in budget tokens, long lists lose their tail items first."""
+    value = compact(value)
+    if isinstance(value, str):
+        value = {"text": value}
+
+    while count_tokens(encode(value)) > budget and shrink(value):
+        pass
+    return value
+
+
+def encode_within(value, budget):
+    return encode(trim(value, budget))
+
+
+def pick(source, path):
+    for key in path:
+        if not isinstance(source, dict):
+            return None
+        source = source.get(key)
+    return source
+
+
+def profile_for(agent, user_profile):
+    """Project user_profile.json onto the fields agent needs, encoded within its token budget."""
+    projected = {key: pick(user_profile, path) for key, path in PROFILE_FIELDS[agent]}
+    return encode_within(projected, config.context_budgets[f"{agent}_profile"])
+
+
+def parse_loose(text):
+    """Read agent output that should be JSON but may be fenced or a Python literal."""
+    if not isinstance(text, str):
+        return text
+    if '```json' in text:
+        text = text.split('```json')[1].split('```')[0]
+    elif '```' in text:
+        text = text.split('```')[1].split('```')[0]
+
+    for parse in (json.loads, ast.literal_eval):
+        try:
+            return parse(text.strip())
+        except (ValueError, SyntaxError, TypeError):
+            continue
+    return text
+
+
+def project(row, fields):
+    if not isinstance(row, dict):
+        return row
+    return {field: row[field] for field in fields if field in row}
+
+
+def hotel_context(hotels):
+    """The booked or picked hotel from a hotel agent result, with only the fields an itinerary needs."""
+    hotels = parse_loose(resolve_ref(hotels))
+    if isinstance(hotels, dict) and "data" in hotels:
+        hotels = hotels["data"]
+    if isinstance(hotels, list):
+        return [project(hotel, HOTEL_FIELDS) for hotel in hotels]
+    return project(hotels, HOTEL_FIELDS)
+
+
+def places_context(places):
+    """Chosen places from a place agent result as name, category and coordinates only."""
+    places = parse_loose(resolve_ref(places))
+    if isinstance(places, dict):
+        places = places.get("choosen_places", places.get("places", places))
+    if isinstance(places, list):
+        return [project(place, PLACE_FIELDS) for place in places]
+    return places
+
+
+class ContextStore:
+    """
+    Full tool results kept out of the root agent's history, addressed by short refs.
+    One store per plan (plan_context), so a ref only resolves within the plan that made it.
+    """
+    def __init__(self, max_entries=256):
+        self.__max_entries = max_entries
+        self.__entries = OrderedDict()
+        self.__ids = itertools.count(1)
+        self.__lock = threading.Lock()
+
+    def put(self, name, value):
+        with self.__lock:
+            ref = f"{REF_PREFIX}{name}-{next(self.__ids)}"
+            self.__entries[ref] = value
+            while len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+            return ref
+
+    def get(self, ref):
+        with self.__lock:
+            return self.__entries.get(ref)
+
+
+_store = contextvars.ContextVar("context_store", default=None)
+
+@contextmanager
+def plan_context():
+    """Give the plan run inside this block its own context store."""
+    token = _store.set(ContextStore())
+    try:
+        yield _store.get()
+    finally:
+        _store.reset(token)
+
+def get_context_store():
+    """The store of the current plan, None outside plan_context()."""
+    return _store.get()
+
+def resolve_ref(value):
+    """
+    Swap a ref for the stored tool result, any other value is returned as is.
+    Raises LookupError for a ref that is not in the current plan's store, rather than pass the ref on as data.
+    """
+    if isinstance(value, str) and value.strip().startswith(REF_PREFIX):
+        store = _store.get()
+        stored = store.get(value.strip()) if store is not None else None
+        if stored is None:
+            raise LookupError(f"{value.strip()} is not a tool result of this plan")
+        return stored
+    return value
+
+
+class ToolResultRefs(HookProvider):
+    """
+    Keep large tool results out of the root agent's conversation history.
+    The result is stored in the context store and the history only gets {"ref", "preview"},
+    tools that receive the ref (call_itinerary_agent) read the full result back.
+    Results of keep_tools stay inline, the root agent answers with the itinerary itself,
+    and so does every result outside plan_context(), where no store could resolve the ref.
+    """
+    def __init__(self, min_tokens=None, preview_tokens=None, keep_tools=("call_itinerary_agent",)):
+        self.min_tokens = min_tokens
+        self.preview_tokens = preview_tokens
+        self.keep_tools = keep_tools
+
+    def register_hooks(self, registry, **kwargs):
+        registry.add_callback(AfterToolCallEvent, self.after_tool)
+
+    def after_tool(self, event):
+        result = event.result
+        if result.get("status") != "success" or event.tool_use["name"] in self.keep_tools:
+            return
+
+        store = _store.get()
+        if store is None:
+            return
+
+        text = "".join(block.get("text", "") for block in result.get("content", []))
+        if not text or count_tokens(text) < (self.min_tokens or config.context_ref_min_tokens):
+            return
+
+        name = event.tool_use["name"].replace("call_", "").replace("_with_hitl", "")
+        ref = store.put(name, text)
+        preview = trim(parse_loose(text), self.preview_tokens or config.context_ref_preview_tokens)
+        event.result = {**result, "content": [{"text": encode({"ref": ref, "preview": preview})}]}
@@ -0,0 +1,124 @@
+from datetime import date, datetime, timedelta
+
+import json
+import re
+
+DATE_FORMATS = ("%d %B %Y", "%d %b %Y", "%Y-%m-%d", "%B %d, %Y", "%d/%m/%Y")
+ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+LOCATION_FIELDS = ("latitude", "longitude")
+ENTRY_TIME = re.compile(r"(\d{1,2})[.:](\d{2})\s*-\s*(\d{1,2})[.:](\d{2})")
+
+
+def parse_date(text):
+    """Trip dates come from the model as "2 December 2025" but other common formats are accepted, None if unreadable."""
+    if not isinstance(text, str):
+        return None
+    text = text.strip()
+    if ISO_DATE.match(text):
+        text = text[:10]
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def format_date(day):
+    # Same shape as the itinerary keys, "2 December 2025"
+    return f"{day.day} {day:%B %Y}"
+
+
+def trip_days(vacation_period, start_date=None):
+    """One date per vacation day, starting at start_date (today when unknown)."""
+    start = parse_date(start_date) if isinstance(start_date, str) else start_date
+    start = start or date.today()
+    return [start + timedelta(days=i) for i in range(max(int(vacation_period or 1), 1))]
+
+
+def split_places(places, days):
+    """Spread places over days in order, days differ by at most one place. Days may be empty on long trips."""
+    if not isinstance(places, list):
+        return [places] * days
+    return [places[i * len(places) // days:(i + 1) * len(places) // days] for i in range(days)]
+
+
+def without_coordinates(row):
+    if not isinstance(row, dict):
+        return row
+    return {key: value for key, value in row.items() if key not in LOCATION_FIELDS}
+
+
+def route_days(hotel, places, days, speed_kmh):
+    """
+    Split places over days along a route instead of in list order.
+    One open route from the hotel orders every located place, consecutive stretches of it become days
+    and each day is re-ordered as a round trip from the hotel. Stops get travel_minutes from the
+    previous stop (the hotel for the first), places without coordinates are spread over the days after them.
+    """
+    if not isinstance(places, list):
+        return split_places(places, days)
+    # NumPy is loaded by the first trip routed, not when the agents are imported
+    from .route_planner import coordinates, plan_route, leg_distances
+
+    located = [place for place in places if coordinates(place)]
+    if not located:
+        return split_places(places, days)
+    unlocated = [place for place in places if not coordinates(place)]
+
+    points = [coordinates(place) for place in located]
+    # Without a located hotel the day starts from the middle of the places
+    start = coordinates(hotel) or (sum(lat for lat, _ in points) / len(points), sum(lon for _, lon in points) / len(points))
+    ordered = [located[i] for i in plan_route(start, points, closed=False)]
+
+    schedule = []
+    for stops, extra in zip(split_places(ordered, days), split_places(unlocated, days)):
+        stops = [stops[i] for i in plan_route(start, [coordinates(place) for place in stops])]
+        legs = leg_distances(start, [coordinates(place) for place in stops])
+        schedule.append([
+            {**without_coordinates(place), "travel_minutes": round(km / speed_kmh * 60)}
+            for place, km in zip(stops, legs)
+        ] + extra)
+    return schedule
+
+
+def day_bounds(day, entries):
+    """Start and end of a day's schedule as ISO timestamps, from its "date | 07.00 - 09.00" keys."""
+    times = [ENTRY_TIME.search(key) for key in entries]
+    times = [match.groups() for match in times if match]
+    if times:
+        first = min(times, key=lambda t: (int(t[0]), int(t[1])))
+        last = max(times, key=lambda t: (int(t[2]), int(t[3])))
+        start, end = (int(first[0]), int(first[1])), (min(int(last[2]), 23), int(last[3]))
+    else:
+        start, end = (7, 0), (21, 0)
+    return (
+        f"{day.isoformat()}T{start[0]:02d}:{start[1]:02d}:00Z",
+        f"{day.isoformat()}T{end[0]:02d}:{end[1]:02d}:00Z",
+    )
+
+
+def merge_days(days, results, booking_id=None):
+    """
+    Join per-day results ({"summary", "itinerary"}) into one plan row for planner.plans.
+    The itinerary stays a JSON-encoded string, like a plan generated in one call.
+    """
+    itinerary, summaries, scheduled = {}, [], []
+    for number, (day, result) in enumerate(zip(days, results), start=1):
+        entries = result.get("itinerary") or {}
+        if isinstance(entries, str):
+            entries = json.loads(entries)
+        itinerary.update(entries)
+        if entries:
+            scheduled.append((day, entries))
+        if result.get("summary"):
+            summaries.append(f"Day {number}: {result['summary']}")
+
+    first_day, last_day = (scheduled[0], scheduled[-1]) if scheduled else ((days[0], {}), (days[-1], {}))
+    return {
+        "start": day_bounds(*first_day)[0],
+        "end": day_bounds(*last_day)[1],
+        "description": " ".join(summaries) or f"{len(days)}-day trip",
+        "booking_id": booking_id or "",
+        "itinerary": json.dumps(itinerary, ensure_ascii=False),
+    }
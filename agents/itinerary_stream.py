@@ -0,0 +1,171 @@
+from websockets.sync.client import connect
+
+import json
+
+from rich.console import Console
+console = Console()
+
+ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', '"': '"', '\\': '\\', '/': '/'}
+
+
+def is_entry_key(key):
+    # Itinerary entries are keyed "2 December 2025 | 06.00 - 07.00"
+    return key is not None and "|" in key
+
+
+class ItineraryEntryParser:
+    """
+    Incremental JSON scanner for streamed itinerary output.
+    Feed it text chunks as they arrive, it returns every itinerary entry ("date | time range" key)
+    as soon as its value is complete. An itinerary sent as a JSON-encoded string is scanned too.
+    """
+    def __init__(self):
+        self.entries = {}
+        self.__in_string = False
+        self.__escape = False
+        self.__unicode = None
+        self.__chars = []
+        self.__string_is_value = False
+        self.__last_string = None
+        self.__key = None
+        self.__expect_value = False
+        self.__depth = 0
+        self.__capture = None
+        self.__child = None
+        self.__ready = []
+
+    def feed(self, chunk):
+        for char in chunk:
+            self.__feed_char(char)
+        ready, self.__ready = self.__ready, []
+        return ready
+
+    def __emit(self, key, value):
+        self.entries[key] = value
+        self.__ready.append((key, value))
+
+    def __string_char(self, char):
+        self.__chars.append(char)
+        if self.__child is not None:
+            for key, value in self.__child.feed(char):
+                self.__emit(key, value)
+
+    def __close_string(self):
+        text = "".join(self.__chars)
+        self.__child = None
+        if self.__string_is_value:
+            if is_entry_key(self.__key) and self.__capture is None:
+                self.__emit(self.__key, text)
+            self.__expect_value = False
+        else:
+            self.__last_string = text
+
+    def __feed_char(self, char):
+        if self.__capture is not None:
+            self.__capture["raw"].append(char)
+
+        if self.__in_string:
+            if self.__unicode is not None:
+                self.__unicode += char
+                if len(self.__unicode) == 4:
+                    self.__string_char(chr(int(self.__unicode, 16)))
+                    self.__unicode = None
+            elif self.__escape:
+                self.__escape = False
+                if char == 'u':
+                    self.__unicode = ""
+                else:
+                    self.__string_char(ESCAPES.get(char, char))
+            elif char == '\\':
+                self.__escape = True
+            elif char == '"':
+                self.__in_string = False
+                self.__close_string()
+            else:
+                self.__string_char(char)
+            return
+
+        if char.isspace():
+            return
+
+        if char == '"':
+            self.__in_string = True
+            self.__chars = []
+            self.__string_is_value = self.__expect_value
+            if self.__expect_value and self.__key == "itinerary":
+                self.__child = ItineraryEntryParser()
+            return
+
+        if char == ':' and self.__last_string is not None:
+            self.__key = self.__last_string
+            self.__last_string = None
+            self.__expect_value = True
+            return
+
+        self.__last_string = None
+
+        if char in '{[':
+            self.__depth += 1
+            if self.__expect_value and is_entry_key(self.__key) and self.__capture is None:
+                self.__capture = {"key": self.__key, "depth": self.__depth, "raw": [char]}
+            self.__expect_value = False
+        elif char in '}]':
+            if self.__capture is not None and self.__capture["depth"] == self.__depth:
+                try:
+                    self.__emit(self.__capture["key"], json.loads("".join(self.__capture["raw"])))
+                except ValueError:
+                    pass
+                self.__capture = None
+            self.__depth -= 1
+        else:
+            self.__expect_value = False
+
+
+class ItineraryStreamPublisher:
+    """
+    Pushes streamed itinerary entries to the backend websocket (/ws/itinerary-stream).
+    Publishing is best effort, a missing backend never breaks planning.
+    An entry already sent with the same value is not sent again.
+    """
+    def __init__(self, url, stream_id):
+        self.__url = url
+        self.__stream_id = stream_id
+        self.__connection = None
+        self.__sent = {}
+
+        try:
+            self.__connection = connect(url, open_timeout=2)
+        except Exception as e:
+            console.print(f"[yellow](itinerary_stream.py) | Itinerary stream not published:[/yellow] {e}")
+
+    def __send(self, message):
+        if self.__connection is None:
+            return
+        try:
+            self.__connection.send(json.dumps({"stream_id": self.__stream_id, **message}, default=str))
+        except Exception as e:
+            console.print(f"[yellow](itinerary_stream.py) | Itinerary stream closed:[/yellow] {e}")
+            self.__connection = None
+
+    def started(self, **details):
+        self.__send({"type": "started", **details})
+
+    def entry(self, key, value):
+        if key in self.__sent and self.__sent[key] == value:
+            return
+        self.__sent[key] = value
+        self.__send({"type": "entry", "key": key, "value": value})
+
+    def day_reset(self, keys):
+        """Withdraw entries of a day that is generated again."""
+        for key in keys:
+            self.__sent.pop(key, None)
+        self.__send({"type": "day_reset", "keys": list(keys)})
+
+    def finished(self, **details):
+        self.__send({"type": "finished", **details})
+
+    def close(self):
+        if self.__connection is not None:
+            self.__connection.close()
+            self.__connection = None
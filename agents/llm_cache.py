@@ -0,0 +1,170 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import config
+import contextvars
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from rich.console import Console
+console = Console()
+
+_bypass = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+@contextmanager
+def bypass_cache():
+    """Skip cached responses for calls made inside this block (fresh responses are still stored)."""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+def normalize_input(value):
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, sort_keys=True, default=str)
+    return str(value)
+
+def response_cache_key(model, system_prompt, *inputs):
+    """Key on model id, temperature, formatted system prompt and normalized input."""
+    model_config = model.get_config()
+    payload = json.dumps([
+        model_config.get("model_id"),
+        model_config.get("params", {}).get("temperature"),
+        system_prompt,
+        [normalize_input(value) for value in inputs],
+    ])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    LLM response cache.
+    In-memory LRU with TTL and size-based eviction, backed by an optional sqlite file
+    so cached responses survive restarts.
+    """
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024, ttl_seconds=3600, disk_path=None):
+        self.__max_entries = max_entries
+        self.__max_bytes = max_bytes
+        self.__ttl_seconds = ttl_seconds
+        self.__entries = OrderedDict()
+        self.__bytes = 0
+        self.__lock = threading.Lock()
+        self.__disk = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+        if disk_path:
+            self.__disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self.__disk.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)"
+            )
+            self.__disk.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+            self.__disk.commit()
+
+    def __evict(self):
+        while self.__entries and (len(self.__entries) > self.__max_entries or self.__bytes > self.__max_bytes):
+            _, (_, _, size) = self.__entries.popitem(last=False)
+            self.__bytes -= size
+
+    def __put_memory(self, key, value, expires_at):
+        if key in self.__entries:
+            self.__bytes -= self.__entries.pop(key)[2]
+        size = len(value.encode())
+        self.__entries[key] = (expires_at, value, size)
+        self.__bytes += size
+        self.__evict()
+
+    def get(self, key):
+        now = time.time()
+        with self.__lock:
+            if _bypass.get() or config.llm_cache_bypass:
+                self.bypassed += 1
+                return None
+
+            entry = self.__entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self.__entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self.__bytes -= self.__entries.pop(key)[2]
+
+            if self.__disk is not None:
+                row = self.__disk.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                if row is not None:
+                    self.__put_memory(key, row[0], row[1])
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        expires_at = time.time() + self.__ttl_seconds
+        with self.__lock:
+            self.__put_memory(key, value, expires_at)
+            if self.__disk is not None:
+                self.__disk.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at)
+                )
+                self.__disk.commit()
+
+    def get_or_call(self, key, fn, validate=None):
+        """
+        Cached value of key, else fn()'s. The value is only stored when validate(value) holds,
+        so error text and answers that failed validation are returned once but never served again.
+        An exception from fn is raised and nothing is stored.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        value = str(fn())
+        if validate is None or validate(value):
+            self.set(key, value)
+        return value
+
+    def stats(self):
+        with self.__lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self.__entries),
+                "bytes": self.__bytes,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Return the process-wide response cache, or None when config.llm_cache_enabled is off."""
+    global _cache
+    if not config.llm_cache_enabled:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(
+                max_entries=config.llm_cache_max_entries,
+                max_bytes=config.llm_cache_max_bytes,
+                ttl_seconds=config.llm_cache_ttl_seconds,
+                disk_path=config.llm_cache_path,
+            )
+        return _cache
@@ -1,28 +1,131 @@
-from strands.models.gemini import GeminiModel
+from .scheduler import schedule_model
+from settings import get_settings
+from tracing import span
 
-import os
-from dotenv import load_dotenv
-load_dotenv(dotenv_path="./agents/.env")
+import config
+import inspect
+import threading
 
-from rich.traceback import install
 from rich.console import Console
 console = Console()
-install(show_locals=True)
 
-class Model:
-    def __init__(self, temperature = 0.7):
-        try:
-            self.model = GeminiModel(
+MODEL_ID = "gemini-2.5-flash"
+MAX_OUTPUT_TOKENS = 8192
+
+_shared_models = {}
+_shared_models_lock = threading.Lock()
+_model_factory = None
+
+def set_model_factory(factory):
+    """
+    Build agent models with factory(temperature) instead of GeminiModel, None restores Gemini.
+    A factory taking a model_id keyword is also told which tier's model it stands in for.
+    Used by offline benchmarks, must be called before agents are created.
+    """
+    global _model_factory
+    with _shared_models_lock:
+        _model_factory = factory
+        _shared_models.clear()
+
+class LazyGeminiModel:
+    """GeminiModel built on its first call, google.genai takes longer to import than the rest of the planner."""
+    def __init__(self, **model_args):
+        self.__model_args = model_args
+        self.__model = None
+        self.__lock = threading.Lock()
+
+    def __get(self):
+        if self.__model is None:
+            with self.__lock:
+                if self.__model is None:
+                    from strands.models.gemini import GeminiModel
+                    self.__model = GeminiModel(**self.__model_args)
+        return self.__model
+
+    def __getattr__(self, name):
+        return getattr(self.__get(), name)
+
+def _build_with_factory(temperature, model_id):
+    if "model_id" in inspect.signature(_model_factory).parameters:
+        return _model_factory(temperature, model_id=model_id)
+    return _model_factory(temperature)
+
+def get_shared_model(temperature = 0.7, model_id = MODEL_ID, max_output_tokens = MAX_OUTPUT_TOKENS):
+    """
+    Return the process-wide GeminiModel for this configuration.
+    Agents with the same settings share one model client instead of building their own,
+    and every call goes through the shared request scheduler.
+    """
+    key = (model_id, temperature, max_output_tokens)
+    with _shared_models_lock:
+        if key not in _shared_models and _model_factory is not None:
+            _shared_models[key] = schedule_model(_build_with_factory(temperature, model_id))
+        elif key not in _shared_models:
+            _shared_models[key] = schedule_model(LazyGeminiModel(
                 client_args={
-                    "api_key": os.getenv('GEMINI_API_KEY'),
+                    "api_key": get_settings().gemini_api_key,
                 },
-                model_id="gemini-2.5-flash", 
+                model_id=model_id,
                 params={
                     "temperature": temperature,
-                    "max_output_tokens": 8192,  
+                    "max_output_tokens": max_output_tokens,
                 }
-            )
+            ))
+        return _shared_models[key]
+
+def agent_model_settings(agent):
+    """
+    Model of agent from config.agent_models and config.model_tiers: tier, model_id, temperature,
+    max_output_tokens and fallback_model_id (None when its tier has no fallback).
+    """
+    settings = config.agent_models.get(agent, {})
+    tier = config.model_tiers.get(settings.get("tier"), {})
+    fallback = config.model_tiers[tier["fallback"]]["model_id"] if tier.get("fallback") else None
+    return {
+        "tier": settings.get("tier"),
+        "model_id": tier.get("model_id", MODEL_ID),
+        "temperature": settings.get("temperature", 0.7),
+        "max_output_tokens": settings.get("max_output_tokens", MAX_OUTPUT_TOKENS),
+        "fallback_model_id": fallback,
+    }
+
+def models_for(agent, temperature = None):
+    """(model, fallback model or None) of agent, temperature overrides the configured one."""
+    settings = agent_model_settings(agent)
+    if temperature is None:
+        temperature = settings["temperature"]
+    model = get_shared_model(temperature, settings["model_id"], settings["max_output_tokens"])
+    if settings["fallback_model_id"] is None:
+        return model, None
+    return model, get_shared_model(temperature, settings["fallback_model_id"], settings["max_output_tokens"])
+
+def model_id(model):
+    return (model.get_config() or {}).get("model_id")
+
+def run_validated(agent, run, validate, fallback_model):
+    """
+    Return run(None), the call on agent's own model, when validate(result) holds.
+    A result failing validation, or a call raising, is retried once as run(fallback_model) when agent has a fallback.
+    """
+    try:
+        result = run(None)
+        if fallback_model is None or validate(result):
+            return result
+        reason = f"output failed validation: {str(result)[:200]}"
+    except Exception as e:
+        if fallback_model is None:
+            raise
+        reason = f"call failed: {e}"
+
+    console.print(f"[yellow](llm_model.py) | {agent} {reason}, retried on {model_id(fallback_model)}[/yellow]")
+    with span("fallback", agent, model=model_id(fallback_model)):
+        return run(fallback_model)
+
+class Model:
+    def __init__(self, temperature = None, agent = "root"):
+        try:
+            self.model, self.fallback_model = models_for(agent, temperature)
         except Exception as e:
             console.print_exception(show_locals=True)
             console.print(f"[red](llm_model.py) | Error in model initialization: {e}[/red]")
-            raise
\ No newline at end of file
+            raise
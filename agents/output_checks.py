@@ -0,0 +1,50 @@
+from .context_encoder import parse_loose
+
+import json
+
+
+def parse_hotel(response_text):
+    """The hotel agent's answer as JSON, fenced or not. Raises ValueError when it is not JSON."""
+    response_text = str(response_text)
+    if '```json' in response_text:
+        response_text = response_text.split('```json')[1].split('```')[0]
+        # Handle escaped characters and clean up the JSON string
+        response_text = response_text.replace('\\n', '\n').replace('\\"', '"').strip()
+    elif '```' in response_text:
+        response_text = response_text.split('```')[1].split('```')[0]
+
+    return json.loads(response_text)
+
+
+def valid_trip(trip):
+    """Extracted trip with a city, both dates and at least one day."""
+    return trip is not None\
+        and all(isinstance(value, str) and value.strip() for value in (trip.city, trip.check_in, trip.check_out))\
+        and trip.vacation_period >= 1
+
+
+def valid_hotel(result):
+    try:
+        return isinstance(parse_hotel(result), (dict, list))
+    except ValueError:
+        return False
+
+
+def valid_places(result):
+    """{'choosen_places': [...]} as the place prompt asks, or its "no available places" answer."""
+    text = str(result)
+    places = parse_loose(text)
+    return (isinstance(places, dict) and isinstance(places.get("choosen_places"), list)) or "no available places" in text
+
+
+def valid_day(result):
+    return isinstance(parse_loose(str(result)), dict)
+
+
+# Checks an agent's output must pass before its tier's fallback model is tried
+VALIDATORS = {
+    "extract": valid_trip,
+    "hotel": valid_hotel,
+    "place": valid_places,
+    "itinerary": valid_day,
+}
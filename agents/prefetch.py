@@ -0,0 +1,282 @@
+from .itinerary_days import parse_date
+from .profile_store import get_profile_store, current_user
+from supabaseClient import supabase_client
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from tracing import span
+from travel_schema import PLACE_COLUMNS, select_places
+
+import config
+import contextvars
+import re
+import threading
+import time
+
+from rich.console import Console
+console = Console()
+
+PLACE_CATEGORIES = ["Beach", "Cultural", "Family", "Historical", "Landmark", "Museum", "Nature", "Shopping", "Theme Park"]
+
+# Words after "to", "in", "visit" that end a city name or are not one
+CITY_STOP_WORDS = {
+    "a", "an", "the", "my", "our", "and", "or", "for", "from", "on", "at", "in", "to", "with", "by",
+    "during", "next", "this", "start", "starting", "until", "day", "days", "week", "weeks", "trip",
+    "january", "february", "march", "april", "may", "june", "july", "august", "september",
+    "october", "november", "december",
+}
+CITY_LEAD = re.compile(r"\b(?:to|in|at|visit|visiting|around)\s+([a-z][a-z ]*)", re.IGNORECASE)
+DATE_TEXT = re.compile(r"\b(\d{4}-\d{2}-\d{2}|\d{1,2}\s+[a-z]+\s+\d{4})\b", re.IGNORECASE)
+DAYS_TEXT = re.compile(r"\b(\d{1,2})[\s-]*days?\b", re.IGNORECASE)
+
+
+def guess_city(prompt):
+    """First "to/in/visit <city>" in the prompt, capitalized like the tools query it, None when there is none."""
+    for match in CITY_LEAD.finditer(prompt or ""):
+        words = []
+        for word in match.group(1).split():
+            if word.lower() in CITY_STOP_WORDS or len(words) == 3:
+                break
+            words.append(word)
+        if words:
+            return " ".join(words).capitalize()
+    return None
+
+
+def guess_trip(prompt, profile):
+    """
+    Cheap local guess of what the agents will look up: city and dates from the prompt,
+    hotel bounds and place categories from the profile. None when no city is named.
+    """
+    city = guess_city(prompt)
+    if city is None:
+        return None
+
+    dates = [day for day in (parse_date(text) for text in DATE_TEXT.findall(prompt)) if day is not None]
+    days = DAYS_TEXT.search(prompt)
+    hotel = profile.get("preferences", {}).get("hotel", {})
+    attractions = profile.get("preferences", {}).get("attractions", {})
+
+    # Every category the place agent may pick: all but the excluded ones, unless the prompt asks for them
+    excluded = {name.strip().lower() for name in attractions.get("exclude_categories", [])}
+    mentioned = {name for name in PLACE_CATEGORIES if name.lower() in prompt.lower()}
+    categories = [name for name in PLACE_CATEGORIES if name.lower() not in excluded or name in mentioned]
+
+    return {
+        "city": city,
+        "check_in": dates[0] if dates else None,
+        "days": int(days.group(1)) if days else None,
+        "rating": hotel.get("min_rating", 0),
+        "max_price_per_night": hotel.get("max_budget_per_night"),
+        "categories": categories,
+        "max_ticket_price": attractions.get("max_ticket_price"),
+    }
+
+
+class Prefetch:
+    """
+    Hotels and places of one plan's guessed trip, queried on the prefetcher's threads while the models think.
+    Each lookup either answers from these rows or returns None, and the tool queries Supabase itself.
+    """
+    def __init__(self, prefetcher, prompt, user_id):
+        self.__prefetcher = prefetcher
+        self.__prompt = prompt
+        self.__user_id = user_id
+        self.__trip = None
+        self.__guessed = False
+        self.__lock = threading.Lock()
+        self.hotels = prefetcher.submit(self.__fetch_hotels)
+        # Places are searched in the local place index when it is on, nothing to prefetch
+        self.places = None if config.place_search else prefetcher.submit(self.__fetch_places)
+
+    def trip(self):
+        # Both fetches need the guess, whichever runs first makes it
+        with self.__lock:
+            if not self.__guessed:
+                self.__trip = guess_trip(self.__prompt, get_profile_store().profile(self.__user_id))
+                self.__guessed = True
+            return self.__trip
+
+    def __fetch_hotels(self):
+        trip = self.trip()
+        if trip is None:
+            return None
+
+        start = time.perf_counter()
+        query = supabase_client.schema('travel')\
+                .table("hotels")\
+                .select("*")\
+                .eq("city", trip["city"])\
+                .gte("rating", trip["rating"])
+        if trip["max_price_per_night"] is not None:
+            query = query.lte("price_per_night", trip["max_price_per_night"])
+        with span("supabase", "travel.hotels", op="prefetch"):
+            rows = query.limit(config.prefetch_hotel_rows).execute().data
+        return trip, sorted(rows, key=lambda row: row["id"]), len(rows) < config.prefetch_hotel_rows, time.perf_counter() - start
+
+    def __fetch_places(self):
+        trip = self.trip()
+        if trip is None:
+            return None
+
+        def select(columns):
+            query = supabase_client.schema('travel')\
+                    .table("places")\
+                    .select(columns)\
+                    .eq("city", trip["city"])\
+                    .in_("category", trip["categories"])
+            if trip["max_ticket_price"] is not None:
+                query = query.lte("ticket_price", trip["max_ticket_price"])
+            with span("supabase", "travel.places", op="prefetch"):
+                return query.limit(config.prefetch_place_rows).execute().data
+
+        start = time.perf_counter()
+        rows = select_places(select, "id", "ticket_price")
+        return trip, sorted(rows, key=lambda row: row["id"]), len(rows) < config.prefetch_place_rows, time.perf_counter() - start
+
+    def __result(self, future):
+        # A fetch still waiting for a thread is dropped, the tool's own query is quicker
+        if not future.running() and future.cancel():
+            return None, 0.0
+
+        start = time.perf_counter()
+        try:
+            return future.result(timeout=config.prefetch_wait_seconds), time.perf_counter() - start
+        except FutureTimeout:
+            return None, time.perf_counter() - start
+        except Exception as e:
+            console.print(f"[yellow](prefetch.py) | Prefetch failed, tools query Supabase:[/yellow] {e}")
+            return None, time.perf_counter() - start
+
+    def __answer(self, future, city, covered, matches, limit):
+        """
+        Rows the tool's query would return, or None. Matching rows are always valid answers,
+        fewer than limit are only the full answer when the fetch was complete and covered the query's bounds.
+        """
+        fetched, waited = self.__result(future)
+        if fetched is None or fetched[0]["city"] != city:
+            self.__prefetcher.record(False, waited)
+            return None
+
+        trip, rows, complete, seconds = fetched
+        found = [row for row in rows if matches(row)]
+        if len(found) < limit and not (complete and covered(trip)):
+            self.__prefetcher.record(False, waited)
+            return None
+
+        self.__prefetcher.record(True, waited, seconds)
+        return found[:limit]
+
+    def find_hotels(self, city, rating, max_price_per_night=None, amenities=None, limit=1):
+        """Same filters as the travel.hotels queries in HotelAgent, amenities are matched exactly when given."""
+        def matches(row):
+            return (row.get("rating") or 0) >= rating\
+                and (max_price_per_night is None or (row.get("price_per_night") or 0) <= max_price_per_night)\
+                and all(row.get(name) == wanted for name, wanted in (amenities or {}).items())
+
+        def covered(trip):
+            return rating >= trip["rating"] and (
+                trip["max_price_per_night"] is None
+                or (max_price_per_night is not None and max_price_per_night <= trip["max_price_per_night"])
+            )
+
+        return self.__answer(self.hotels, city, covered, matches, limit)
+
+    def find_places(self, city, category, max_ticket_price, limit=5):
+        """Same filters as the travel.places query in PlaceAgent, an empty category matches any."""
+        if self.places is None:
+            return None
+
+        def matches(row):
+            return (not category or row.get("category") in category) and (row.get("ticket_price") or 0) <= max_ticket_price
+
+        def covered(trip):
+            return set(category or PLACE_CATEGORIES) <= set(trip["categories"]) and (
+                trip["max_ticket_price"] is None or max_ticket_price <= trip["max_ticket_price"]
+            )
+
+        found = self.__answer(self.places, city, covered, matches, limit)
+        if found is None:
+            return None
+        return [{column: row.get(column) for column in PLACE_COLUMNS} for row in found]
+
+
+class Prefetcher:
+    """
+    Starts a Prefetch for each plan and counts how tool lookups went.
+    Latency saved by a hit is the prefetch query's own time less what the tool waited for it.
+    """
+    def __init__(self, workers=8):
+        self.__executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self.__lock = threading.Lock()
+
+        self.plans = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.waited_seconds = 0.0
+
+    def submit(self, fn):
+        # Run in a copy of the plan's context, so the queries are spans of its trace
+        return self.__executor.submit(contextvars.copy_context().run, fn)
+
+    def start(self, prompt, user_id):
+        with self.__lock:
+            self.plans += 1
+        return Prefetch(self, prompt, user_id)
+
+    def record(self, hit, waited, seconds=0.0):
+        with self.__lock:
+            if hit:
+                self.hits += 1
+                self.saved_seconds += max(0.0, seconds - waited)
+            else:
+                self.misses += 1
+            self.waited_seconds += waited
+
+    def stats(self):
+        with self.__lock:
+            lookups = self.hits + self.misses
+            return {
+                "plans": self.plans,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+                "waited_seconds": round(self.waited_seconds, 3),
+            }
+
+
+_prefetch = contextvars.ContextVar("planner_prefetch", default=None)
+
+@contextmanager
+def prefetching(prompt):
+    """Prefetch the trip prompt asks for while this block plans it, tools read it with current_prefetch()."""
+    prefetcher = get_prefetcher()
+    if prefetcher is None:
+        yield None
+        return
+
+    prefetch = prefetcher.start(prompt, current_user())
+    token = _prefetch.set(prefetch)
+    try:
+        yield prefetch
+    finally:
+        _prefetch.reset(token)
+
+def current_prefetch():
+    return _prefetch.get()
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+def get_prefetcher():
+    """The shared Prefetcher when config.prefetch_enabled is on, None otherwise or when the travel replica answers tools locally."""
+    global _prefetcher
+    if not config.prefetch_enabled or config.use_travel_replica:
+        return None
+
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher(workers=config.prefetch_workers)
+        return _prefetcher
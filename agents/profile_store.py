@@ -0,0 +1,250 @@
+from .context_encoder import profile_for
+from collections import OrderedDict
+from contextlib import contextmanager
+from settings import ROOT, read_prompt, load_user_profile
+from supabaseClient import supabase_client
+from tracing import span
+
+import config
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Agents whose system prompt is formatted with the user's profile
+PROMPTS = {
+    "hotel": "agent-hotel-prompt.txt",
+    "place": "agent-place-prompt.txt",
+    "itinerary": "agent-itinerary-prompt.txt",
+}
+
+_user = contextvars.ContextVar("planner_user_id", default=None)
+
+@contextmanager
+def as_user(user_id):
+    """Plan for user_id inside this block, worker threads started with a copy of the context keep it."""
+    token = _user.set(user_id)
+    try:
+        yield
+    finally:
+        _user.reset(token)
+
+def current_user():
+    return _user.get() or config.default_user_id
+
+
+class LocalProfiles:
+    """
+    Local stand-in for planner.user_profiles: a JSON file of {user_id: profile}, re-read when it changes,
+    with user_profile.json as the profile of its own user_id. The version of a profile is a hash of its content.
+    """
+    def __init__(self, path):
+        self.__path = ROOT / path
+        self.__mtime = None
+        self.__profiles = {}
+        self.__lock = threading.Lock()
+
+    def __version(self, profile):
+        return hashlib.sha1(json.dumps(profile, sort_keys=True).encode()).hexdigest()
+
+    def __reload(self):
+        try:
+            mtime = os.stat(self.__path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self.__mtime == mtime and self.__profiles:
+            return
+
+        default = load_user_profile()
+        profiles = {default.get("user_id", config.default_user_id): default}
+        if mtime is not None:
+            with open(self.__path, "r") as f:
+                profiles.update(json.load(f))
+        self.__profiles = {user_id: (profile, self.__version(profile)) for user_id, profile in profiles.items()}
+        self.__mtime = mtime
+
+    def fetch(self, user_id):
+        """(profile, version) of user_id, None for an unknown user."""
+        with self.__lock:
+            self.__reload()
+            return self.__profiles.get(user_id)
+
+    def version(self, user_id):
+        entry = self.fetch(user_id)
+        return entry[1] if entry else None
+
+    def save(self, user_id, profile):
+        with self.__lock:
+            self.__reload()
+            saved = {}
+            if self.__mtime is not None:
+                with open(self.__path, "r") as f:
+                    saved = json.load(f)
+            saved[user_id] = profile
+
+            # Written to a temporary file first, other processes never read a half-written file
+            temp_path = f"{self.__path}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump(saved, f, indent=2)
+            os.replace(temp_path, self.__path)
+
+            self.__mtime = None
+            self.__reload()
+            return self.__profiles[user_id][1]
+
+
+class SupabaseProfiles:
+    """planner.user_profiles (sql/user_profiles.sql), every save bumps the row's version."""
+    def fetch(self, user_id):
+        with span("supabase", "planner.user_profiles", op="select"):
+            rows = supabase_client.schema('planner')\
+                    .table("user_profiles")\
+                    .select("profile, version")\
+                    .eq("user_id", user_id)\
+                    .limit(1)\
+                    .execute().data
+        if not rows:
+            return None
+        return rows[0]["profile"], rows[0]["version"]
+
+    def version(self, user_id):
+        with span("supabase", "planner.user_profiles", op="select"):
+            rows = supabase_client.schema('planner')\
+                    .table("user_profiles")\
+                    .select("version")\
+                    .eq("user_id", user_id)\
+                    .limit(1)\
+                    .execute().data
+        return rows[0]["version"] if rows else None
+
+    def save(self, user_id, profile):
+        with span("supabase", "planner.save_user_profile", op="rpc"):
+            return supabase_client.schema('planner')\
+                    .rpc("save_user_profile", {"p_user_id": user_id, "p_profile": profile})\
+                    .execute().data
+
+
+class ProfileStore:
+    """
+    User profiles by user id, and an LRU of system prompts compiled for each (user, agent).
+    Profiles are cached and their version is checked again after refresh_seconds, a changed profile
+    drops its compiled prompts. Saves through the store apply at once in this process.
+    Returned profiles are shared, callers must not modify them.
+    """
+    def __init__(self, backend, max_prompts=1024, refresh_seconds=30):
+        self.__backend = backend
+        self.__max_prompts = max_prompts
+        self.__refresh_seconds = refresh_seconds
+        self.__profiles = OrderedDict()
+        self.__prompts = OrderedDict()
+        self.__lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.profile_loads = 0
+        self.invalidations = 0
+
+    def __load(self, user_id):
+        entry = self.__backend.fetch(user_id)
+        if entry is None and user_id == config.default_user_id:
+            # A single-user setup without a profile row plans with user_profile.json
+            entry = (load_user_profile(), None)
+        if entry is None:
+            raise KeyError(f"unknown user: {user_id}")
+        self.profile_loads += 1
+        return entry
+
+    def __invalidate(self, user_id):
+        self.__profiles.pop(user_id, None)
+        for key in [key for key in self.__prompts if key[0] == user_id]:
+            del self.__prompts[key]
+        self.invalidations += 1
+
+    def __entry(self, user_id):
+        now = time.time()
+        with self.__lock:
+            entry = self.__profiles.get(user_id)
+        if entry is not None and now - entry[2] < self.__refresh_seconds:
+            return entry
+
+        if entry is not None and self.__backend.version(user_id) == entry[1]:
+            entry = (entry[0], entry[1], now)
+        else:
+            profile, version = self.__load(user_id)
+            entry = (profile, version, now)
+
+        with self.__lock:
+            previous = self.__profiles.get(user_id)
+            if previous is not None and previous[1] != entry[1]:
+                self.__invalidate(user_id)
+            self.__profiles[user_id] = entry
+            self.__profiles.move_to_end(user_id)
+            # Users not seen for a while are loaded again, their prompts age out of the prompt LRU on their own
+            while len(self.__profiles) > self.__max_prompts:
+                self.__profiles.popitem(last=False)
+        return entry
+
+    def profile(self, user_id):
+        return self.__entry(user_id)[0]
+
+    def system_prompt(self, user_id, agent):
+        """agent's system prompt formatted with user_id's profile, compiled once per profile version."""
+        profile, version, _ = self.__entry(user_id)
+        key = (user_id, agent)
+        with self.__lock:
+            cached = self.__prompts.get(key)
+            if cached is not None and cached[0] == version:
+                self.__prompts.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        prompt = read_prompt(PROMPTS[agent]).format(user_profile=profile_for(agent, profile))
+        with self.__lock:
+            self.__prompts[key] = (version, prompt)
+            self.__prompts.move_to_end(key)
+            while len(self.__prompts) > self.__max_prompts:
+                self.__prompts.popitem(last=False)
+        return prompt
+
+    def save(self, user_id, profile):
+        """Store user_id's profile, its compiled prompts are rebuilt on next use. Return the new version."""
+        version = self.__backend.save(user_id, profile)
+        with self.__lock:
+            self.__invalidate(user_id)
+            self.__profiles[user_id] = (profile, version, time.time())
+        return version
+
+    def stats(self):
+        with self.__lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "profile_loads": self.profile_loads,
+                "invalidations": self.invalidations,
+                "users": len(self.__profiles),
+                "prompts": len(self.__prompts),
+            }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_profile_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            if config.profile_store == "supabase":
+                backend = SupabaseProfiles()
+            else:
+                backend = LocalProfiles(config.profile_store_path)
+            _store = ProfileStore(
+                backend,
+                max_prompts=config.profile_prompt_cache_size,
+                refresh_seconds=config.profile_refresh_seconds,
+            )
+        return _store
@@ -1,32 +1,83 @@
-from strands import Agent, tool
-from strands.models.gemini import GeminiModel
-from .llm_model import Model
+from strands import Agent
+from .llm_model import Model, models_for, run_validated
+from .agent_pool import AgentPool
 from .agent_place import PlaceAgent
 from .agent_hotel import HotelAgent
 from .agent_itinerary import ItineraryAgent
-from supabaseClient import supabase_client
+from .agent_tracing import TraceHooks
+from .context_encoder import ToolResultRefs, plan_context
+from .output_checks import valid_trip
+from .profile_store import as_user, current_user
+from .prefetch import prefetching
+from pydantic import BaseModel, Field
+from concurrent.futures import ThreadPoolExecutor
+from tracing import span
+from settings import read_prompt
 
-import uuid
-import requests
+import config
+import asyncio
+import contextvars
+import functools
+import inspect
 import json
-import os
-from dotenv import load_dotenv
-load_dotenv()
+import time
 
-from rich.traceback import install
 from rich.console import Console
 console = Console()
-install(show_locals=True)
+
+
+class TripRequest(BaseModel):
+    city: str = Field(description="Destination city")
+    check_in: str = Field(description="Date user hotel check-in (ex, 2 December 2025)")
+    check_out: str = Field(description="Date user hotel check-out (ex, 3 December 2025)")
+    vacation_period: int = Field(description="User vacation period (days)")
+    hotel_criteria: str = Field(description="User hotel criteria (city,rating,name,etc)")
+    hotel_wishes: str = Field(default="", description="Hotel wishes beyond the destination city (hotel name, facilities, etc), empty if none")
+    place_description: str = Field(description="Description of places user want to visit")
+
+
+def run_stage(on_stage, stage, fn, *args, **kwargs):
+    """Call fn in a stage span and report its wall time as on_stage(stage, seconds), when a callback is given."""
+    start = time.perf_counter()
+    try:
+        with span("stage", stage):
+            return fn(*args, **kwargs)
+    finally:
+        if on_stage is not None:
+            on_stage(stage, time.perf_counter() - start)
+
+
+async def run_stage_async(on_stage, executor, stage, fn, *args, **kwargs):
+    """run_stage for the async pipeline: coroutine functions are awaited, blocking ones run on executor."""
+    start = time.perf_counter()
+    try:
+        with span("stage", stage):
+            if inspect.iscoroutinefunction(fn):
+                return await fn(*args, **kwargs)
+            context = contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(
+                executor, functools.partial(context.run, fn, *args, **kwargs)
+            )
+    finally:
+        if on_stage is not None:
+            on_stage(stage, time.perf_counter() - start)
 
 
 class StrandsAgent(Model):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, hitl=True):
+        # Routing runs on its tier without a fallback, a second attempt would call the tools and book again
+        super().__init__(agent="root")
         self.__import_prompt__()
+        self.__extract_model, self.__extract_fallback_model = models_for("extract")
+
+        self.__hotel_agent = HotelAgent(hitl = hitl)
+        self.__place_agent = PlaceAgent()
+        self.__itenerary_agent = ItineraryAgent()
 
-        self.__hotel_agent = HotelAgent(temperature = 0.7)
-        self.__place_agent = PlaceAgent(temperature = 0.7)
-        self.__itenerary_agent = ItineraryAgent(temperature = 0.7)
+        self.__agent_pool = AgentPool(self.__build_agent)
+        self.__extract_agent_pool = AgentPool(self.__build_extract_agent)
+        # Blocking stages of async plans run here, plans waiting for approval hold none of these threads
+        self.__stage_executor = ThreadPoolExecutor(max_workers=config.pipeline_stage_workers, thread_name_prefix="plan-stage")
 
     def __custom_callback_handler(self, **kwargs):
         if "current_tool_use" in kwargs and kwargs["current_tool_use"].get("name"):
@@ -34,19 +85,16 @@ class StrandsAgent(Model):
     
     def __import_prompt__(self):
         try:
-            with open("./system_prompts/root-agent-prompt.txt","r") as f:
-                self.__sys_prompt = f.read()
-            
-            with open("./user_profile.json","r") as f:
-                self.__user_profile = json.load(f)
+            self.__sys_prompt = read_prompt("root-agent-prompt.txt")
+            self.__extract_sys_prompt = read_prompt("root-agent-extract-prompt.txt")
 
         except Exception as e:
             console.print(f"[red](root_agent.py) | Error importing prompt & user profile:[/red]: {e}")
             return f"(root_agent.py) | Error importing prompt & user profile: {str(e)}"
 
-    def __initialize_agent(self):
+    def __build_agent(self):
         try:
-            self.__agent = Agent(
+            return Agent(
                 model=self.model,
                 tools=[
                     self.__hotel_agent.call_hotel_agent_with_hitl, 
@@ -54,18 +102,160 @@ class StrandsAgent(Model):
                     self.__itenerary_agent.call_itinerary_agent
                 ],
                 system_prompt=self.__sys_prompt,
-                callback_handler=self.__custom_callback_handler
+                callback_handler=self.__custom_callback_handler,
+                hooks=[TraceHooks("root"), ToolResultRefs()]
             )
 
         except Exception as e:
             console.print(f"[red](root_agent.py) | Error initialize agent:[/red]: {e}")
-            return f"(root_agent.py) | Error initialize agent: {str(e)}"
+            raise
+
+    def __build_extract_agent(self):
+        try:
+            return Agent(
+                model=self.__extract_model,
+                system_prompt=self.__extract_sys_prompt,
+                callback_handler=None,
+                hooks=[TraceHooks("extract")]
+            )
+
+        except Exception as e:
+            console.print(f"[red](root_agent.py) | Error initialize extract agent:[/red]: {e}")
+            raise
+
+    def __extract_trip(self, prompt):
+        def run(model):
+            with self.__extract_agent_pool.acquire() as agent:
+                agent.model = model or self.__extract_model
+                return agent(prompt, structured_output_model=TripRequest).structured_output
+
+        return run_validated("extract", run, valid_trip, self.__extract_fallback_model)
   
-    def call_agent(self, prompt):
+    def call_agent(self, prompt, user_id=None):
+        try:
+            # Tool result refs in the root agent's history resolve only within this plan
+            with as_user(user_id or current_user()), prefetching(prompt), plan_context(),\
+                    self.__agent_pool.acquire() as agent:
+                return agent(prompt)
+
+        except Exception as e:
+            console.print_exception(show_locals=True)
+            console.print(f"[red](root_agent.py) | Error processing your prompt:[/red]: {e}")
+            return f"(root_agent.py) | Error processing your prompt: {str(e)}"
+
+    def call_agent_parallel(self, prompt, on_itinerary_entry=None, on_stage=None, user_id=None, on_itinerary_reset=None):
+        """
+        Run the planning workflow without the root routing turns.
+        Trip details are extracted once, hotel and place agents run concurrently,
+        and their results are joined before the itinerary agent.
+        When on_itinerary_entry(key, value) is given, the itinerary is streamed entry by entry,
+        on_itinerary_reset(keys) withdraws the entries of a day that is generated again.
+        on_stage(stage, seconds) receives the wall time of root, hotel, place and itinerary stages.
+        user_id picks the profile the sub-agents plan and book with, config.default_user_id when None.
+        Hotels and places of the city named in the prompt are prefetched while the trip is extracted.
+        """
+        with as_user(user_id or current_user()), span("pipeline", "plan"), prefetching(prompt):
+            return self.__plan_parallel(prompt, on_itinerary_entry, on_stage, on_itinerary_reset)
+
+    async def call_agent_parallel_async(self, prompt, on_itinerary_entry=None, on_stage=None, user_id=None, on_stage_start=None,
+                                        on_itinerary_reset=None):
+        """
+        call_agent_parallel for an event loop. Model and database work runs in worker threads,
+        while hotel approvals suspend the plan without holding one (config.approval_mode = "queue").
+        on_stage_start(stage) is called on the event loop as each stage begins.
+        """
+        with as_user(user_id or current_user()), span("pipeline", "plan"), prefetching(prompt):
+            return await self.__plan_parallel_async(prompt, on_itinerary_entry, on_stage, on_stage_start, on_itinerary_reset)
+
+    async def __plan_parallel_async(self, prompt, on_itinerary_entry, on_stage, on_stage_start, on_itinerary_reset):
+        def stage(name, fn, *args, **kwargs):
+            if on_stage_start is not None:
+                on_stage_start(name)
+            return run_stage_async(on_stage, self.__stage_executor, name, fn, *args, **kwargs)
+
+        try:
+            trip = await stage("root", self.__extract_trip, prompt)
+            console.print(f"[cyan](root_agent.py) | Trip request:[/cyan]: {trip}")
+
+            hotel_criteria = trip.hotel_criteria if trip.hotel_wishes else json.dumps({"city": trip.city})
+
+            hotels, places = await asyncio.gather(
+                stage("hotel", self.__hotel_agent.call_hotel_agent_async, hotel_criteria, trip.check_in, trip.check_out),
+                stage("place", self.__place_agent.call_place_agent, trip.place_description),
+            )
+            places = str(places)
+
+            if on_itinerary_entry is not None:
+                return await stage(
+                    "itinerary",
+                    self.__itenerary_agent.stream_itinerary,
+                    vacation_period=trip.vacation_period,
+                    places=places,
+                    hotels=hotels,
+                    on_entry=on_itinerary_entry,
+                    start_date=trip.check_in,
+                    on_reset=on_itinerary_reset
+                )
+
+            return await stage(
+                "itinerary",
+                self.__itenerary_agent.call_itinerary_agent,
+                vacation_period=trip.vacation_period,
+                places=places,
+                hotels=hotels,
+                start_date=trip.check_in
+            )
+
+        except Exception as e:
+            console.print_exception(show_locals=True)
+            console.print(f"[red](root_agent.py) | Error processing your prompt:[/red]: {e}")
+            return f"(root_agent.py) | Error processing your prompt: {str(e)}"
+
+    def __plan_parallel(self, prompt, on_itinerary_entry, on_stage, on_itinerary_reset):
         try:
-            self.__initialize_agent()
-            agent = self.__agent(prompt)
-            return agent
+            trip = run_stage(on_stage, "root", self.__extract_trip, prompt)
+            console.print(f"[cyan](root_agent.py) | Trip request:[/cyan]: {trip}")
+
+            # Without extra wishes the criteria is structured, so the hotel agent can rank without an LLM
+            hotel_criteria = trip.hotel_criteria if trip.hotel_wishes else json.dumps({"city": trip.city})
+
+            # Each branch runs in a copy of this context so its spans stay in the plan's trace
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                hotel_future = executor.submit(
+                    contextvars.copy_context().run,
+                    run_stage, on_stage, "hotel",
+                    self.__hotel_agent.call_hotel_agent_with_hitl,
+                    hotel_criteria, trip.check_in, trip.check_out
+                )
+                place_future = executor.submit(
+                    contextvars.copy_context().run,
+                    run_stage, on_stage, "place",
+                    self.__place_agent.call_place_agent,
+                    trip.place_description
+                )
+                hotels = hotel_future.result()
+                places = str(place_future.result())
+
+            if on_itinerary_entry is not None:
+                return run_stage(
+                    on_stage, "itinerary",
+                    self.__itenerary_agent.stream_itinerary,
+                    vacation_period=trip.vacation_period,
+                    places=places,
+                    hotels=hotels,
+                    on_entry=on_itinerary_entry,
+                    start_date=trip.check_in,
+                    on_reset=on_itinerary_reset
+                )
+
+            return run_stage(
+                on_stage, "itinerary",
+                self.__itenerary_agent.call_itinerary_agent,
+                vacation_period=trip.vacation_period,
+                places=places,
+                hotels=hotels,
+                start_date=trip.check_in
+            )
 
         except Exception as e:
             console.print_exception(show_locals=True)
@@ -0,0 +1,98 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def coordinates(row):
+    """(latitude, longitude) of a place or hotel row, None when it has no usable coordinates."""
+    if not isinstance(row, dict):
+        return None
+    try:
+        return float(row["latitude"]), float(row["longitude"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def distance_matrix(points):
+    """Great-circle distance in km between every pair of (latitude, longitude) points, as an n x n array."""
+    radians = np.radians(np.asarray(points, dtype=float).reshape(-1, 2))
+    lat, lon = radians[:, 0], radians[:, 1]
+    a = (
+        np.sin((lat[:, None] - lat[None, :]) / 2) ** 2
+        + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin((lon[:, None] - lon[None, :]) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def nearest_neighbor(dist, start=0):
+    """Tour that always moves to the closest unvisited point, starting at start."""
+    visited = np.zeros(len(dist), dtype=bool)
+    visited[start] = True
+    tour = [start]
+    for _ in range(len(dist) - 1):
+        following = int(np.argmin(np.where(visited, np.inf, dist[tour[-1]])))
+        visited[following] = True
+        tour.append(following)
+    return np.array(tour)
+
+
+def two_opt(dist, tour, closed=True, max_rounds=None):
+    """
+    Shorten tour by reversing segments until no reversal helps. tour[0] stays first.
+    Every reversal of a round is scored at once as an n x n array and the best one is applied.
+    An open tour (no way back to the start) is solved as a closed one through a zero-distance end point.
+    """
+    tour = np.array(tour)
+    if not closed:
+        dist = np.pad(dist, ((0, 1), (0, 1)))
+        tour = np.append(tour, len(dist) - 1)
+
+    n = len(tour)
+    if n < 4:
+        return tour if closed else tour[:-1]
+
+    # Reversing tour[i + 1:j + 1] swaps edges (i, i + 1) and (j, j + 1) for (i, j) and (i + 1, j + 1)
+    allowed = np.triu(np.ones((n, n), dtype=bool), k=2)
+    allowed[0, n - 1] = False
+    if not closed:
+        allowed[:, n - 1] = False  # the end point never moves
+
+    for _ in range(max_rounds or n * n):
+        following = np.roll(tour, -1)
+        edge = dist[tour, following]
+        gain = dist[tour[:, None], tour[None, :]] + dist[following[:, None], following[None, :]] - edge[:, None] - edge[None, :]
+        gain[~allowed] = 0
+        i, j = np.unravel_index(np.argmin(gain), gain.shape)
+        if gain[i, j] > -1e-9:
+            break
+        tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1]
+
+    return tour if closed else tour[:-1]
+
+
+def tour_length(dist, tour, closed=True):
+    tour = np.asarray(tour)
+    length = dist[tour[:-1], tour[1:]].sum()
+    return float(length + dist[tour[-1], tour[0]]) if closed else float(length)
+
+
+def plan_route(start, points, closed=True):
+    """
+    Visiting order of points (indices into points) from start, returning to start when closed.
+    Nearest neighbour gives the first tour, 2-opt removes its crossings.
+    """
+    if not points:
+        return []
+    dist = distance_matrix([start] + list(points))
+    tour = two_opt(dist, nearest_neighbor(dist), closed=closed)
+    return [int(index) - 1 for index in tour[1:]]
+
+
+def leg_distances(start, points):
+    """km from start to points[0], then between each consecutive pair."""
+    if not points:
+        return []
+    stops = np.radians(np.asarray([start] + list(points), dtype=float))
+    lat, lon = stops[:, 0], stops[:, 1]
+    a = np.sin(np.diff(lat) / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
+    return (2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))).tolist()
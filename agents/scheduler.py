@@ -0,0 +1,414 @@
+from strands.models import Model as StrandsModel
+from strands.types.exceptions import ModelThrottledException
+from contextlib import contextmanager
+from collections import deque
+
+import asyncio
+import config
+import contextvars
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+
+from tracing import SampledLogger
+
+from rich.console import Console
+console = Console()
+log = SampledLogger(console)
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+_priority = contextvars.ContextVar("request_priority", default="interactive")
+
+@contextmanager
+def request_priority(name):
+    """Run model calls made inside the block with this priority class (interactive or batch)."""
+    if name not in PRIORITIES:
+        raise ValueError(f"unknown priority: {name}")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def estimate_tokens(messages, system_prompt):
+    # ~4 characters per token is close enough for admission, actual usage is settled afterwards
+    return (len(json.dumps(messages, default=str)) + len(system_prompt or "")) // 4
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.level = float(per_minute)
+        self.rate = per_minute / 60
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until amount is available, 0 when it already is."""
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+
+class RequestScheduler:
+    """
+    Admission control shared by every agent in the process.
+    Requests wait in a priority queue until a concurrency slot and request/token budget are free.
+    The concurrency limit adapts: it halves on throttling, shrinks when latency climbs well above
+    the best observed, and grows by about one slot per round trip of healthy calls.
+    Agents run their model calls on separate event loops, so waiting is done with threading primitives.
+    """
+    def __init__(self, rpm, tpm, initial_concurrency=8, min_concurrency=1, max_concurrency=32,
+                 latency_tolerance=2.0, window=200):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.limit = float(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_tolerance = latency_tolerance
+
+        self.in_flight = 0
+        self.throttled = 0
+        self.completed = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.__base_latency = None
+        self.__last_throttle = 0.0
+        self.__latencies = deque(maxlen=50)
+        self.__first_event = deque(maxlen=window)
+
+        self.__queue = []
+        self.__sequence = itertools.count()
+        self.__condition = threading.Condition()
+
+    def __admissible(self, tokens, now):
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        if self.in_flight >= int(self.limit):
+            return None
+        return max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+
+    def __admit(self, tokens):
+        self.in_flight += 1
+        self.requests.level -= 1
+        self.tokens.level -= tokens
+
+    def acquire(self, priority, tokens):
+        """Block until the request may go out, higher priority classes are admitted first."""
+        entry = (PRIORITIES[priority], next(self.__sequence))
+        with self.__condition:
+            heapq.heappush(self.__queue, entry)
+            try:
+                while True:
+                    wait = None
+                    if self.__queue[0] == entry:
+                        wait = self.__admissible(tokens, time.monotonic())
+                        if wait == 0:
+                            self.__admit(tokens)
+                            return
+                    # No slot: woken by release(), short of budget: sleep until the bucket refills
+                    self.__condition.wait(wait if wait else None)
+            finally:
+                self.__queue.remove(entry)
+                heapq.heapify(self.__queue)
+                self.__condition.notify_all()
+
+    def try_acquire(self, tokens):
+        """Admit right away or not at all, used for hedged duplicates so they never queue. Counts the hedge when admitted."""
+        with self.__condition:
+            if self.__queue or self.__admissible(tokens, time.monotonic()) != 0:
+                return False
+            self.__admit(tokens)
+            self.hedged += 1
+            return True
+
+    def hedge_won(self):
+        with self.__condition:
+            self.hedge_wins += 1
+
+    def release(self, estimated_tokens, used_tokens=None, latency=None, throttled=False):
+        with self.__condition:
+            self.in_flight -= 1
+            if used_tokens is not None:
+                self.tokens.level -= used_tokens - estimated_tokens
+
+            now = time.monotonic()
+            if throttled:
+                self.throttled += 1
+                # One decrease per round trip, the 429s of calls already in flight describe the same overload
+                if now - self.__last_throttle > (self.__base_latency or 1.0):
+                    self.limit = max(self.min_concurrency, self.limit / 2)
+                    self.__last_throttle = now
+            elif latency is not None:
+                self.completed += 1
+                self.__adapt(latency)
+
+            self.__condition.notify_all()
+
+    def __adapt(self, latency):
+        # Compare the recent median with the best median seen, single slow calls do not move it
+        self.__latencies.append(latency)
+        recent = sorted(self.__latencies)[len(self.__latencies) // 2]
+        if self.__base_latency is None or recent < self.__base_latency:
+            self.__base_latency = recent
+        else:
+            # Let the baseline drift up slowly so it follows load the service can sustain
+            self.__base_latency += (recent - self.__base_latency) * 0.01
+
+        if len(self.__latencies) >= 10 and recent > self.__base_latency * self.latency_tolerance:
+            self.limit = max(self.min_concurrency, self.limit * 0.95)
+        else:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+    def observe_first_event(self, seconds):
+        with self.__condition:
+            self.__first_event.append(seconds)
+
+    def hedge_delay(self, percentile, min_samples=20):
+        """Time-to-first-event percentile past which a call counts as stuck, None until enough samples."""
+        with self.__condition:
+            samples = sorted(self.__first_event)
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * percentile))]
+
+    def stats(self):
+        with self.__condition:
+            return {
+                "limit": round(self.limit, 2), "in_flight": self.in_flight, "queued": len(self.__queue),
+                "completed": self.completed, "throttled": self.throttled,
+                "hedged": self.hedged, "hedge_wins": self.hedge_wins,
+            }
+
+
+class _Attempt:
+    """One model stream pumped into a queue, so two attempts can race for the first event."""
+    def __init__(self, scheduler, stream, estimated_tokens):
+        self.scheduler = scheduler
+        self.estimated_tokens = estimated_tokens
+        self.events = asyncio.Queue()
+        self.started = time.perf_counter()
+        self.used_tokens = None
+        self.released = False
+        self.task = asyncio.ensure_future(self.__pump(stream))
+
+    async def __pump(self, stream):
+        try:
+            async for event in stream:
+                if "metadata" in event:
+                    self.used_tokens = event["metadata"].get("usage", {}).get("totalTokens")
+                await self.events.put(("event", event))
+            await self.events.put(("done", None))
+        except Exception as e:
+            await self.events.put(("error", e))
+
+    def release(self, throttled=False, observe=True):
+        if not self.released:
+            self.released = True
+            latency = time.perf_counter() - self.started if observe and not throttled else None
+            self.scheduler.release(self.estimated_tokens, self.used_tokens, latency, throttled)
+
+    def fail(self, error):
+        self.release(throttled=isinstance(error, ModelThrottledException), observe=False)
+
+    def cancel(self):
+        # Abandoned attempts say nothing about service latency, they only free their slot
+        self.task.cancel()
+        self.release(observe=False)
+
+
+class ScheduledModel(StrandsModel):
+    """
+    Strands model wrapper that sends every call through the shared RequestScheduler.
+    Throttled calls are retried with jittered backoff, and interactive calls stuck past the
+    time-to-first-event percentile get one hedged duplicate, whichever answers first is kept.
+    """
+    def __init__(self, model, scheduler, max_retries=4, base_backoff=1.0,
+                 hedge_percentile=0.95, hedge_priorities=("interactive",)):
+        self.model = model
+        self.scheduler = scheduler
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.hedge_percentile = hedge_percentile
+        self.hedge_priorities = hedge_priorities
+
+    def update_config(self, **model_config):
+        self.model.update_config(**model_config)
+
+    def get_config(self):
+        return self.model.get_config()
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    async def __acquire(self, priority, estimated_tokens):
+        """
+        Wait for a scheduler slot in a worker thread. A cancelled wait (plan cancelled or timed out)
+        cannot stop the thread, so the slot it takes afterwards is released right away instead of leaking.
+        """
+        lock = threading.Lock()
+        state = {"acquired": False, "abandoned": False}
+
+        def acquire():
+            self.scheduler.acquire(priority, estimated_tokens)
+            with lock:
+                if state["abandoned"]:
+                    self.scheduler.release(estimated_tokens)
+                else:
+                    state["acquired"] = True
+
+        try:
+            await asyncio.to_thread(acquire)
+        except asyncio.CancelledError:
+            with lock:
+                state["abandoned"] = True
+                if state["acquired"]:
+                    self.scheduler.release(estimated_tokens)
+            raise
+
+    async def __race(self, attempts, timeout):
+        waiters = {asyncio.ensure_future(attempt.events.get()): attempt for attempt in attempts}
+        done, pending = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        # A cancelled get() leaves its item in the queue
+        for waiter in pending:
+            waiter.cancel()
+        return [(waiters[waiter], waiter.result()) for waiter in done]
+
+    async def __first_event(self, attempts, priority, estimated_tokens, start):
+        """Wait for the first event of the attempts, hedging once if it is stuck. Return (winner, first item)."""
+        primary = attempts[0]
+        delay = self.scheduler.hedge_delay(self.hedge_percentile) if priority in self.hedge_priorities else None
+
+        while True:
+            results = await self.__race(attempts, delay)
+            delay = None
+
+            if not results:
+                if self.scheduler.try_acquire(estimated_tokens):
+                    attempts.append(_Attempt(self.scheduler, start(), estimated_tokens))
+                continue
+
+            answered = [(attempt, item) for attempt, item in results if item[0] != "error"]
+            if not answered and len(results) < len(attempts):
+                # The other attempt is still running, let it answer
+                for attempt, item in results:
+                    attempt.fail(item[1])
+                    attempts.remove(attempt)
+                continue
+
+            winner, item = (answered or results)[0]
+            for attempt, other in results:
+                if attempt is not winner and other[0] == "error":
+                    attempt.fail(other[1])
+            for loser in attempts:
+                if loser is not winner:
+                    loser.cancel()
+            if winner is not primary:
+                self.scheduler.hedge_won()
+            return winner, item
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        priority = _priority.get()
+        estimated_tokens = estimate_tokens(messages, system_prompt)
+
+        def start():
+            return self.model.stream(messages, tool_specs, system_prompt, **kwargs)
+
+        for retry in range(self.max_retries + 1):
+            await self.__acquire(priority, estimated_tokens)
+            attempts = [_Attempt(self.scheduler, start(), estimated_tokens)]
+
+            try:
+                winner, (kind, value) = await self.__first_event(attempts, priority, estimated_tokens, start)
+            except BaseException:
+                for attempt in attempts:
+                    attempt.cancel()
+                raise
+
+            if kind == "error" and isinstance(value, ModelThrottledException) and retry < self.max_retries:
+                winner.fail(value)
+                delay = random.uniform(0, self.base_backoff * 2 ** retry)
+                log.print("scheduler.throttled", f"[yellow](scheduler.py) | Model throttled, retry {retry + 1} in {delay:.1f}s[/yellow]")
+                await asyncio.sleep(delay)
+                continue
+
+            if kind != "error":
+                self.scheduler.observe_first_event(time.perf_counter() - winner.started)
+            try:
+                while kind == "event":
+                    yield value
+                    kind, value = await winner.events.get()
+            finally:
+                if kind == "done":
+                    winner.release()
+                elif kind == "error":
+                    winner.fail(value)
+                else:
+                    winner.cancel()
+
+            if kind == "error":
+                raise value
+            return
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        priority = _priority.get()
+        estimated_tokens = estimate_tokens(prompt, system_prompt)
+
+        for retry in range(self.max_retries + 1):
+            await self.__acquire(priority, estimated_tokens)
+            started = time.perf_counter()
+            throttled = False
+            answered = False
+            try:
+                async for event in self.model.structured_output(output_model, prompt, system_prompt, **kwargs):
+                    answered = True
+                    yield event
+                return
+            except ModelThrottledException:
+                throttled = True
+                # Events already yielded cannot be taken back, only a call throttled before answering is retried
+                if answered or retry >= self.max_retries:
+                    raise
+            finally:
+                self.scheduler.release(estimated_tokens, None, None if throttled else time.perf_counter() - started, throttled)
+
+            delay = random.uniform(0, self.base_backoff * 2 ** retry)
+            log.print("scheduler.throttled", f"[yellow](scheduler.py) | Model throttled, retry {retry + 1} in {delay:.1f}s[/yellow]")
+            await asyncio.sleep(delay)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_request_scheduler():
+    """Return the process-wide scheduler every agent's model calls go through."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler(
+                rpm=config.scheduler_rpm,
+                tpm=config.scheduler_tpm,
+                initial_concurrency=config.scheduler_initial_concurrency,
+                min_concurrency=config.scheduler_min_concurrency,
+                max_concurrency=config.scheduler_max_concurrency,
+            )
+        return _scheduler
+
+def schedule_model(model):
+    """Wrap model in a ScheduledModel on the shared scheduler, unchanged when config.scheduler_enabled is off."""
+    if not config.scheduler_enabled:
+        return model
+    return ScheduledModel(
+        model,
+        get_request_scheduler(),
+        max_retries=config.scheduler_max_retries,
+        hedge_percentile=config.scheduler_hedge_percentile,
+        hedge_priorities=config.scheduler_hedge_priorities,
+    )
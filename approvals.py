@@ -0,0 +1,271 @@
+from websockets.asyncio.client import connect
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from supabaseClient import supabase_client
+from tracing import span
+
+import config
+import asyncio
+import json
+import threading
+import uuid
+
+from rich.console import Console
+console = Console()
+
+DECIDED = ("approved", "rejected", "expired", "cancelled")
+
+# Async context manager factory of the running plan, entered while it waits for a decision
+_parking = ContextVar("approval_parking", default=None)
+
+
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
+@contextmanager
+def parking(park):
+    """Within this block request() waits for decisions inside park(), e.g. to give a worker back meanwhile."""
+    token = _parking.set(park)
+    try:
+        yield
+    finally:
+        _parking.reset(token)
+
+
+class ApprovalQueue:
+    """
+    Human-in-the-loop approvals that never block a thread.
+    request() persists a pending approval in planner.approvals, pushes it to the dashboard through the
+    backend (/ws/approvals) and suspends the calling task until a decision arrives or the timeout passes.
+    Decisions come back over the websocket, or are picked up from planner.approvals every poll_seconds
+    when the backend cannot be reached. One background thread serves every waiting plan.
+    """
+    def __init__(self, url, timeout, defaults, poll_seconds=5.0):
+        self.__url = url
+        self.__timeout = timeout
+        self.__defaults = defaults
+        self.__poll_seconds = poll_seconds
+        self.__waiting = {}
+        self.__lock = threading.Lock()
+        self.__loop = None
+        self.__connection = None
+        self.__thread = None
+        # Own threads for planner.approvals writes, so they never queue behind planning work
+        self.__db_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="approval-db")
+
+        self.approved = 0
+        self.rejected = 0
+        self.expired = 0
+        self.cancelled = 0
+
+    def start(self):
+        with self.__lock:
+            if self.__thread is not None:
+                return
+            self.__loop = asyncio.new_event_loop()
+            self.__thread = threading.Thread(target=self.__run, name="approval-queue", daemon=True)
+            self.__thread.start()
+
+    def __run(self):
+        asyncio.set_event_loop(self.__loop)
+        self.__loop.create_task(self.__poll())
+        if self.__url:
+            self.__loop.create_task(self.__listen())
+        self.__loop.run_forever()
+
+    async def __listen(self):
+        while True:
+            try:
+                async with connect(self.__url, open_timeout=5) as connection:
+                    self.__connection = connection
+                    # Approvals raised while disconnected are announced again
+                    for approval in self.pending():
+                        await connection.send(json.dumps({"type": "pending", **approval}, default=str))
+                    async for text in connection:
+                        self.__receive(text)
+            except Exception as e:
+                console.print(f"[yellow](approvals.py) | Approval channel unavailable, polling planner.approvals:[/yellow] {e}")
+            finally:
+                self.__connection = None
+            await asyncio.sleep(self.__poll_seconds)
+
+    def __receive(self, text):
+        try:
+            message = json.loads(text)
+        except ValueError:
+            return
+        if isinstance(message, dict) and message.get("type") == "decision":
+            self.resolve(message.get("approval_id"), bool(message.get("approved")))
+
+    async def __poll(self):
+        while True:
+            await asyncio.sleep(self.__poll_seconds)
+            with self.__lock:
+                approval_ids = list(self.__waiting)
+            if not approval_ids:
+                continue
+            try:
+                rows = await self.__run_db(self.__fetch_decisions, approval_ids)
+            except Exception as e:
+                console.print(f"[yellow](approvals.py) | Polling approvals failed:[/yellow] {e}")
+                continue
+            for row in rows:
+                if row.get("status") in ("approved", "rejected"):
+                    self.resolve(row["approval_id"], row["status"] == "approved")
+
+    def __fetch_decisions(self, approval_ids):
+        with span("supabase", "planner.approvals", op="select", rows=len(approval_ids)):
+            return supabase_client.schema('planner')\
+                    .table("approvals")\
+                    .select("approval_id, status")\
+                    .in_("approval_id", approval_ids)\
+                    .execute().data or []
+
+    def __publish(self, message):
+        async def send():
+            if self.__connection is not None:
+                try:
+                    await self.__connection.send(json.dumps(message, default=str))
+                except Exception as e:
+                    console.print(f"[yellow](approvals.py) | Approval not pushed, dashboard will see it on reconnect:[/yellow] {e}")
+        asyncio.run_coroutine_threadsafe(send(), self.__loop)
+
+    async def __run_db(self, fn, *args):
+        return await asyncio.wrap_future(self.__db_executor.submit(fn, *args))
+
+    def __insert(self, approval):
+        with span("supabase", "planner.approvals", op="insert"):
+            supabase_client.schema('planner').table("approvals").insert([approval]).execute()
+
+    def __close(self, approval_id, status, decision):
+        # Only a pending row is closed, a decision the dashboard saved meanwhile stays
+        with span("supabase", "planner.approvals", op="update"):
+            supabase_client.schema('planner')\
+                .table("approvals")\
+                .update({"status": status, "decision": decision, "decided_at": utc_now().isoformat()})\
+                .eq("approval_id", approval_id)\
+                .eq("status", "pending")\
+                .execute()
+
+    async def request(self, kind, payload, timeout=None, default=None):
+        """
+        Ask a human to approve kind (e.g. hotel_booking) for payload and wait without holding a thread.
+        Return True or False, or default (config.approval_defaults[kind]) when nobody answers within timeout.
+        """
+        self.start()
+        timeout = timeout or self.__timeout
+        default = self.__defaults.get(kind, False) if default is None else default
+        now = utc_now()
+        approval = {
+            "approval_id": "APPR-" + uuid.uuid4().hex[:12],
+            "kind": kind,
+            "payload": payload,
+            "status": "pending",
+            "created_at": now.isoformat(),
+            "expires_at": (now + timedelta(seconds=timeout)).isoformat(),
+        }
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.__lock:
+            self.__waiting[approval["approval_id"]] = (loop, future, approval)
+
+        with span("approval", kind, approval_id=approval["approval_id"]) as current:
+            inserted = self.__db_executor.submit(self.__insert, approval)
+            try:
+                try:
+                    await asyncio.wrap_future(inserted)
+                except Exception as e:
+                    console.print(f"[yellow](approvals.py) | Approval not persisted, decisions only over the websocket:[/yellow] {e}")
+                self.__publish({"type": "pending", **approval})
+
+                try:
+                    decision = await self.__wait(future, timeout)
+                    status = "approved" if decision else "rejected"
+                except asyncio.TimeoutError:
+                    decision, status = default, "expired"
+                    self.__publish({"type": "resolved", "approval_id": approval["approval_id"], "status": status})
+                    try:
+                        await self.__run_db(self.__close, approval["approval_id"], status, decision)
+                    except Exception as e:
+                        console.print(f"[yellow](approvals.py) | Expired approval not saved:[/yellow] {e}")
+            except asyncio.CancelledError:
+                # The plan was cancelled or timed out, nobody waits for this decision any more
+                current.set(status="cancelled")
+                self.cancelled += 1
+                self.__publish({"type": "resolved", "approval_id": approval["approval_id"], "status": "cancelled"})
+                # Closed without waiting, after the insert so the row cannot be written pending afterwards
+                inserted.add_done_callback(lambda _: self.__close_later(approval["approval_id"]))
+                raise
+            finally:
+                with self.__lock:
+                    self.__waiting.pop(approval["approval_id"], None)
+
+            current.set(status=status)
+
+        if status == "approved":
+            self.approved += 1
+        elif status == "rejected":
+            self.rejected += 1
+        else:
+            self.expired += 1
+        return decision
+
+    def __close_later(self, approval_id):
+        def report(done):
+            if done.exception() is not None:
+                console.print(f"[yellow](approvals.py) | Cancelled approval not saved:[/yellow] {done.exception()}")
+        self.__db_executor.submit(self.__close, approval_id, "cancelled", None).add_done_callback(report)
+
+    async def __wait(self, future, timeout):
+        park = _parking.get()
+        if park is None:
+            return await asyncio.wait_for(future, timeout)
+        async with park():
+            return await asyncio.wait_for(future, timeout)
+
+    def resolve(self, approval_id, approved):
+        """Deliver a decision to the task waiting on approval_id, from any thread. Return False when nobody waits for it."""
+        with self.__lock:
+            waiting = self.__waiting.get(approval_id)
+        if waiting is None:
+            return False
+
+        loop, future, _ = waiting
+        def deliver():
+            if not future.done():
+                future.set_result(approved)
+        loop.call_soon_threadsafe(deliver)
+        return True
+
+    def pending(self):
+        with self.__lock:
+            return [approval for _, _, approval in self.__waiting.values()]
+
+    def stats(self):
+        return {
+            "waiting": len(self.pending()),
+            "approved": self.approved,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "cancelled": self.cancelled,
+        }
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_approval_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = ApprovalQueue(
+                url=config.approval_url,
+                timeout=config.approval_timeout_seconds,
+                defaults=config.approval_defaults,
+                poll_seconds=config.approval_poll_seconds,
+            )
+        return _queue
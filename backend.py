@@ -1,10 +1,319 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Header, Response
+from fastapi.responses import HTMLResponse, StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from supabaseClient import supabase_client
+from contextlib import asynccontextmanager
+from planner_store import TABLE_KEYS, UPDATED_COLUMN, iter_pages, run_db, fetch_pending_approvals, save_approval_decision
+from plan_jobs import PlanJobs, QueueFull
+from tracing import TraceMetrics
+from pydantic import BaseModel
+from datetime import datetime, timezone
+import config
+import asyncio
+import hashlib
 import json
+import time
 
-app = FastAPI()
+
+class PlannerFeed:
+    """
+    One shared poller for planner.plans and planner.bookings, running only while dashboards are connected.
+    Each poll reads the rows stamped since the previous one (updated_at, sql/planner_feed.sql) and
+    broadcasts inserted and updated rows. Deleted rows leave nothing to read, so every reconcile_seconds
+    only the keys are listed and the missing ones are broadcast as deleted.
+    Only each row's key and fingerprint are kept in memory. A snapshot, sent on connect or resync,
+    is read from Supabase page by page and sent as snapshot_page messages, without holding up the polls:
+    deltas broadcast meanwhile are kept for that dashboard and sent after its snapshot_end.
+    """
+    TABLES = TABLE_KEYS
+
+    def __init__(self, interval, reconcile_seconds=60):
+        self.interval = interval
+        self.reconcile_seconds = reconcile_seconds
+        self.version = 0
+        self.error = None
+        self.fingerprints = {table: {} for table in self.TABLES}
+        self.cursors = {table: None for table in self.TABLES}
+        self.reconciled_at = None
+        self.subscribers = set()
+        self.catching_up = {}
+        self.lock = asyncio.Lock()
+        self.task = None
+
+    async def fetch_changed(self, table):
+        # gte, rows stamped in the same instant as the cursor are read again and dropped as unchanged by diff
+        filters = {"updated_since": self.cursors[table]}
+        rows = []
+        async for page in iter_pages(table, page_size=config.db_max_page_size, filters=filters):
+            rows.extend(page["rows"])
+        return rows
+
+    async def fetch_keys(self, table):
+        key = self.TABLES[table]
+        keys = set()
+        async for page in iter_pages(table, page_size=config.db_max_page_size, columns=key):
+            keys.update(row[key] for row in page["rows"])
+        return keys
+
+    def diff(self, table, rows, keys=None):
+        key = self.TABLES[table]
+        fingerprints = self.fingerprints[table]
+        changes = {"inserted": [], "updated": [], "deleted": []}
+
+        for row in rows:
+            fingerprint = hashlib.sha1(json.dumps(row, sort_keys=True, default=str).encode()).digest()
+            previous = fingerprints.get(row[key])
+            if previous == fingerprint:
+                continue
+            changes["updated" if previous is not None else "inserted"].append(row)
+            fingerprints[row[key]] = fingerprint
+
+        if keys is not None:
+            changes["deleted"] = [row_key for row_key in fingerprints if row_key not in keys]
+            for row_key in changes["deleted"]:
+                fingerprints.pop(row_key)
+
+        stamps = [row[UPDATED_COLUMN] for row in rows if row.get(UPDATED_COLUMN)]
+        if stamps:
+            self.cursors[table] = max(stamps + ([self.cursors[table]] if self.cursors[table] else []))
+        return changes
+
+    async def poll_once(self, reconcile=False):
+        async with self.lock:
+            reconcile = reconcile or self.reconciled_at is None\
+                or time.monotonic() - self.reconciled_at >= self.reconcile_seconds
+            try:
+                fetched = {table: await self.fetch_changed(table) for table in self.TABLES}
+                # Keys are listed after the changed rows, a row inserted in between is only absent from the fingerprints
+                keys = {table: await self.fetch_keys(table) for table in self.TABLES} if reconcile else {}
+                self.error = None
+            except Exception as e:
+                print(f"Error fetching data: {e}")
+                self.error = str(e)
+                return
+
+            delta = {table: self.diff(table, rows, keys.get(table)) for table, rows in fetched.items()}
+            if reconcile:
+                self.reconciled_at = time.monotonic()
+            changed = any(changes[kind] for changes in delta.values() for kind in changes)
+
+            if changed:
+                self.version += 1
+                await self.broadcast(json.dumps({"type": "delta", "version": self.version, **delta}, default=str))
+
+    async def run(self):
+        # Nothing is read while no dashboard is connected, subscribe catches up first
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.subscribers or self.catching_up:
+                await self.poll_once()
+
+    async def send_snapshot(self, websocket, subscribe=False):
+        """
+        snapshot (version), one snapshot_page per page of each table, then snapshot_end, then the deltas
+        broadcast since version. Only the version is read under the lock, a slow dashboard never holds up
+        the polls. Pages read rows changed after version too, the deltas replayed after them settle those.
+        """
+        subscribe = subscribe or websocket in self.subscribers
+        async with self.lock:
+            version = self.version
+            error = self.error
+            # Deltas from here on wait in this buffer until the snapshot is sent
+            self.subscribers.discard(websocket)
+            self.catching_up[websocket] = []
+
+        try:
+            start = {"type": "snapshot", "version": version}
+            if error:
+                start["error"] = error
+            await websocket.send_text(json.dumps(start))
+
+            counts = {}
+            try:
+                for table in self.TABLES:
+                    counts[table] = 0
+                    async for page in iter_pages(table, page_size=config.db_max_page_size):
+                        counts[table] += len(page["rows"])
+                        await websocket.send_text(json.dumps({"type": "snapshot_page", "version": version, **page}, default=str))
+            except Exception as e:
+                print(f"Error fetching data: {e}")
+                await websocket.send_text(json.dumps({"type": "error", "error": str(e)}))
+
+            await websocket.send_text(json.dumps({"type": "snapshot_end", "version": version}))
+            print(f"Sent snapshot v{version}: {counts.get('plans', 0)} plans, {counts.get('bookings', 0)} bookings")
+
+            # No await between finding the buffer empty and subscribing, so no delta falls in between
+            while self.catching_up.get(websocket):
+                missed, self.catching_up[websocket] = self.catching_up[websocket], []
+                for message in missed:
+                    await websocket.send_text(message)
+            # Not when the dashboard disconnected meanwhile
+            if subscribe and websocket in self.catching_up:
+                self.subscribers.add(websocket)
+        finally:
+            self.catching_up.pop(websocket, None)
+
+    async def subscribe(self, websocket):
+        if not self.subscribers and not self.catching_up:
+            # Changes made while the feed was idle, deletes included
+            await self.poll_once(reconcile=True)
+        await self.send_snapshot(websocket, subscribe=True)
+
+    def unsubscribe(self, websocket):
+        self.subscribers.discard(websocket)
+        self.catching_up.pop(websocket, None)
+
+    async def broadcast(self, message):
+        print(f"Broadcasting v{self.version} to {len(self.subscribers)} clients")
+        for missed in self.catching_up.values():
+            missed.append(message)
+        subscribers = list(self.subscribers)
+        results = await asyncio.gather(
+            *(websocket.send_text(message) for websocket in subscribers),
+            return_exceptions=True
+        )
+        for websocket, result in zip(subscribers, results):
+            if isinstance(result, Exception):
+                self.subscribers.discard(websocket)
+
+
+class ItineraryStreamHub:
+    """
+    Relays itinerary entries from planning runs (publishers) to dashboards (subscribers).
+    Messages of the running streams are kept so a dashboard opened mid-run catches up.
+    """
+    def __init__(self, max_streams=20):
+        self.max_streams = max_streams
+        self.streams = {}
+        self.subscribers = set()
+
+    def record(self, message):
+        stream = self.streams.setdefault(message.get("stream_id"), [])
+        stream.append(message)
+        while len(self.streams) > self.max_streams:
+            self.streams.pop(next(iter(self.streams)))
+
+    async def subscribe(self, websocket):
+        self.subscribers.add(websocket)
+        for messages in list(self.streams.values()):
+            for message in messages:
+                await websocket.send_text(json.dumps(message, default=str))
+
+    def unsubscribe(self, websocket):
+        self.subscribers.discard(websocket)
+
+    async def publish(self, message):
+        self.record(message)
+        if message.get("type") == "finished":
+            self.streams.pop(message.get("stream_id"), None)
+
+        text = json.dumps(message, default=str)
+        subscribers = list(self.subscribers)
+        results = await asyncio.gather(
+            *(websocket.send_text(text) for websocket in subscribers),
+            return_exceptions=True
+        )
+        for websocket, result in zip(subscribers, results):
+            if isinstance(result, Exception):
+                self.subscribers.discard(websocket)
+
+
+async def send_all(sockets, text):
+    # Sockets that fail to receive are dropped from the set
+    sockets_list = list(sockets)
+    results = await asyncio.gather(*(websocket.send_text(text) for websocket in sockets_list), return_exceptions=True)
+    for websocket, result in zip(sockets_list, results):
+        if isinstance(result, Exception):
+            sockets.discard(websocket)
+
+
+class ApprovalHub:
+    """
+    Pending human approvals between planning runs (planners) and dashboards.
+    Planners push pending approvals, dashboards get every pending one on connect and answer with decisions,
+    which are saved to planner.approvals and forwarded to the planners.
+    """
+    def __init__(self):
+        self.pending = {}
+        self.planners = set()
+        self.dashboards = set()
+
+    async def load(self):
+        # Approvals raised while the backend was down are only in planner.approvals
+        try:
+            for approval in await run_db(fetch_pending_approvals):
+                self.pending.setdefault(approval["approval_id"], approval)
+        except Exception as e:
+            print(f"Error fetching pending approvals: {e}")
+
+    async def planner_message(self, message):
+        approval_id = message.get("approval_id")
+        if message.get("type") == "pending" and approval_id:
+            approval = {key: value for key, value in message.items() if key != "type"}
+            self.pending[approval_id] = approval
+            await send_all(self.dashboards, json.dumps(message, default=str))
+        elif message.get("type") == "resolved" and approval_id:
+            self.pending.pop(approval_id, None)
+            await send_all(self.dashboards, json.dumps(message, default=str))
+
+    async def subscribe(self, websocket):
+        self.dashboards.add(websocket)
+        await self.load()
+        for approval in list(self.pending.values()):
+            await websocket.send_text(json.dumps({"type": "pending", **approval}, default=str))
+
+    def unsubscribe(self, websocket):
+        self.dashboards.discard(websocket)
+        self.planners.discard(websocket)
+
+    async def decide(self, approval_id, approved):
+        """Save and forward a decision. Return False when the approval is unknown or already decided."""
+        status = "approved" if approved else "rejected"
+        try:
+            updated = await run_db(save_approval_decision, approval_id, status, datetime.now(timezone.utc).isoformat())
+        except Exception as e:
+            print(f"Error saving approval decision: {e}")
+            updated = None
+
+        if not updated and approval_id not in self.pending:
+            return False
+
+        self.pending.pop(approval_id, None)
+        await send_all(self.planners, json.dumps({"type": "decision", "approval_id": approval_id, "approved": approved}))
+        await send_all(self.dashboards, json.dumps({"type": "resolved", "approval_id": approval_id, "status": status}))
+        return True
+
+
+class ApprovalDecision(BaseModel):
+    approved: bool
+
+
+class PlanJobRequest(BaseModel):
+    prompt: str
+    user_id: str | None = None
+
+
+feed = PlannerFeed(interval=config.feed_poll_seconds, reconcile_seconds=config.feed_reconcile_seconds)
+itinerary_hub = ItineraryStreamHub()
+approval_hub = ApprovalHub()
+trace_metrics = TraceMetrics(config.trace_path)
+# Job progress is relayed to /ws/itinerary-stream like the CLI's itinerary streams, with the job id as stream id
+plan_jobs = PlanJobs(
+    publish=itinerary_hub.publish,
+    workers=config.plan_job_workers,
+    queue_size=config.plan_job_queue_size,
+    timeout=config.plan_job_timeout_seconds,
+    history=config.plan_job_history,
+)
+
+@asynccontextmanager
+async def lifespan(app):
+    feed.task = asyncio.create_task(feed.run())
+    plan_jobs.start()
+    yield
+    feed.task.cancel()
+    await plan_jobs.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,6 +328,43 @@ async def get():
     with open("index.html", "r") as f:
         return HTMLResponse(content=f.read())
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics aggregated from the trace file written by planning runs and this backend."""
+    body = await asyncio.to_thread(trace_metrics.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+def page_filters(date_from=None, date_to=None, plan_id=None, booking_id=None):
+    return {"date_from": date_from, "date_to": date_to, "plan_id": plan_id, "booking_id": booking_id}
+
+@app.get("/planner/{table}")
+async def get_planner_rows(table: str, after: str | None = None, page_size: int = 100, pages: int | None = None,
+                           date_from: str | None = None, date_to: str | None = None,
+                           plan_id: str | None = None, booking_id: str | None = None):
+    """Stream keyset-paginated rows as NDJSON, one page per line with the cursor of the next page."""
+    if table not in TABLE_KEYS:
+        raise HTTPException(status_code=404, detail=f"unknown table: {table}")
+
+    filters = page_filters(date_from, date_to, plan_id, booking_id)
+
+    async def stream():
+        async for page in iter_pages(table, after, page_size, filters, max_pages=pages):
+            yield json.dumps(page, default=str) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+async def send_pages(websocket, request):
+    table = request.get("table")
+    if table not in TABLE_KEYS:
+        await websocket.send_text(json.dumps({"type": "error", "error": f"unknown table: {table}"}))
+        return
+
+    filters = page_filters(**{key: value for key, value in request.get("filters", {}).items()
+                              if key in ("date_from", "date_to", "plan_id", "booking_id")})
+    async for page in iter_pages(table, request.get("after"), request.get("page_size", 100),
+                                 filters, max_pages=request.get("pages", 1)):
+        await websocket.send_text(json.dumps({"type": "page", **page}, default=str))
+
 @app.websocket("/ws/plans-bookings")
 async def websocket_endpoint(websocket: WebSocket):
     print("WebSocket connection attempt...")
@@ -26,37 +372,26 @@ async def websocket_endpoint(websocket: WebSocket):
     print("WebSocket connection accepted!")
     
     try:
-        try:
-            plans_response = supabase_client.schema('planner').table('plans').select('*').execute()
-            bookings_response = supabase_client.schema('planner').table('bookings').select('*').execute()
-            
-            response_data = {
-                "plans": plans_response.data if plans_response.data else [],
-                "bookings": bookings_response.data if bookings_response.data else []
-            }
-            print(f"Sending data: {len(response_data['plans'])} plans, {len(response_data['bookings'])} bookings")
-            await websocket.send_text(json.dumps(response_data))
-        except Exception as e:
-            print(f"Error fetching initial data: {e}")
-            await websocket.send_text(json.dumps({"plans": [], "bookings": [], "error": str(e)}))
+        await feed.subscribe(websocket)
         
         while True:
             data = await websocket.receive_text()
             print(f"Received message: {data}")
             
             try:
-                plans_response = supabase_client.schema('planner').table('plans').select('*').execute()
-                bookings_response = supabase_client.schema('planner').table('bookings').select('*').execute()
-                
-                response_data = {
-                    "plans": plans_response.data if plans_response.data else [],
-                    "bookings": bookings_response.data if bookings_response.data else []
-                }
-                print(f"Sending data: {len(response_data['plans'])} plans, {len(response_data['bookings'])} bookings")
-                await websocket.send_text(json.dumps(response_data))
-            except Exception as e:
-                print(f"Error fetching data: {e}")
-                await websocket.send_text(json.dumps({"plans": [], "bookings": [], "error": str(e)}))
+                request = json.loads(data)
+            except ValueError:
+                request = {"action": "resync"}
+
+            # Deltas are pushed by the feed, other messages ask for filtered pages or a full resync
+            if isinstance(request, dict) and request.get("action") == "fetch":
+                try:
+                    await send_pages(websocket, request)
+                except Exception as e:
+                    print(f"Error fetching data: {e}")
+                    await websocket.send_text(json.dumps({"type": "error", "error": str(e)}))
+            else:
+                await feed.send_snapshot(websocket)
             
     except WebSocketDisconnect:
         print("Client disconnected")
@@ -64,6 +399,101 @@ async def websocket_endpoint(websocket: WebSocket):
         print(f"WebSocket error: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        feed.unsubscribe(websocket)
+
+@app.websocket("/ws/itinerary-stream")
+async def itinerary_stream_endpoint(websocket: WebSocket, role: str = "subscriber"):
+    await websocket.accept()
+
+    try:
+        if role == "publisher":
+            while True:
+                try:
+                    message = json.loads(await websocket.receive_text())
+                except ValueError:
+                    continue
+                if isinstance(message, dict):
+                    await itinerary_hub.publish(message)
+        else:
+            await itinerary_hub.subscribe(websocket)
+            while True:
+                await websocket.receive_text()
+
+    except WebSocketDisconnect:
+        print(f"Itinerary stream {role} disconnected")
+    finally:
+        itinerary_hub.unsubscribe(websocket)
+
+@app.get("/approvals")
+async def get_approvals():
+    """Approvals waiting for a decision."""
+    await approval_hub.load()
+    return list(approval_hub.pending.values())
+
+@app.post("/approvals/{approval_id}")
+async def decide_approval(approval_id: str, decision: ApprovalDecision):
+    if not await approval_hub.decide(approval_id, decision.approved):
+        raise HTTPException(status_code=404, detail=f"no pending approval: {approval_id}")
+    return {"approval_id": approval_id, "approved": decision.approved}
+
+@app.post("/plans/jobs", status_code=202)
+async def create_plan_job(request: PlanJobRequest, response: Response, idempotency_key: str | None = Header(default=None)):
+    """Queue a plan and return its job at once. A retry with the same Idempotency-Key header gets the same job."""
+    try:
+        job, created = plan_jobs.submit(request.prompt, request.user_id, idempotency_key)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e),
+                            headers={"Retry-After": str(config.plan_job_retry_after_seconds)})
+    if not created:
+        response.status_code = 200
+    return job
+
+@app.get("/plans/jobs")
+async def get_plan_jobs():
+    return plan_jobs.stats()
+
+@app.get("/plans/jobs/{job_id}")
+async def get_plan_job(job_id: str):
+    job = plan_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"unknown job: {job_id}")
+    return job
+
+@app.delete("/plans/jobs/{job_id}")
+async def cancel_plan_job(job_id: str):
+    job = plan_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"unknown job: {job_id}")
+    return job
+
+@app.websocket("/ws/approvals")
+async def approvals_endpoint(websocket: WebSocket, role: str = "dashboard"):
+    await websocket.accept()
+
+    try:
+        if role == "planner":
+            approval_hub.planners.add(websocket)
+        else:
+            await approval_hub.subscribe(websocket)
+
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                continue
+            if not isinstance(message, dict):
+                continue
+
+            if role == "planner":
+                await approval_hub.planner_message(message)
+            elif message.get("type") == "decision" and message.get("approval_id"):
+                await approval_hub.decide(message["approval_id"], bool(message.get("approved")))
+
+    except WebSocketDisconnect:
+        print(f"Approvals {role} disconnected")
+    finally:
+        approval_hub.unsubscribe(websocket)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,150 @@
+from main import parse_json, insert_plans_to_planner
+from invoice_outbox import drain_invoice_outbox
+from planner_writer import get_planner_writer, drain_planner_writer, idempotency_key, new_id
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import config
+import argparse
+import threading
+import json
+
+from rich.console import Console
+console = Console()
+
+_agent = None
+_agent_lock = threading.Lock()
+
+def get_agent():
+    # Sub-agents are pooled, so one StrandsAgent is shared by every worker thread
+    global _agent
+    with _agent_lock:
+        if _agent is None:
+            # Loaded by the first plan, so reading and skipping the input file starts at once
+            from agents.root_agent import StrandsAgent
+            _agent = StrandsAgent(hitl=False)
+        return _agent
+
+def read_prompts(path):
+    with open(path, "r") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                request = json.loads(line)
+            except Exception as e:
+                console.print(f"[red](batch.py) | Invalid JSON at line {line_no}:[/red]: {e}")
+                continue
+
+            if isinstance(request, str):
+                request = {"prompt": request}
+
+            request.setdefault("id", line_no)
+            yield request
+
+def plan_one(request):
+    agent = get_agent()
+    from agents.scheduler import request_priority
+    # Batch plans yield model capacity to interactive runs sharing the process
+    with request_priority("batch"):
+        if config.orchestration == "parallel":
+            res = agent.call_agent_parallel(request["prompt"], user_id=request.get("user_id"))
+        else:
+            res = agent.call_agent(request["prompt"], user_id=request.get("user_id"))
+
+    if isinstance(res, str):
+        raise RuntimeError(res)
+
+    response_text = str(res.message['content'][0]['text'])
+    return parse_json(response_text.strip())
+
+def plan_key(run_id, request):
+    # Running the file again is a new run with new plans, only a retry of run_id skips what it already wrote
+    return idempotency_key("batch", run_id, request.get("user_id") or config.default_user_id, request["id"], request["prompt"])
+
+def run_batch(input_path, output_path, concurrency, insert_batch_size, run_id=None):
+    run_id = run_id or new_id("RUN")
+    console.print(f"[cyan](batch.py) | run id:[/cyan] {run_id}")
+    writer = get_planner_writer()
+    pending = set()
+    plans = []
+    keys = []
+    done_count = 0
+    failed_count = 0
+    skipped_count = 0
+
+    def flush_plans():
+        if plans:
+            insert_plans_to_planner(plans, keys)
+            plans.clear()
+            keys.clear()
+
+    def collect(finished, out):
+        nonlocal done_count, failed_count
+        for future in finished:
+            request = futures.pop(future)
+            record = {"id": request["id"], "prompt": request["prompt"]}
+            try:
+                data = future.result()
+                record["plan"] = data
+                plans.append(dict(data))
+                keys.append(plan_key(run_id, request))
+                done_count += 1
+            except Exception as e:
+                console.print(f"[red](batch.py) | Planning failed for {request['id']}:[/red]: {e}")
+                record["error"] = str(e)
+                failed_count += 1
+
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+
+            if len(plans) >= insert_batch_size:
+                flush_plans()
+
+    futures = {}
+    with open(output_path, "a") as out, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for request in read_prompts(input_path):
+            if "prompt" not in request:
+                console.print(f"[red](batch.py) | Missing prompt for {request['id']}, skipped[/red]")
+                continue
+
+            if writer.lookup("plans", plan_key(run_id, request)) is not None:
+                skipped_count += 1
+                continue
+
+            # Keep the number of in-flight plans bounded so huge files are streamed
+            if len(pending) >= concurrency * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished, out)
+
+            future = executor.submit(plan_one, request)
+            futures[future] = request
+            pending.add(future)
+
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            collect(finished, out)
+
+        flush_plans()
+
+    console.print(f"[green](batch.py) | Batch finished: {done_count} planned, {failed_count} failed, {skipped_count} already written by run {run_id}[/green]")
+    return done_count, failed_count
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Plan trips in batch from JSONL prompts")
+    parser.add_argument("--input", default=config.batch_input, help="JSONL file, one {\"prompt\": ...} per line")
+    parser.add_argument("--output", default=config.batch_output, help="JSONL file for finished plans")
+    parser.add_argument("--concurrency", type=int, default=config.batch_concurrency)
+    parser.add_argument("--insert-batch-size", type=int, default=config.batch_insert_size)
+    parser.add_argument("--run-id", default=None, help="run id printed by a failed run, to retry it without planning its written plans again")
+    args = parser.parse_args()
+
+    try:
+        run_batch(args.input, args.output, args.concurrency, args.insert_batch_size, args.run_id)
+        drain_planner_writer(config.planner_write_drain_seconds)
+        drain_invoice_outbox(config.invoice_drain_seconds)
+    except Exception as e:
+        console.print_exception(show_locals=True)
+        console.print(f"[red](batch.py) | Error running batch:[/red]: {e}")
+        raise
@@ -0,0 +1,10 @@
+"""
+Benchmarks, run from the repository root with python -m benchmarks.<name>.
+Spans they trace go to a temporary directory, never to the traces.jsonl the backend's /metrics reads.
+"""
+import os
+import tempfile
+
+import config
+
+config.trace_path = os.path.join(tempfile.mkdtemp(prefix="planner-bench-traces-"), "traces.jsonl")
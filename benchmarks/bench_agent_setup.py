@@ -0,0 +1,96 @@
+"""
+Per-request agent setup overhead: rebuilding Agent + GeminiModel on every call
+versus acquiring a warm agent from AgentPool.
+
+Run from the repository root (no network needed):
+    python -m benchmarks.bench_agent_setup --requests 200
+"""
+from strands import Agent, tool
+from strands.models.gemini import GeminiModel
+from agents.llm_model import get_shared_model, MODEL_ID, MAX_OUTPUT_TOKENS
+from agents.agent_pool import AgentPool
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+
+@tool
+def pick_hotel(city: str, rating: int, max_price_per_night: int):
+    """
+    Tool: pick_hotel
+    Description: Stand-in tool so agents carry a realistic tool registry.
+    Args:
+        city (str): hotel location
+        rating (int): hotel rating
+        max_price_per_night (int): maximum hotel price per night preferences
+    """
+    return {}
+
+
+def load_prompt():
+    with open("./system_prompts/agent-hotel-prompt.txt", "r") as f:
+        sys_prompt = f.read()
+    with open("./user_profile.json", "r") as f:
+        user_profile = json.load(f)
+    return sys_prompt, {'hotel_preferences': user_profile['preferences']['hotel']}
+
+
+def cold_request(sys_prompt, user_profile):
+    # Previous behaviour: new model client, prompt formatting and Agent per tool call
+    model = GeminiModel(
+        client_args={"api_key": os.getenv('GEMINI_API_KEY')},
+        model_id=MODEL_ID,
+        params={"temperature": 0.7, "max_output_tokens": MAX_OUTPUT_TOKENS}
+    )
+    agent = Agent(
+        model=model,
+        tools=[pick_hotel],
+        system_prompt=sys_prompt.format(user_profile=str(user_profile)),
+        callback_handler=None
+    )
+    return agent
+
+
+def measure(fn, requests):
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{name:<8} mean {statistics.mean(samples):>10.1f} us   p50 {statistics.median(samples):>10.1f} us   p95 {p95:>10.1f} us")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    sys_prompt, user_profile = load_prompt()
+    formatted_prompt = sys_prompt.format(user_profile=str(user_profile))
+
+    pool = AgentPool(lambda: Agent(
+        model=get_shared_model(0.7),
+        tools=[pick_hotel],
+        system_prompt=formatted_prompt,
+        callback_handler=None
+    ))
+
+    def warm_request():
+        with pool.acquire() as agent:
+            agent.messages.append({"role": "user", "content": [{"text": "hotel in Jakarta"}]})
+
+    cold = measure(lambda: cold_request(sys_prompt, user_profile), args.requests)
+    warm = measure(warm_request, args.requests)
+
+    report("rebuild", cold)
+    report("pooled", warm)
+    print(f"speedup  {statistics.mean(cold) / statistics.mean(warm):.1f}x per request")
@@ -0,0 +1,114 @@
+"""
+Plans waiting for a human approval: blocking worker threads (one thread held per waiting plan)
+versus the async pipeline, where waiting plans are suspended tasks on one event loop.
+A simulated reviewer answers every approval decision-delay seconds after it was raised.
+
+Run from the repository root (no network needed):
+    python -m benchmarks.bench_approvals --plans 300 --decision-delay 2 --workers 8
+"""
+from benchmarks.fakes import FakeSupabase, FakeReservations, ScriptedModel, default_script, install_fake_supabase, seed_travel_data, use_scratch_files
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+
+import argparse
+import asyncio
+import io
+import subprocess
+import sys
+import threading
+import time
+
+
+class Reviewer:
+    """Approves every pending approval once it has waited delay seconds, and tracks the peak thread count."""
+    def __init__(self, queue, delay):
+        self.queue = queue
+        self.delay = delay
+        self.peak_waiting = 0
+        self.peak_threads = 0
+        self.__stop = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+
+    def __run(self):
+        while not self.__stop.is_set():
+            pending = self.queue.pending()
+            self.peak_waiting = max(self.peak_waiting, len(pending))
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            now = time.time()
+            for approval in pending:
+                if now - datetime.fromisoformat(approval["created_at"]).timestamp() >= self.delay:
+                    self.queue.resolve(approval["approval_id"], True)
+            self.__stop.wait(0.02)
+
+    def __enter__(self):
+        self.__thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.__stop.set()
+        self.__thread.join()
+
+
+def run_threads(agent, prompt, plans, workers):
+    # Each worker thread runs the sync pipeline, the hotel tool holds it while the approval is pending
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda _: agent.call_agent_parallel(prompt), range(plans)))
+
+
+async def run_async(agent, prompt, plans):
+    return await asyncio.gather(*(agent.call_agent_parallel_async(prompt) for _ in range(plans)))
+
+
+def report(name, plans, wall, reviewer, results):
+    failed = sum(1 for result in results if isinstance(result, str))
+    print(f"{name:<22} {plans / wall:>7.1f} plans/s   wall {wall:>6.2f}s   peak waiting {reviewer.peak_waiting:>4}"
+          f"   peak threads {reviewer.peak_threads:>4}   failed {failed}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plans", type=int, default=300)
+    parser.add_argument("--decision-delay", type=float, default=2.0, help="seconds a human takes to answer")
+    parser.add_argument("--workers", type=int, default=8, help="planning threads for the blocking baseline")
+    parser.add_argument("--time-scale", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--mode", choices=["both", "threads", "async"], default="both")
+    args = parser.parse_args()
+
+    if args.mode == "both":
+        # One process per mode, the shared model scheduler adapts to load and would carry over between runs
+        for mode in ("threads", "async"):
+            subprocess.run([sys.executable, "-m", "benchmarks.bench_approvals", *sys.argv[1:], "--mode", mode], check=True)
+        sys.exit(0)
+
+    db = install_fake_supabase(FakeSupabase(seed_travel_data(seed=args.seed)))
+    FakeReservations(db, rooms=args.plans).install(db)
+
+    import config
+    config.llm_cache_enabled = False
+    config.stream_itinerary = False
+    config.approval_mode = "queue"
+    config.approval_url = None  # decisions come from the simulated reviewer
+    config.trace_enabled = False
+    use_scratch_files()
+
+    from agents.llm_model import set_model_factory
+    model = ScriptedModel(default_script(), time_scale=args.time_scale, seed=args.seed)
+    set_model_factory(lambda temperature: model)
+
+    from agents.root_agent import StrandsAgent
+    from approvals import get_approval_queue
+    agent = StrandsAgent(hitl=True)
+    prompt = "Plan a 2-day trip to Jakarta"
+    queue = get_approval_queue()
+
+    with Reviewer(queue, args.decision_delay) as reviewer, redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        if args.mode == "threads":
+            results = run_threads(agent, prompt, args.plans, args.workers)
+        else:
+            results = asyncio.run(run_async(agent, prompt, args.plans))
+        wall = time.perf_counter() - start
+    name = f"threads ({args.workers} workers)" if args.mode == "threads" else "async (1 event loop)"
+    report(name, args.plans, wall, reviewer, results)
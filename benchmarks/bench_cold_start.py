@@ -0,0 +1,101 @@
+"""
+Cold start: wall time of fresh Python processes importing the entry points and building the root agent,
+and where their import time goes per package (python -X importtime). --baseline also times another git revision,
+checked out in a temporary worktree, so the numbers before and after a change come from the same machine.
+
+Run from the repository root (no network needed, dummy keys are used for unset variables):
+    python -m benchmarks.bench_cold_start --runs 7
+    python -m benchmarks.bench_cold_start --runs 7 --baseline HEAD~1
+"""
+from pathlib import Path
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parent.parent
+
+TARGETS = {
+    "import backend": "import backend",
+    "import main": "import main",
+    "import batch": "import batch",
+    "import agents.root_agent": "import agents.root_agent",
+    "StrandsAgent()": "from agents.root_agent import StrandsAgent; StrandsAgent()",
+}
+
+DUMMY_ENV = {
+    "SUPABASE_URL": "http://localhost:54321",
+    "SUPABASE_SECRET_KEY": "bench",
+    "SUPABASE_ANON_KEY": "bench",
+    "GEMINI_API_KEY": "bench",
+}
+
+
+def environment():
+    env = dict(os.environ)
+    for name, value in DUMMY_ENV.items():
+        env.setdefault(name, value)
+    return env
+
+
+def cold_run(tree, code, env, importtime=False, cwd=None):
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    env = dict(env, PYTHONPATH=str(tree))
+    start = time.perf_counter()
+    done = subprocess.run(command, cwd=cwd or tree, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if done.returncode != 0:
+        raise RuntimeError(f"{code!r} failed in {tree}:\n{done.stderr[-2000:]}")
+    return wall, done.stderr
+
+
+def import_time_by_package(stderr, top):
+    # importtime lines: "import time: self [us] | cumulative | imported module", self time summed per top-level package
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us) / 1e6
+    return sorted(((seconds, package) for package, seconds in packages.items()), reverse=True)[:top]
+
+
+def measure(label, tree, runs, top, env, cwd=None):
+    print(f"{label} ({tree}, started in {cwd or tree})")
+    print(f"{'':<26} {'min':>7} {'p50':>7} {'max':>7}")
+    for name, code in TARGETS.items():
+        cold_run(tree, code, env, cwd=cwd)  # warm the bytecode and page cache, as a redeployed container would be
+        walls = [cold_run(tree, code, env, cwd=cwd)[0] for _ in range(runs)]
+        print(f"{name:<26} {min(walls):>6.2f}s {statistics.median(walls):>6.2f}s {max(walls):>6.2f}s")
+
+    _, stderr = cold_run(tree, TARGETS["StrandsAgent()"], env, importtime=True, cwd=cwd)
+    print("import time of StrandsAgent() by package:")
+    for seconds, package in import_time_by_package(stderr, top):
+        print(f"    {seconds:>6.2f}s  {package}")
+    print()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7, help="fresh processes per target")
+    parser.add_argument("--top", type=int, default=8, help="packages listed")
+    parser.add_argument("--baseline", help="git revision to compare against, e.g. HEAD~1")
+    args = parser.parse_args()
+
+    env = environment()
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as workdir:
+            tree = os.path.join(workdir, "baseline")
+            subprocess.run(["git", "worktree", "add", "--detach", tree, args.baseline],
+                           cwd=ROOT, check=True, capture_output=True)
+            try:
+                measure(f"baseline {args.baseline}", tree, args.runs, args.top, env)
+            finally:
+                subprocess.run(["git", "worktree", "remove", "--force", tree], cwd=ROOT, capture_output=True)
+    # Started outside the repository: prompts and profile no longer depend on the working directory
+    measure("working tree", ROOT, args.runs, args.top, env, cwd=tempfile.gettempdir())
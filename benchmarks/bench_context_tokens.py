@@ -0,0 +1,136 @@
+"""
+Prompt tokens per plan before and after compact context encoding:
+the sub-agents' system prompts, the itinerary agent's input and the root agent's history.
+
+Run from the repository root (no network needed):
+    python -m benchmarks.bench_context_tokens --places 20
+    python -m benchmarks.bench_context_tokens --places 20 --gemini   # also count with Gemini's tokenizer (GEMINI_API_KEY)
+"""
+from agents.context_encoder import (
+    ContextStore, count_tokens, encode, trim, parse_loose, profile_for, hotel_context, places_context
+)
+from agents.llm_model import MODEL_ID
+from benchmarks.fakes import seed_travel_data
+from settings import get_settings, read_prompt, load_user_profile
+
+import argparse
+import config
+import json
+
+
+def previous_profiles(user_profile):
+    # What each agent formatted into its system prompt before, str() of a hand-picked dict
+    return {
+        "hotel": {'hotel_preferences': user_profile['preferences']['hotel']},
+        "place": {
+            'hotel_preferences': user_profile['preferences']['attractions'],
+            'behavioral_style': user_profile['behavioral_style'],
+            'constraint': user_profile['constraints'],
+        },
+        "itinerary": {
+            'behavioral_style': user_profile['behavioral_style'],
+            'constraints': user_profile['constraints'],
+        },
+    }
+
+
+def sample_results(places_count, seed):
+    tables = seed_travel_data(hotels_per_city=10, places_per_city=max(places_count, 1), plans=0, seed=seed)
+    row = tables["travel.hotels"][0]
+    hotel = {
+        "name": row["name"], "check-in": "2 December 2025", "check-out": "3 December 2025",
+        "facilities": "wifi, restaurant, swimming pool", "price_per_night": row["price_per_night"],
+        "rating": row["rating"], "city": row["city"],
+    }
+    # As the tools hand them back: the hotel wrapped by call_hotel_agent_with_hitl, places as the agent's JSON text
+    hotel_result = str({"ask_user": False, 'message': 'hotel is found, next to the next step', 'data': hotel})
+    places = [{"name": place["name"], "category": place["category"]} for place in tables["travel.places"][:places_count]]
+    places_result = json.dumps({"choosen_places": places}, indent=4)
+    return hotel_result, places_result, hotel, places
+
+
+def previous_itinerary_input(vacation_period, places, hotels):
+    return f"""
+        vacation_periode: {vacation_period}
+        hotels: {hotels}
+        places: {places}
+        """
+
+
+def itinerary_input(vacation_period, places, hotels):
+    # Same as ItineraryAgent.__build_prompt
+    context = trim({"hotels": hotel_context(hotels), "places": places_context(places)}, config.context_budgets["itinerary_input"])
+    return (
+        f"vacation_periode: {vacation_period}\n"
+        f"hotels: {encode(context.get('hotels', {}))}\n"
+        f"places: {encode(context.get('places', []))}"
+    )
+
+
+def root_history(results, refs):
+    """
+    Text the root agent re-reads on each model call of one plan: a call after each of the three tool results.
+    With refs, large results are swapped for {"ref", "preview"} like ToolResultRefs does,
+    and the call to call_itinerary_agent passes the refs instead of repeating the data.
+    """
+    hotel_result, places_result, hotel, places = results
+    store = ContextStore()
+    history, sent = [], 0
+
+    for name, result in (("hotel_agent", hotel_result), ("place_agent", places_result)):
+        if refs and count_tokens(result) >= config.context_ref_min_tokens:
+            preview = trim(parse_loose(result), config.context_ref_preview_tokens)
+            result = encode({"ref": store.put(name, result), "preview": preview})
+        history.append(result)
+        sent += sum(count_tokens(text) for text in history)
+
+    arguments = {"vacation_period": 2, "hotels": "ref:hotel_agent-1", "places": "ref:place_agent-2"} if refs else \
+        {"vacation_period": 2, "hotels": hotel, "places": places}
+    history.append(json.dumps(arguments))
+    sent += sum(count_tokens(text) for text in history)
+    return sent, count_tokens(history[-1])
+
+
+def gemini_counter():
+    from google import genai
+    client = genai.Client(api_key=get_settings().gemini_api_key)
+    return lambda text: client.models.count_tokens(model=MODEL_ID, contents=text).total_tokens
+
+
+def report(rows, counter=None):
+    print(f"{'':<30} {'before':>8} {'after':>8} {'saved':>7}")
+    for name, before, after in rows:
+        if counter is not None and isinstance(before, str):
+            before, after = counter(before), counter(after)
+        elif isinstance(before, str):
+            before, after = count_tokens(before), count_tokens(after)
+        print(f"{name:<30} {before:>8} {after:>8} {1 - after / before:>6.0%}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--places", type=int, default=20, help="places chosen by the place agent")
+    parser.add_argument("--vacation-period", type=int, default=2)
+    parser.add_argument("--gemini", action="store_true", help="count with Gemini's tokenizer instead of ~4 chars per token")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    user_profile = load_user_profile()
+
+    rows = []
+    for agent, profile in previous_profiles(user_profile).items():
+        template = read_prompt(f"agent-{agent}-prompt.txt")
+        rows.append((f"{agent} system prompt", template.format(user_profile=str(profile)),
+                     template.format(user_profile=profile_for(agent, user_profile))))
+
+    results = sample_results(args.places, args.seed)
+    hotel_result, places_result, hotel, places = results
+    rows.append(("itinerary input", previous_itinerary_input(args.vacation_period, places, hotel),
+                 itinerary_input(args.vacation_period, places_result, hotel_result)))
+
+    # Root history is counted with the heuristic only, it is a sum over several calls
+    (before_sent, before_call), (after_sent, after_call) = root_history(results, refs=False), root_history(results, refs=True)
+    rows.append(("root history (3 calls)", before_sent, after_sent))
+    rows.append(("root itinerary tool call", before_call, after_call))
+
+    report(rows, gemini_counter() if args.gemini else None)
@@ -0,0 +1,108 @@
+"""
+Booking-side cost of sending invoices inline versus through InvoiceOutbox,
+against a local HTTP stub standing in for the N8N webhook.
+
+Run from the repository root (no network needed):
+    python -m benchmarks.bench_invoice_outbox --invoices 200 --latency 0.05 --failure-rate 0.2
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from invoice_outbox import InvoiceOutbox
+
+import argparse
+import json
+import os
+import random
+import requests
+import statistics
+import tempfile
+import threading
+import time
+
+
+class StubWebhook(BaseHTTPRequestHandler):
+    latency = 0.05
+    failure_rate = 0.0
+    received = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency)
+
+        if random.random() < self.failure_rate:
+            self.send_response(503)
+        else:
+            with self.lock:
+                StubWebhook.received += 1
+            self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub(latency, failure_rate):
+    StubWebhook.latency = latency
+    StubWebhook.failure_rate = failure_rate
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubWebhook)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/webhook"
+
+
+def invoice(i):
+    return {"email": "user@example.com", "hotel_name": f"Hotel {i}", "hotel_price": 1000000, "hotel_checkin": "2 December 2025"}
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    p99 = samples[max(0, int(len(samples) * 0.99) - 1)]
+    print(f"{name:<8} booking-side mean {statistics.mean(samples) * 1000:>8.2f} ms   p99 {p99 * 1000:>8.2f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--invoices", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    server, endpoint = start_stub(args.latency, 0.0)
+
+    inline = []
+    for i in range(args.invoices // 4):
+        start = time.perf_counter()
+        requests.request("POST", endpoint, headers={'Content-Type': 'application/json'}, data=json.dumps(invoice(i)))
+        inline.append(time.perf_counter() - start)
+
+    StubWebhook.failure_rate = args.failure_rate
+    StubWebhook.received = 0
+    workdir = tempfile.mkdtemp()
+    outbox = InvoiceOutbox(
+        path=os.path.join(workdir, "outbox.sqlite3"),
+        endpoint=endpoint,
+        concurrency=args.concurrency,
+        base_backoff=0.01,
+        max_backoff=0.2,
+        dead_letter_path=os.path.join(workdir, "dead_letter.jsonl"),
+    )
+    outbox.start()
+
+    queued = []
+    delivery_start = time.perf_counter()
+    for i in range(args.invoices):
+        start = time.perf_counter()
+        outbox.enqueue(invoice(i))
+        queued.append(time.perf_counter() - start)
+    outbox.drain(timeout=120)
+    delivery_time = time.perf_counter() - delivery_start
+
+    report("inline", inline)
+    report("outbox", queued)
+    stats = outbox.stats()
+    print(f"delivered {StubWebhook.received}/{args.invoices} in {delivery_time:.2f}s "
+          f"({args.invoices / delivery_time:.0f}/s), retried {stats['retried']}, dead {stats['dead']}, pending {stats['pending']}")
+
+    outbox.stop()
+    server.shutdown()
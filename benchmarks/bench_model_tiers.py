@@ -0,0 +1,172 @@
+"""
+Model tiers per agent: latency, tokens and output validity of each tier's model on recorded fixtures,
+and what a cheap tier costs once outputs failing validation are asked again of its fallback tier.
+Outputs are checked with the same validators the agents use (agents/output_checks.py).
+
+Record fixtures of every tier with real Gemini calls (GEMINI_API_KEY). Cases are read from --cases, and the
+hotel and place tools answer with each case's tool_result, so Supabase is not needed:
+    python -m benchmarks.bench_model_tiers --record model_tiers.json
+
+Replay recorded fixtures (no network needed):
+    python -m benchmarks.bench_model_tiers --fixtures model_tiers.json
+
+No results are shipped: config.agent_models keeps every agent on the standard tier until recorded runs
+show a cheaper tier holds up for it.
+"""
+from pathlib import Path
+
+import argparse
+import json
+import statistics
+import time
+
+AGENTS = ("extract", "hotel", "place", "itinerary")
+
+
+def load_fixtures(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def recorded(fixtures):
+    return all(case.get("runs") for case in fixtures["cases"])
+
+
+def check(agent, output):
+    from agents.output_checks import VALIDATORS
+    if agent == "extract":
+        # Recorded as the TripRequest JSON the extract agent returned
+        from agents.root_agent import TripRequest
+        try:
+            return VALIDATORS[agent](TripRequest.model_validate_json(output))
+        except ValueError:
+            return False
+    return VALIDATORS[agent](output)
+
+
+def summarize(fixtures):
+    tiers = fixtures["tiers"]
+    print(f"{fixtures.get('source', '')}\n")
+    print(f"{'agent':<10} {'tier':<18} {'n':>3} {'valid':>6} {'p50 ms':>8} {'in tok':>7} {'out tok':>8}")
+    for agent in AGENTS:
+        cases = [case for case in fixtures["cases"] if case["agent"] == agent]
+        if not cases:
+            continue
+        for tier, tier_config in tiers.items():
+            runs = [case["runs"][tier] for case in cases if tier in case.get("runs", {})]
+            if not runs:
+                continue
+            valid = [check(agent, run["output"]) for run in runs]
+            print(f"{agent:<10} {tier:<18} {len(runs):>3} {sum(valid) / len(runs):>6.0%}"
+                  f" {statistics.median(run['latency_ms'] for run in runs):>8.0f}"
+                  f" {statistics.mean(run['input_tokens'] for run in runs):>7.0f}"
+                  f" {statistics.mean(run['output_tokens'] for run in runs):>8.0f}")
+
+            # Invalid outputs pay for the fallback tier's call on top
+            fallback = tier_config.get("fallback")
+            if fallback is None:
+                continue
+            latencies, input_tokens, output_tokens, valid_after = [], [], [], []
+            for case, ok in zip(cases, valid):
+                run, retry = case["runs"][tier], case["runs"].get(fallback)
+                if ok or retry is None:
+                    latencies.append(run["latency_ms"])
+                    input_tokens.append(run["input_tokens"])
+                    output_tokens.append(run["output_tokens"])
+                    valid_after.append(ok)
+                else:
+                    latencies.append(run["latency_ms"] + retry["latency_ms"])
+                    input_tokens.append(run["input_tokens"] + retry["input_tokens"])
+                    output_tokens.append(run["output_tokens"] + retry["output_tokens"])
+                    valid_after.append(check(agent, retry["output"]))
+            print(f"{agent:<10} {f'{tier} -> {fallback}':<18} {len(cases):>3} {sum(valid_after) / len(cases):>6.0%}"
+                  f" {statistics.median(latencies):>8.0f} {statistics.mean(input_tokens):>7.0f} {statistics.mean(output_tokens):>8.0f}")
+        print()
+
+
+def stub_tools(case):
+    # Hotel and place agents call their tool, it answers with the recorded rows so every tier sees the same data
+    from strands import tool
+
+    @tool
+    def pick_hotel(city: str, rating: int, swimming_pool: bool, restaurant: bool, wifi: bool, parking: bool,
+                   gym: bool, max_price_per_night: int, name: str = ""):
+        """
+        Tool: pick_hotel
+        Description: Use this tools for get hotels data based on user profile.
+        """
+        return {"ask_user": False, "data": case["tool_result"]}
+
+    @tool
+    def find_places(city: str, max_ticket_price: int, category: list[str], name: str = "", description: str = ""):
+        """
+        Tool: find_places
+        Description: Use this tools for fetching places data based on user profile.
+        """
+        return case["tool_result"]
+
+    return {"hotel": [pick_hotel], "place": [find_places]}.get(case["agent"], [])
+
+
+def record(fixtures):
+    from strands import Agent
+    from agents.llm_model import agent_model_settings, get_shared_model
+    from agents.profile_store import get_profile_store
+    from agents.root_agent import TripRequest
+    from settings import read_prompt
+    import config
+
+    for case in fixtures["cases"]:
+        agent_name = case["agent"]
+        settings = agent_model_settings(agent_name)
+        if agent_name == "extract":
+            system_prompt = read_prompt("root-agent-extract-prompt.txt")
+        else:
+            system_prompt = get_profile_store().system_prompt(config.default_user_id, agent_name)
+
+        case["runs"] = {}
+        for tier, tier_config in fixtures["tiers"].items():
+            model = get_shared_model(settings["temperature"], tier_config["model_id"], settings["max_output_tokens"])
+            agent = Agent(model=model, system_prompt=system_prompt, tools=stub_tools(case), callback_handler=None)
+            start = time.perf_counter()
+            try:
+                if agent_name == "extract":
+                    output = agent(case["input"], structured_output_model=TripRequest).structured_output.model_dump_json()
+                else:
+                    output = str(agent(case["input"]))
+            except Exception as e:
+                output = f"error: {e}"
+            usage = agent.event_loop_metrics.accumulated_usage
+            case["runs"][tier] = {
+                "model_id": tier_config["model_id"],
+                "output": output,
+                "latency_ms": round((time.perf_counter() - start) * 1000),
+                "input_tokens": usage["inputTokens"],
+                "output_tokens": usage["outputTokens"],
+            }
+            print(f"recorded {case['id']} on {tier}: {case['runs'][tier]['latency_ms']} ms")
+
+    fixtures["source"] = f"recorded {time.strftime('%Y-%m-%d')}"
+    return fixtures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", default=str(Path(__file__).parent / "fixtures" / "model_tier_cases.json"),
+                        help="tiers and cases to record, without outputs")
+    parser.add_argument("--fixtures", help="fixtures written by --record, to replay")
+    parser.add_argument("--record", help="call each tier's model for every case and write the fixtures here")
+    args = parser.parse_args()
+
+    if args.record:
+        fixtures = record(load_fixtures(args.cases))
+        with open(args.record, "w") as f:
+            json.dump(fixtures, f, indent=2)
+    elif args.fixtures:
+        fixtures = load_fixtures(args.fixtures)
+    else:
+        parser.error("pass --record <path> to record fixtures with Gemini, or --fixtures <path> to replay recorded ones")
+
+    if not recorded(fixtures):
+        parser.error(f"{args.fixtures} has cases without recorded runs, record them with --record first")
+    summarize(fixtures)
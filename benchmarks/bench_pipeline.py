@@ -0,0 +1,111 @@
+"""
+End-to-end planning latency per stage (root, hotel, place, itinerary, db_insert) and throughput
+at several concurrency levels, with ScriptedModel standing in for Gemini and FakeSupabase for Supabase.
+
+Run from the repository root (no network needed):
+    python -m benchmarks.bench_pipeline --requests 40 --concurrency 1 4 16 --time-scale 0.1
+    python -m benchmarks.bench_pipeline --script recorded_turns.json --hotel-wishes
+
+--time-scale shrinks the scripted model latency (1.0 is roughly real Gemini timing),
+--script replays recorded turns (role -> list of {"tool", "input"} or {"text"}) instead of the default script.
+"""
+from benchmarks.fakes import FakeSupabase, ScriptedModel, default_script, install_fake_supabase, seed_travel_data, use_scratch_files
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext, redirect_stdout
+
+import argparse
+import io
+import json
+import threading
+import time
+
+STAGES = ["root", "hotel", "place", "itinerary", "db_insert", "total"]
+
+
+class StageRecorder:
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+        self.__lock = threading.Lock()
+
+    def __call__(self, stage, seconds):
+        with self.__lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[max(0, min(len(samples) - 1, round(q / 100 * len(samples)) - 1))]
+
+
+def plan_once(agent, prompt, record):
+    # run_stage, parse_json and insert_plan_to_planner are imported once the fakes are installed
+    start = time.perf_counter()
+    res = agent.call_agent_parallel(prompt, on_stage=record)
+    data = parse_json(str(res.message['content'][0]['text']))
+    run_stage(record, "db_insert", insert_plan_to_planner, data)
+    record("total", time.perf_counter() - start)
+
+
+def run_level(agent, prompt, requests, concurrency, verbose):
+    record = StageRecorder()
+    start = time.perf_counter()
+    with nullcontext() if verbose else redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(lambda _: plan_once(agent, prompt, record), range(requests)))
+    wall = time.perf_counter() - start
+
+    return record, wall
+
+
+def report(concurrency, requests, record, wall):
+    print(f"\nconcurrency {concurrency}: {requests} plans in {wall:.2f}s, {requests / wall:.2f} plans/s")
+    print(f"  {'stage':<10} {'n':>5} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for stage in STAGES:
+        samples = record.samples.get(stage)
+        if not samples:
+            continue
+        print(f"  {stage:<10} {len(samples):>5} {percentile(samples, 50) * 1000:>10.1f} "
+              f"{percentile(samples, 95) * 1000:>10.1f} {percentile(samples, 99) * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--time-scale", type=float, default=0.1)
+    parser.add_argument("--db-latency", type=float, default=0.03, help="seconds per Supabase round trip before time-scale")
+    parser.add_argument("--days", type=int, default=2)
+    parser.add_argument("--script", help="JSON file with recorded turns per agent role")
+    parser.add_argument("--hotel-wishes", action="store_true", help="free-text hotel criteria, forces the hotel LLM path")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    db = install_fake_supabase(FakeSupabase(seed_travel_data(seed=args.seed), latency=args.db_latency * args.time_scale))
+
+    if args.script:
+        with open(args.script, "r") as f:
+            script = json.load(f)
+    else:
+        script = default_script(vacation_period=args.days)
+        if args.hotel_wishes:
+            script["extract"][0]["input"].update(hotel_criteria="Jakarta hotel near the old town with a pool", hotel_wishes="near the old town with a pool")
+
+    import config
+    config.llm_cache_enabled = False  # every request pays the full model path
+    use_scratch_files()
+
+    from agents.llm_model import set_model_factory
+    model = ScriptedModel(script, time_scale=args.time_scale, seed=args.seed)
+    set_model_factory(lambda temperature: model)
+
+    from agents.root_agent import StrandsAgent, run_stage
+    from main import parse_json, insert_plan_to_planner
+    agent = StrandsAgent(hitl=False)
+    prompt = f"Plan a {args.days}-day trip to Jakarta"
+
+    for concurrency in args.concurrency:
+        calls, queries = model.calls, db.queries
+        record, wall = run_level(agent, prompt, args.requests, concurrency, args.verbose)
+        report(concurrency, args.requests, record, wall)
+        print(f"  model calls {(model.calls - calls) / args.requests:.1f}/plan, db queries {(db.queries - queries) / args.requests:.1f}/plan")
@@ -0,0 +1,143 @@
+"""
+Place search: the place index (TF-IDF over name, category and description, memory-mapped) against
+the travel.places filter query. Reports index build time and size, search latency with city, category
+and price filters, precision@5 of described searches (share of results in the described category),
+and place agent latency and model calls when the agent re-calls the filter query with other categories
+versus one described search, with ScriptedModel and FakeSupabase.
+
+Run from the repository root (no network needed):
+    python -m benchmarks.bench_place_search --places 100000 --plans 20 --recalls 2 --time-scale 0.1
+"""
+from benchmarks.fakes import (
+    CITIES, PLACE_CATEGORIES, PLACE_WORDS, FakeSupabase, ScriptedModel, default_script,
+    install_fake_supabase, seed_travel_data, use_scratch_files,
+)
+from contextlib import redirect_stdout
+
+import argparse
+import io
+import os
+import random
+import statistics
+import time
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[max(0, min(len(samples) - 1, round(q / 100 * len(samples)) - 1))]
+
+
+def filter_query(db, city, category, max_ticket_price):
+    # The travel.places query of PlaceAgent.__find_places
+    return db.schema('travel').table("places")\
+            .select("name, category, latitude, longitude")\
+            .eq("city", city)\
+            .in_("category", category)\
+            .lte("ticket_price", max_ticket_price)\
+            .limit(5)\
+            .execute().data
+
+
+def described_queries(count, seed):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        category = rng.choice(PLACE_CATEGORIES)
+        queries.append((" and ".join(rng.sample(PLACE_WORDS[category], 2)), category, rng.choice(CITIES)))
+    return queries
+
+
+def run_index(args, db):
+    from place_index import PlaceIndex
+    rows = db.tables["travel.places"]
+    path = os.path.join(use_scratch_files(), "place_index")
+
+    start = time.perf_counter()
+    index = PlaceIndex.build(rows, path, dimensions=args.dimensions)
+    build = time.perf_counter() - start
+    size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    print(f"index: {len(index)} places, {args.dimensions} dimensions, built in {build:.1f}s, {size / 1e6:.0f} MB on disk")
+
+    queries = described_queries(args.searches, args.seed)
+    samples, relevant = [], 0
+    for text, category, city in queries:
+        start = time.perf_counter()
+        found = index.search(text, city, category=[], max_ticket_price=150000, k=5)
+        samples.append(time.perf_counter() - start)
+        relevant += sum(1 for place in found if place["category"] == category)
+
+    # Without a description the query can only filter, an agent that has not guessed the category gets any 5 places.
+    # The in-memory fake filters in Python, a sample of the queries is enough
+    baseline_queries = queries[:50]
+    baseline = 0
+    for text, category, city in baseline_queries:
+        baseline += sum(1 for place in filter_query(db, city, PLACE_CATEGORIES, 150000) if place["category"] == category)
+
+    print(f"search: p50 {statistics.median(samples) * 1000:.2f} ms   p99 {percentile(samples, 99) * 1000:.2f} ms"
+          f"   ({len(index) // len(CITIES)} places per city)")
+    print(f"precision@5 of described searches: index {relevant / (5 * len(queries)):.0%}"
+          f"   filter query, all categories {baseline / (5 * len(baseline_queries)):.0%}")
+
+
+def place_script(recalls):
+    # The place agent's turns: a filter query re-called with other categories, or one described search
+    turns = []
+    for categories in (["Cultural", "Historical"], ["Museum", "Landmark"], ["Family", "Nature"])[:recalls + 1]:
+        turns.append({"tool": "find_places", "input": {"city": "Jakarta", "max_ticket_price": 100000, "category": categories}})
+    return turns + [{"text": "{choosen_places}"}]
+
+
+def run_agent(args, db):
+    import config
+    from agents.llm_model import set_model_factory
+    from agents.agent_place import PlaceAgent
+    from place_index import get_place_index
+
+    scripts = {
+        f"filter, {args.recalls} re-calls": place_script(args.recalls),
+        "described search": default_script()["place"],
+    }
+    print(f"\nplace agent, {args.plans} plans, Supabase round trip {args.db_latency * args.time_scale * 1000:.0f} ms")
+    for name, turns in scripts.items():
+        config.place_search = name == "described search"
+        model = ScriptedModel({"place": turns}, time_scale=args.time_scale, seed=args.seed)
+        set_model_factory(lambda temperature: model)
+        agent = PlaceAgent(temperature=0.7)
+        samples = []
+        with redirect_stdout(io.StringIO()):
+            # The agent starts building the index in the background, plans are timed once it is ready
+            while config.place_search and get_place_index() is None:
+                time.sleep(0.1)
+            agent.call_place_agent("Cultural and historical places in Jakarta")
+            calls, queries = model.calls, db.queries
+            for i in range(args.plans):
+                start = time.perf_counter()
+                agent.call_place_agent(f"Cultural and historical places in Jakarta, plan {i}")
+                samples.append(time.perf_counter() - start)
+        print(f"  {name:<22} p50 {statistics.median(samples) * 1000:>7.1f} ms   p95 {percentile(samples, 95) * 1000:>7.1f} ms"
+              f"   model calls {(model.calls - calls) / args.plans:.1f}/plan   queries {(db.queries - queries) / args.plans:.1f}/plan")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--places", type=int, default=100000, help="places indexed, spread over the seeded cities")
+    parser.add_argument("--dimensions", type=int, default=1024)
+    parser.add_argument("--searches", type=int, default=500)
+    parser.add_argument("--plans", type=int, default=20)
+    parser.add_argument("--recalls", type=int, default=2, help="extra filter queries the agent makes without search")
+    parser.add_argument("--time-scale", type=float, default=0.1)
+    parser.add_argument("--db-latency", type=float, default=0.15, help="seconds per Supabase round trip before time-scale")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    tables = seed_travel_data(hotels_per_city=10, places_per_city=args.places // len(CITIES), plans=0, seed=args.seed)
+    db = install_fake_supabase(FakeSupabase(tables))
+
+    import config
+    config.llm_cache_enabled = False  # every plan reaches the tool
+    config.trace_enabled = False
+    use_scratch_files()
+
+    run_index(args, db)
+    db.latency = args.db_latency * args.time_scale
+    run_agent(args, db)
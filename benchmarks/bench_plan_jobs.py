@@ -0,0 +1,173 @@
+"""
+Interactive planning traffic: a fresh planner process per trip (what running main.py per request costs,
+at most --concurrency at once) versus POST /plans/jobs on one backend process with its async worker pool.
+Trips arrive at --rate per second. Reports trips/s, submit and end-to-end latency, 429s when the job queue
+is full, cancelled jobs and peak threads, with ScriptedModel and FakeSupabase (no network needed).
+
+Run from the repository root:
+    python -m benchmarks.bench_plan_jobs --trips 200 --rate 20 --concurrency 8 --time-scale 0.05
+"""
+from benchmarks.fakes import FakeSupabase, ScriptedModel, default_script, install_fake_supabase, seed_travel_data, use_scratch_files
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+import argparse
+import asyncio
+import io
+import json
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+PROMPT = "Plan a 2-day trip to Jakarta"
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))] if ordered else 0.0
+
+
+def setup(args):
+    install_fake_supabase(FakeSupabase(seed_travel_data(seed=args.seed), latency=args.db_latency * args.time_scale))
+
+    import config
+    config.llm_cache_enabled = False
+    config.approval_mode = "console"  # jobs search hotels without booking, as batch runs do
+    config.trace_enabled = False
+    use_scratch_files()
+
+    from agents.llm_model import set_model_factory
+    model = ScriptedModel(default_script(), time_scale=args.time_scale, seed=args.seed)
+    set_model_factory(lambda temperature: model)
+    return config
+
+
+def plan_one(args):
+    # What a process per trip runs: start up, build the agents, plan one trip, write it and exit
+    setup(args)
+    from agents.root_agent import StrandsAgent
+    from main import parse_json, insert_plan_to_planner
+    from planner_writer import drain_planner_writer
+    with redirect_stdout(io.StringIO()):
+        res = StrandsAgent(hitl=False).call_agent_parallel(PROMPT)
+        insert_plan_to_planner(parse_json(str(res.message['content'][0]['text']).strip()))
+        drain_planner_writer(5)
+
+
+def run_processes(args):
+    command = [sys.executable, "-m", "benchmarks.bench_plan_jobs", *sys.argv[1:], "--mode", "one"]
+    samples = []
+
+    def trip(i):
+        time.sleep(max(0.0, start + i / args.rate - time.perf_counter()))
+        arrived = time.perf_counter()
+        subprocess.run(command, check=True, capture_output=True)
+        samples.append(time.perf_counter() - arrived)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(trip, range(args.trips)))
+    wall = time.perf_counter() - start
+    print(f"{'process per trip':<18} {args.trips / wall:>6.1f} trips/s   end-to-end p50 {percentile(samples, 50):>6.2f}s"
+          f"   p95 {percentile(samples, 95):>6.2f}s   ({args.concurrency} processes at once)")
+
+
+class Dashboard:
+    """Stands in for a websocket on /ws/itinerary-stream, records when each job finishes."""
+    def __init__(self):
+        self.finished = {}
+        self.events = 0
+        self.done = asyncio.Event()
+        self.expected = None
+
+    async def send_text(self, text):
+        message = json.loads(text)
+        self.events += 1
+        if message.get("type") == "finished":
+            self.finished[message["stream_id"]] = (time.perf_counter(), message["status"])
+            if self.expected is not None and self.expected <= self.finished.keys():
+                self.done.set()
+
+
+async def run_jobs(args):
+    import httpx
+    import backend
+
+    dashboard = Dashboard()
+    await backend.itinerary_hub.subscribe(dashboard)
+    peak_threads = threading.active_count()
+    async with backend.lifespan(backend.app):
+        transport = httpx.ASGITransport(app=backend.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://backend") as client:
+            arrived, submit_samples, rejected = {}, [], 0
+            start = time.perf_counter()
+            for i in range(args.trips):
+                await asyncio.sleep(max(0.0, start + i / args.rate - time.perf_counter()))
+                sent = time.perf_counter()
+                response = await client.post("/plans/jobs", json={"prompt": PROMPT}, headers={"Idempotency-Key": f"trip-{i}"})
+                submit_samples.append(time.perf_counter() - sent)
+                if response.status_code == 429:
+                    rejected += 1
+                    continue
+                job_id = response.json()["job_id"]
+                arrived[job_id] = sent
+                if args.cancel and i % round(1 / args.cancel) == 0:
+                    await client.delete(f"/plans/jobs/{job_id}")
+                peak_threads = max(peak_threads, threading.active_count())
+
+            dashboard.expected = set(arrived)
+            while not dashboard.done.is_set():
+                peak_threads = max(peak_threads, threading.active_count())
+                try:
+                    await asyncio.wait_for(dashboard.done.wait(), 0.05)
+                except asyncio.TimeoutError:
+                    pass
+            wall = time.perf_counter() - start
+            stats = (await client.get("/plans/jobs")).json()
+
+    return wall, arrived, submit_samples, rejected, dashboard, peak_threads, stats
+
+
+def report_jobs(args, wall, arrived, submit_samples, rejected, dashboard, peak_threads, stats):
+    statuses = [status for _, status in dashboard.finished.values()]
+    samples = [dashboard.finished[job_id][0] - sent for job_id, sent in arrived.items()
+               if dashboard.finished[job_id][1] == "succeeded"]
+    print(f"{'plan jobs':<18} {len(samples) / wall:>6.1f} trips/s   end-to-end p50 {percentile(samples, 50):>6.2f}s"
+          f"   p95 {percentile(samples, 95):>6.2f}s   ({args.concurrency} workers, queue {args.queue_size})")
+    print(f"{'':<18} submit p50 {statistics.median(submit_samples) * 1000:.1f} ms   p99 {percentile(submit_samples, 99) * 1000:.1f} ms"
+          f"   429s {rejected}   succeeded {statuses.count('succeeded')}   cancelled {statuses.count('cancelled')}"
+          f"   failed {statuses.count('failed')}")
+    print(f"{'':<18} progress events {dashboard.events}   peak threads {peak_threads}   backend job stats {stats}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=20, help="trips arriving per second")
+    parser.add_argument("--concurrency", type=int, default=8, help="plan job workers, and planner processes at once")
+    parser.add_argument("--queue-size", type=int, default=32, help="plan jobs waiting before 429")
+    parser.add_argument("--cancel", type=float, default=0.05, help="share of jobs cancelled right after submitting")
+    parser.add_argument("--process-trips", type=int, default=24, help="trips for the process-per-trip baseline")
+    parser.add_argument("--time-scale", type=float, default=0.05)
+    parser.add_argument("--db-latency", type=float, default=0.03, help="seconds per Supabase round trip before time-scale")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--mode", choices=["both", "processes", "jobs", "one"], default="both")
+    args = parser.parse_args()
+
+    if args.mode == "one":
+        plan_one(args)
+        sys.exit(0)
+
+    print(f"{args.trips} trips at {args.rate:g}/s (process baseline: {args.process_trips} trips), time scale {args.time_scale}\n")
+    if args.mode in ("both", "processes"):
+        run_processes(argparse.Namespace(**{**vars(args), "trips": args.process_trips}))
+
+    if args.mode in ("both", "jobs"):
+        config = setup(args)
+        config.plan_job_workers = args.concurrency
+        config.plan_job_queue_size = args.queue_size
+        with redirect_stdout(io.StringIO()):
+            results = asyncio.run(run_jobs(args))
+        report_jobs(args, *results)
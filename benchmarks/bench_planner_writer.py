@@ -0,0 +1,144 @@
+"""
+Plan and booking writes: id collisions of the old 8-hex uuid1 ids versus ULID-style ids, then
+single-row inserts versus the planner writer (batched upserts through a local write-ahead log)
+for throughput, Supabase round trips, rows lost during an outage and rows inserted twice on retry.
+
+Run from the repository root (no network needed):
+    python -m benchmarks.bench_planner_writer --rows 5000 --threads 16 --db-latency 0.02 --outage 1.0
+"""
+from benchmarks.fakes import FakeSupabase, install_fake_supabase
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from multiprocessing import Pool
+
+import argparse
+import io
+import random
+import statistics
+import tempfile
+import time
+import os
+
+
+class FlakySupabase(FakeSupabase):
+    """FakeSupabase that raises on every query until the outage is over."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.down_until = 0.0
+
+    def execute(self, schema, table, query):
+        if time.time() < self.down_until:
+            time.sleep(self.latency)
+            raise ConnectionError("supabase unavailable")
+        return super().execute(schema, table, query)
+
+
+def old_ids(count, days, seed):
+    # "PLAN-" + uuid1()[:8] keeps the low 32 bits of the 100 ns timestamp, which wrap every 429 s,
+    # so plans created at random moments over days land in a 2^32 id space
+    rng = random.Random(seed)
+    start, ticks = time.time_ns() // 100, int(days * 86400 * 10 ** 7)
+    return [f"PLAN-{(start + rng.randrange(ticks)) & 0xFFFFFFFF:08x}" for _ in range(count)]
+
+
+def new_ids(count):
+    from planner_writer import new_id
+    return [new_id("PLAN") for _ in range(count)]
+
+
+def collisions(ids):
+    return len(ids) - len(set(ids))
+
+
+def plan_row(i, plan_id):
+    return {"plan_id": plan_id, "start": "2025-12-02T07:00:00Z", "end": "2025-12-03T21:00:00Z",
+            "description": f"Plan {i}", "booking_id": None, "itinerary": "{}"}
+
+
+def direct_insert(db, row):
+    # The old path: one insert per plan, a failed insert loses the plan
+    try:
+        db.schema('planner').table("plans").insert([row]).execute()
+        return True
+    except Exception:
+        return False
+
+
+def run(name, db, write, rows, threads, outage, retry):
+    db.tables["planner.plans"] = []
+    queries = db.queries
+    db.down_until = time.time() + outage
+
+    samples = []
+    def timed(i):
+        start = time.perf_counter()
+        ok = write(i)
+        if retry:
+            write(i)  # the same plan written again, as a retried request would
+        samples.append(time.perf_counter() - start)
+        return ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(timed, range(rows)))
+    return start, samples, queries
+
+
+def report(name, db, rows, start, samples, queries, retry):
+    wall = time.perf_counter() - start
+    stored = db.tables["planner.plans"]
+    unique = len({row["description"] for row in stored})
+    p99 = sorted(samples)[int(len(samples) * 0.99) - 1]
+    print(f"{name:<8} {rows / wall:>8.0f} rows/s   write p50 {statistics.median(samples) * 1000:>7.2f} ms"
+          f"   p99 {p99 * 1000:>7.2f} ms   round trips {db.queries - queries:>6}   lost {rows - unique:>5}"
+          f"   duplicated {len(stored) - unique:>5}{'   (every plan written twice)' if retry else ''}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--db-latency", type=float, default=0.02, help="seconds per Supabase round trip")
+    parser.add_argument("--outage", type=float, default=1.0, help="seconds Supabase is down at the start of each run")
+    parser.add_argument("--ids", type=int, nargs="+", default=[10000, 100000, 1000000], help="plans created")
+    parser.add_argument("--id-days", type=float, default=30, help="days the plans are created over")
+    parser.add_argument("--id-processes", type=int, default=4, help="processes generating new ids at once")
+    args = parser.parse_args()
+
+    db = install_fake_supabase(FlakySupabase({"planner.plans": []}, latency=args.db_latency))
+
+    for count in args.ids:
+        # Separate processes stand in for concurrent planner instances (CLI, batch, backend workers)
+        with Pool(args.id_processes) as pool:
+            chunks = pool.map(new_ids, [count // args.id_processes] * args.id_processes)
+        ulids = [i for chunk in chunks for i in chunk]
+        in_order = all(chunk == sorted(chunk) for chunk in chunks)
+        print(f"{count:>8} plans   uuid1[:8] over {args.id_days:g} days: {collisions(old_ids(count, args.id_days, count)):>6} colliding ids"
+              f"   ulid from {args.id_processes} processes: {collisions(ulids):>2} colliding, creation order {in_order}")
+    print()
+
+    import config
+    workdir = tempfile.mkdtemp()
+    config.trace_enabled = False
+    from planner_writer import PlannerWriter, new_id, idempotency_key
+
+    for retry in (False, True):
+        start, samples, queries = run("direct", db, lambda i: direct_insert(db, plan_row(i, new_id("PLAN"))),
+                                      args.rows, args.threads, args.outage, retry)
+        report("direct", db, args.rows, start, samples, queries, retry)
+
+        writer = PlannerWriter(
+            path=os.path.join(workdir, f"writes-{retry}.sqlite3"),
+            batch_size=config.planner_write_batch_size,
+            flush_seconds=config.planner_write_flush_seconds,
+            base_backoff=0.05,
+            max_backoff=0.5,
+            dead_letter_path=os.path.join(workdir, "dead_letter.jsonl"),
+        )
+        writer.start()
+        write = lambda i: writer.write("plans", plan_row(i, new_id("PLAN")), idempotency_key("bench", i))
+        with redirect_stdout(io.StringIO()):
+            start, samples, queries = run("writer", db, write, args.rows, args.threads, args.outage, retry)
+            writer.drain(timeout=120)
+        report("writer", db, args.rows, start, samples, queries, retry)
+        writer.stop()
@@ -0,0 +1,100 @@
+"""
+Speculative prefetch: plan latency with and without hotels and places fetched while the trip is extracted,
+for the hotel fast path and the hotel LLM path (--hotel-wishes). Reports hotel and place stage latency,
+prefetch hit rate, latency saved per plan and Supabase queries per plan, with ScriptedModel and FakeSupabase.
+--wrong-city sends that share of prompts naming another city than the one the model extracts,
+so those prefetches are wasted and their lookups miss.
+
+Run from the repository root (no network needed):
+    python -m benchmarks.bench_prefetch --requests 40 --concurrency 4 --time-scale 0.1 --db-latency 0.15
+"""
+from benchmarks.fakes import FakeSupabase, ScriptedModel, default_script, install_fake_supabase, seed_travel_data, use_scratch_files
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+import argparse
+import io
+import threading
+import time
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[max(0, min(len(samples) - 1, round(q / 100 * len(samples)) - 1))] if samples else 0.0
+
+
+def run(agent, prompts, concurrency):
+    samples, lock = {}, threading.Lock()
+    def record(stage, seconds):
+        with lock:
+            samples.setdefault(stage, []).append(seconds)
+
+    def plan(prompt):
+        start = time.perf_counter()
+        agent.call_agent_parallel(prompt, on_stage=record)
+        record("total", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(plan, prompts))
+    return samples, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--time-scale", type=float, default=0.1)
+    parser.add_argument("--db-latency", type=float, default=0.15, help="seconds per Supabase round trip before time-scale")
+    parser.add_argument("--days", type=int, default=2)
+    parser.add_argument("--wrong-city", type=float, default=0.0, help="share of prompts naming another city than the extracted one")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    db = install_fake_supabase(FakeSupabase(seed_travel_data(seed=args.seed), latency=args.db_latency * args.time_scale))
+
+    import config
+    config.llm_cache_enabled = False  # every plan reaches the tools
+    config.trace_enabled = False
+    use_scratch_files()
+
+    from agents.llm_model import set_model_factory
+    from agents.prefetch import get_prefetcher
+    from agents.root_agent import StrandsAgent
+
+    wrong_every = round(1 / args.wrong_city) if args.wrong_city else 0
+    prompts = [
+        f"Plan a {args.days}-day trip to {'Bandung' if wrong_every and i % wrong_every == 0 else 'Jakarta'} from 2 December 2025"
+        for i in range(args.requests)
+    ]
+    print(f"{args.requests} plans, concurrency {args.concurrency}, time scale {args.time_scale}, "
+          f"Supabase round trip {args.db_latency * args.time_scale * 1000:.0f} ms, wrong city {args.wrong_city:.0%}")
+
+    for path in ("fast path", "hotel LLM"):
+        script = default_script(vacation_period=args.days)
+        if path == "hotel LLM":
+            script["extract"][0]["input"].update(hotel_criteria="Jakarta hotel near the old town with a pool", hotel_wishes="near the old town with a pool")
+        model = ScriptedModel(script, time_scale=args.time_scale, seed=args.seed)
+        set_model_factory(lambda temperature: model)
+        agent = StrandsAgent(hitl=False)
+
+        print(f"\n{path}")
+        print(f"  {'prefetch':<9} {'plans/s':>8} {'hotel p50':>10} {'place p50':>10} {'total p50':>10} {'total p95':>10}"
+              f" {'queries':>8} {'hit rate':>9} {'saved/plan':>11}")
+        for enabled in (False, True):
+            config.prefetch_enabled = enabled
+            before = get_prefetcher().stats() if enabled else None
+            queries = db.queries
+            samples, wall = run(agent, prompts, args.concurrency)
+
+            line = (f"  {'on' if enabled else 'off':<9} {args.requests / wall:>8.2f}"
+                    f" {percentile(samples['hotel'], 50) * 1000:>8.1f}ms {percentile(samples['place'], 50) * 1000:>8.1f}ms"
+                    f" {percentile(samples['total'], 50) * 1000:>8.1f}ms {percentile(samples['total'], 95) * 1000:>8.1f}ms"
+                    f" {(db.queries - queries) / args.requests:>8.1f}")
+            if enabled:
+                after = get_prefetcher().stats()
+                hits, misses = after["hits"] - before["hits"], after["misses"] - before["misses"]
+                saved = after["saved_seconds"] - before["saved_seconds"]
+                line += f" {hits / max(hits + misses, 1):>9.0%} {saved / args.requests * 1000:>9.1f}ms"
+            print(line)
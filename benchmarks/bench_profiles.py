@@ -0,0 +1,161 @@
+"""
+Per-user system prompts: reading the user's profile file and formatting every agent's prompt on each
+plan (what one profile per process did at startup, repeated per request) versus ProfileStore with
+compiled prompts in an LRU, local and against FakeSupabase. Reports plans/s, prompt setup latency,
+hit rate, and whether a saved profile shows up in the next plan's prompts.
+
+Run from the repository root (no network needed):
+    python -m benchmarks.bench_profiles --users 2000 --plans 20000 --threads 16 --cache-size 4096
+"""
+from benchmarks.fakes import FakeSupabase, install_fake_supabase
+from concurrent.futures import ThreadPoolExecutor
+
+import argparse
+import copy
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+AGENTS = ("hotel", "place", "itinerary")
+
+
+def make_profiles(base, users, seed):
+    rng = random.Random(seed)
+    profiles = {}
+    for i in range(users):
+        profile = copy.deepcopy(base)
+        profile["user_id"] = f"USR{i:05d}"
+        profile["email"] = f"user{i}@example.com"
+        profile["preferences"]["hotel"]["max_budget_per_night"] = rng.randrange(500, 5000) * 1000
+        profile["preferences"]["hotel"]["min_rating"] = rng.choice([3.0, 3.5, 4.0, 4.5])
+        profile["behavioral_style"]["trip_style"] = rng.choice(["relax", "packed", "balanced"])
+        profiles[profile["user_id"]] = profile
+    return profiles
+
+
+def popular_users(user_ids, plans, seed):
+    # A few users plan often, most plan rarely
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(user_ids))]
+    return rng.choices(user_ids, weights=weights, k=plans)
+
+
+def read_profile_file(profile_dir, user_id):
+    with open(os.path.join(profile_dir, f"{user_id}.json"), "r") as f:
+        return json.load(f)
+
+
+def per_request_prompts(read_profile, user_id):
+    # The old __import_prompt__, once per plan: read the profile, slice it and format each prompt
+    from agents.context_encoder import profile_for
+    profile = read_profile(user_id)
+    prompts = {}
+    for agent in AGENTS:
+        with open(f"./system_prompts/agent-{agent}-prompt.txt", "r") as f:
+            prompts[agent] = f.read().format(user_profile=profile_for(agent, profile))
+    return prompts
+
+
+def store_prompts(store, user_id):
+    store.profile(user_id)
+    return {agent: store.system_prompt(user_id, agent) for agent in AGENTS}
+
+
+def run(name, prompts_for, plans, threads):
+    samples, lock = [], threading.Lock()
+    def timed(user_id):
+        start = time.perf_counter()
+        prompts_for(user_id)
+        with lock:
+            samples.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(timed, plans))
+    wall = time.perf_counter() - start
+    p99 = sorted(samples)[int(len(samples) * 0.99) - 1]
+    print(f"{name:<24} {len(plans) / wall:>9.0f} plans/s   prompt setup p50 {statistics.median(samples) * 1e6:>8.0f} us"
+          f"   p99 {p99 * 1e6:>8.0f} us")
+
+
+def save_user_profile(tables, p_user_id, p_profile):
+    # Python version of planner.save_user_profile in sql/user_profiles.sql
+    rows = tables.setdefault("planner.user_profiles", [])
+    for row in rows:
+        if row["user_id"] == p_user_id:
+            row["profile"], row["version"] = p_profile, row["version"] + 1
+            return row["version"]
+    rows.append({"user_id": p_user_id, "profile": p_profile, "version": 1})
+    return 1
+
+
+def check_invalidation(store, user_id):
+    before = store.system_prompt(user_id, "hotel")
+    profile = copy.deepcopy(store.profile(user_id))
+    profile["preferences"]["hotel"]["max_budget_per_night"] += 1000
+    store.save(user_id, profile)
+    after = store.system_prompt(user_id, "hotel")
+    return before != after and str(profile["preferences"]["hotel"]["max_budget_per_night"]) in after
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--plans", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--cache-size", type=int, default=4096, help="compiled prompts kept (3 per user)")
+    parser.add_argument("--db-latency", type=float, default=0.01, help="seconds per Supabase round trip")
+    parser.add_argument("--refresh", type=float, default=30, help="seconds before a cached profile version is checked")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    db = install_fake_supabase(FakeSupabase({}, latency=args.db_latency))
+    db.functions["planner.save_user_profile"] = lambda **params: save_user_profile(db.tables, **params)
+
+    import config
+    config.trace_enabled = False
+    from agents.profile_store import ProfileStore, LocalProfiles, SupabaseProfiles
+    from settings import load_user_profile
+
+    profiles = make_profiles(load_user_profile(), args.users, args.seed)
+    plans = popular_users(list(profiles), args.plans, args.seed)
+    print(f"{args.plans} plans for {args.users} users (distinct users planning: {len(set(plans))}), "
+          f"{args.threads} threads, {args.cache_size} cached prompts\n")
+
+    workdir = tempfile.mkdtemp(prefix="planner-profiles-")
+    profile_dir = os.path.join(workdir, "profiles")
+    os.makedirs(profile_dir)
+    for user_id, profile in profiles.items():
+        with open(os.path.join(profile_dir, f"{user_id}.json"), "w") as f:
+            json.dump(profile, f)
+    with open(os.path.join(workdir, "user_profiles.json"), "w") as f:
+        json.dump(profiles, f)
+    db.tables["planner.user_profiles"] = [
+        {"user_id": user_id, "profile": profile, "version": 1} for user_id, profile in profiles.items()
+    ]
+
+    run("per request (file)", lambda user_id: per_request_prompts(lambda user: read_profile_file(profile_dir, user), user_id),
+        plans, args.threads)
+    queries = db.queries
+    run("per request (supabase)", lambda user_id: per_request_prompts(lambda user: SupabaseProfiles().fetch(user)[0], user_id),
+        plans, args.threads)
+    print(f"{'':<24} {db.queries - queries} Supabase round trips")
+
+    local = ProfileStore(LocalProfiles(os.path.join(workdir, "user_profiles.json")),
+                         max_prompts=args.cache_size, refresh_seconds=args.refresh)
+    run("store (local)", lambda user_id: store_prompts(local, user_id), plans, args.threads)
+
+    queries = db.queries
+    remote = ProfileStore(SupabaseProfiles(), max_prompts=args.cache_size, refresh_seconds=args.refresh)
+    run("store (supabase)", lambda user_id: store_prompts(remote, user_id), plans, args.threads)
+
+    for name, store in (("local", local), ("supabase", remote)):
+        stats = store.stats()
+        print(f"\n{name}: prompt hit rate {stats['hit_rate']:.1%}, {stats['profile_loads']} profile loads, "
+              f"{stats['prompts']} prompts cached for {stats['users']} users"
+              + (f", {db.queries - queries} Supabase round trips" if name == "supabase" else ""))
+        print(f"{name}: saved profile in the next prompt: {check_invalidation(store, plans[0])}")
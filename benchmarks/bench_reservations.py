@@ -0,0 +1,135 @@
+"""
+Concurrent hotel bookings: the old booking (balance read from user_profile.json, never debited, no room
+inventory) versus reservations (hold room and balance, confirm in one database function, release on
+abandon), against FakeSupabase with a Python version of sql/reservations.sql.
+Reports attempts/s, latency, overbooked room-nights, overspent wallets and holds left behind.
+
+Run from the repository root (no network needed):
+    python -m benchmarks.bench_reservations --attempts 2000 --threads 32 --hotels 20 --rooms 5
+"""
+from benchmarks.fakes import FakeSupabase, FakeReservations, install_fake_supabase, seed_travel_data
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+
+import argparse
+import random
+import statistics
+import threading
+import time
+
+NIGHTS = ["2025-12-02", "2025-12-03"]
+
+
+def make_attempts(count, hotels, users, abandon, crash, seed):
+    rng = random.Random(seed)
+    outcomes = rng.choices(["book", "abandon", "crash"], weights=[1 - abandon - crash, abandon, crash], k=count)
+    return [(rng.choice(hotels), rng.choice(users), outcome) for outcome in outcomes]
+
+
+def book_old(db, balance, hotel, user, outcome):
+    # Legacy __book_hotel: the profile balance is only compared, nothing is held or debited
+    if outcome != "book" or balance < hotel["price_per_night"]:
+        return False
+    db.schema('planner').table("bookings").insert([{
+        "booking_id": new_id("BOOK"), "name": hotel["name"], "price_per_night": hotel["price_per_night"],
+        "nights": NIGHTS, "user": user,
+    }]).execute()
+    return True
+
+
+def book_reserved(desk, crashing_desk, balance, hotel, user, outcome):
+    # Plans that crash hold through their own desk, which never releases, as if the process had died
+    desk = crashing_desk if outcome == "crash" else desk
+    result = desk.hold(new_id("RSV"), idempotency_key(new_id("TRY")), hotel["name"], user, NIGHTS,
+                       hotel["price_per_night"], balance)
+    if result["status"] != "held":
+        return False
+    if outcome == "abandon":
+        desk.release(result["reservation_id"])
+        return False
+    if outcome == "crash":
+        return False
+    booking = {"booking_id": new_id("BOOK"), "name": hotel["name"], "price_per_night": hotel["price_per_night"],
+               "nights": NIGHTS, "user": user}
+    return desk.confirm(result["reservation_id"], booking)["status"] == "confirmed"
+
+
+def run(name, book, attempts, threads):
+    samples, lock = [], threading.Lock()
+    def timed(attempt):
+        start = time.perf_counter()
+        booked = book(*attempt)
+        with lock:
+            samples.append(time.perf_counter() - start)
+        return booked
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        booked = sum(executor.map(timed, attempts))
+    return booked, time.perf_counter() - start, samples
+
+
+def report(name, db, rooms, balance, booked, wall, samples, attempts):
+    bookings = db.tables["planner.bookings"]
+    per_night = Counter((row["name"], night) for row in bookings for night in row["nights"])
+    overbooked = sum(max(0, count - rooms) for count in per_night.values())
+    spent = Counter()
+    for row in bookings:
+        spent[row["user"]] += row["price_per_night"] * len(row["nights"])
+    overspent = sum(1 for total in spent.values() if total > balance)
+    p99 = sorted(samples)[int(len(samples) * 0.99) - 1]
+    print(f"{name:<13} {len(attempts) / wall:>7.0f} attempts/s   p50 {statistics.median(samples) * 1000:>6.1f} ms"
+          f"   p99 {p99 * 1000:>6.1f} ms   booked {booked:>5}   overbooked room-nights {overbooked:>5}"
+          f"   overspent wallets {overspent:>4}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--attempts", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--hotels", type=int, default=20)
+    parser.add_argument("--rooms", type=int, default=5, help="rooms per hotel and night")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--stays-per-balance", type=float, default=2.5, help="balance in stays of the priciest hotel")
+    parser.add_argument("--abandon", type=float, default=0.2, help="share of plans dropped after the hold")
+    parser.add_argument("--crash", type=float, default=0.05, help="share of plans that die holding a room")
+    parser.add_argument("--ttl", type=float, default=1.0, help="seconds a hold lasts")
+    parser.add_argument("--db-latency", type=float, default=0.01, help="seconds per Supabase round trip")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    tables = seed_travel_data(hotels_per_city=args.hotels, places_per_city=1, plans=0, seed=args.seed)
+    db = install_fake_supabase(FakeSupabase(tables, latency=args.db_latency))
+
+    import config
+    config.trace_enabled = False
+    from planner_writer import new_id, idempotency_key
+    from reservations import ReservationDesk
+
+    hotels = [row for row in tables["travel.hotels"] if row["city"] == "Jakarta"][:args.hotels]
+    users = [f"user{i}@example.com" for i in range(args.users)]
+    balance = int(max(row["price_per_night"] for row in hotels) * len(NIGHTS) * args.stays_per_balance)
+    attempts = make_attempts(args.attempts, hotels, users, args.abandon, args.crash, args.seed)
+    print(f"{args.attempts} attempts on {args.hotels} hotels x {args.rooms} rooms x {len(NIGHTS)} nights, "
+          f"{args.users} users, {args.threads} threads, {args.db_latency * 1000:.0f} ms round trips\n")
+
+    booked, wall, samples = run("old", lambda *attempt: book_old(db, balance, *attempt), attempts, args.threads)
+    report("old", db, args.rooms, balance, booked, wall, samples, attempts)
+
+    db.tables["planner.bookings"] = []
+    FakeReservations(db, rooms=args.rooms).install(db)
+
+    desk, crashing_desk = ReservationDesk(ttl_seconds=args.ttl), ReservationDesk(ttl_seconds=args.ttl)
+    booked, wall, samples = run("reservations", lambda *attempt: book_reserved(desk, crashing_desk, balance, *attempt),
+                                attempts, args.threads)
+    report("reservations", db, args.rooms, balance, booked, wall, samples, attempts)
+
+    stats = desk.stats()
+    held = sum(row["rooms_held"] for row in db.tables["travel.room_inventory"])
+    time.sleep(args.ttl)
+    expired = db.schema('planner').rpc("expire_reservations", {}).execute().data
+    held_after = sum(row["rooms_held"] for row in db.tables["travel.room_inventory"])
+    print(f"\nholds: {stats['held'] + crashing_desk.held} taken, {stats['confirmed']} confirmed, {stats['released']} released on abandon, "
+          f"{stats['refused'] + crashing_desk.refused} refused (sold out or balance)")
+    print(f"room-nights still held after the run {held}, {expired} crashed holds expired after {args.ttl:g}s, "
+          f"room-nights held afterwards {held_after}")
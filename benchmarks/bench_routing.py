@@ -0,0 +1,91 @@
+"""
+Local route planning for itinerary days: time to order N candidate places of a city
+(NumPy distance matrix, nearest neighbour, 2-opt) and the km travelled per trip
+with places in list order versus routed days.
+
+Run from the repository root (no network needed):
+    python -m benchmarks.bench_routing --places 10 50 100 200 400 --days 3
+"""
+from agents.route_planner import distance_matrix, nearest_neighbor, two_opt, tour_length
+from agents.itinerary_days import split_places, route_days
+from benchmarks.fakes import CITY_CENTERS
+
+import argparse
+import math
+import random
+import statistics
+import time
+
+
+def python_distance_matrix(points):
+    # Baseline: the same haversine distances with a Python double loop
+    matrix = []
+    for lat1, lon1 in points:
+        row = []
+        for lat2, lon2 in points:
+            a = math.sin(math.radians(lat2 - lat1) / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) \
+                * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+            row.append(2 * 6371.0 * math.asin(math.sqrt(min(a, 1.0))))
+        matrix.append(row)
+    return matrix
+
+
+def random_places(count, rng, spread=0.1):
+    lat, lon = CITY_CENTERS["Jakarta"]
+    return [
+        {"name": f"Place {i}", "latitude": lat + rng.uniform(-spread, spread), "longitude": lon + rng.uniform(-spread, spread)}
+        for i in range(count)
+    ]
+
+
+def timed(fn, repeat):
+    samples, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, result
+
+
+def trip_km(hotel, days):
+    # Every day is a round trip from the hotel through its places in the given order
+    total = 0.0
+    for stops in days:
+        points = [(hotel["latitude"], hotel["longitude"])] + [(place["latitude"], place["longitude"]) for place in stops]
+        total += tour_length(distance_matrix(points), list(range(len(points))))
+    return total
+
+
+def with_coordinates(days, places):
+    by_name = {place["name"]: place for place in places}
+    return [[by_name[stop["name"]] for stop in stops] for stops in days]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--places", type=int, nargs="+", default=[10, 50, 100, 200, 400])
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    lat, lon = CITY_CENTERS["Jakarta"]
+    hotel = {"name": "Hotel", "latitude": lat, "longitude": lon}
+
+    print(f"{'places':>6} {'matrix py':>10} {'matrix np':>10} {'nn':>8} {'2-opt':>8} {'route':>8}   "
+          f"{'km nn':>8} {'km 2-opt':>9}   {'trip km list':>12} {'trip km routed':>14}")
+    for count in args.places:
+        places = random_places(count, rng)
+        points = [(lat, lon)] + [(place["latitude"], place["longitude"]) for place in places]
+
+        python_ms, _ = timed(lambda: python_distance_matrix(points), args.repeat)
+        numpy_ms, dist = timed(lambda: distance_matrix(points), args.repeat)
+        nn_ms, first = timed(lambda: nearest_neighbor(dist), args.repeat)
+        opt_ms, tour = timed(lambda: two_opt(dist, first), args.repeat)
+        route_ms, routed = timed(lambda: route_days(hotel, places, args.days, speed_kmh=20), args.repeat)
+
+        listed_km = trip_km(hotel, split_places(places, args.days))
+        routed_km = trip_km(hotel, with_coordinates(routed, places))
+        print(f"{count:>6} {python_ms:>8.2f}ms {numpy_ms:>8.2f}ms {nn_ms:>6.2f}ms {opt_ms:>6.2f}ms {route_ms:>6.2f}ms   "
+              f"{tour_length(dist, first):>8.1f} {tour_length(dist, tour):>9.1f}   {listed_km:>12.1f} {routed_km:>14.1f}")
@@ -0,0 +1,132 @@
+"""
+Model calls against a quota-limited, heavy-tailed stand-in for Gemini: calling the model directly
+with client-side retries versus going through ScheduledModel (adaptive concurrency, hedging).
+
+Run from the repository root (no network needed):
+    python -m benchmarks.bench_scheduler --calls 300 --workers 32 --quota-concurrency 8   # over quota
+    python -m benchmarks.bench_scheduler --calls 300 --workers 6 --quota-concurrency 16   # under quota, hedging
+"""
+from strands.models import Model as StrandsModel
+from strands.types.exceptions import ModelThrottledException
+from agents.scheduler import RequestScheduler, ScheduledModel
+from concurrent.futures import ThreadPoolExecutor
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+
+
+class QuotaModel(StrandsModel):
+    """Answers after a lognormal latency with a slow tail, throttles past quota_concurrency calls in flight."""
+    def __init__(self, latency, quota_concurrency, tail_rate, tail_factor):
+        self.latency = latency
+        self.quota_concurrency = quota_concurrency
+        self.tail_rate = tail_rate
+        self.tail_factor = tail_factor
+        self.in_flight = 0
+        self.throttled = 0
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def update_config(self, **model_config):
+        pass
+
+    def get_config(self):
+        return {"model_id": "quota"}
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        with self.lock:
+            self.calls += 1
+            self.in_flight += 1
+            over_quota = self.in_flight > self.quota_concurrency
+            if over_quota:
+                self.throttled += 1
+        try:
+            if over_quota:
+                await asyncio.sleep(self.latency * 0.05)
+                raise ModelThrottledException("429 RESOURCE_EXHAUSTED")
+
+            latency = self.latency * random.lognormvariate(0, 0.2)
+            if random.random() < self.tail_rate:
+                latency *= self.tail_factor
+            await asyncio.sleep(latency)
+            yield {"messageStart": {"role": "assistant"}}
+            yield {"contentBlockDelta": {"delta": {"text": "ok"}}}
+            yield {"messageStop": {"stopReason": "end_turn"}}
+            yield {"metadata": {"usage": {"inputTokens": 10, "outputTokens": 1, "totalTokens": 11}, "metrics": {"latencyMs": 0}}}
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        yield {}
+
+
+async def direct_call(model, retries, backoff):
+    # Baseline: what each agent does alone, back off and retry when throttled
+    for retry in range(retries + 1):
+        try:
+            async for _ in model.stream([{"role": "user", "content": [{"text": "hi"}]}]):
+                pass
+            return
+        except ModelThrottledException:
+            if retry == retries:
+                raise
+            await asyncio.sleep(random.uniform(0, backoff * 2 ** retry))
+
+
+async def scheduled_call(model):
+    async for _ in model.stream([{"role": "user", "content": [{"text": "hi"}]}]):
+        pass
+
+
+def run(name, call, calls, workers, service):
+    latencies, failures = [], 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal failures
+        start = time.perf_counter()
+        try:
+            asyncio.run(call())
+            with lock:
+                latencies.append(time.perf_counter() - start)
+        except ModelThrottledException:
+            with lock:
+                failures += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(one, range(calls)))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+    print(f"{name:<18} {calls / wall:>7.1f} calls/s   p50 {p(0.5):>7.1f} ms   p95 {p(0.95):>7.1f} ms   p99 {p(0.99):>7.1f} ms"
+          f"   429s {service.throttled:>5}   failed {failures}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--quota-concurrency", type=int, default=8)
+    parser.add_argument("--tail-rate", type=float, default=0.05)
+    parser.add_argument("--tail-factor", type=float, default=8)
+    args = parser.parse_args()
+
+    def service():
+        return QuotaModel(args.latency, args.quota_concurrency, args.tail_rate, args.tail_factor)
+
+    direct = service()
+    run("direct + retries", lambda: direct_call(direct, retries=6, backoff=args.latency), args.calls, args.workers, direct)
+
+    for name, hedge in (("scheduled", ()), ("scheduled + hedge", ("interactive",))):
+        backend = service()
+        scheduler = RequestScheduler(rpm=10 ** 6, tpm=10 ** 9, initial_concurrency=args.workers, max_concurrency=2 * args.workers)
+        model = ScheduledModel(backend, scheduler, max_retries=6, base_backoff=args.latency, hedge_priorities=hedge)
+        run(name, lambda: scheduled_call(model), args.calls, args.workers, backend)
+        print(f"{'':<18} {scheduler.stats()}")
@@ -0,0 +1,586 @@
+"""
+Local stand-ins for Gemini and Supabase so planning can be benchmarked without network access.
+
+- ScriptedModel: a strands model that answers every agent with scripted (or recorded) turns,
+  tool calls included, after a configurable latency.
+- FakeSupabase: an in-memory client covering the query builder calls the repo uses,
+  seeded with synthetic hotels, places, plans and bookings.
+
+Install them before the agents are imported:
+    install_fake_supabase(FakeSupabase(seed_travel_data()))
+    set_model_factory(lambda temperature: ScriptedModel())
+"""
+from strands.models import Model as StrandsModel
+from postgrest.exceptions import APIError
+from datetime import date, timedelta
+
+import asyncio
+import json
+import random
+import re
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+import uuid
+
+CITIES = ["Jakarta", "Bandung", "Yogyakarta", "Surabaya", "Denpasar", "Malang"]
+CITY_CENTERS = {
+    "Jakarta": (-6.2, 106.82), "Bandung": (-6.91, 107.61), "Yogyakarta": (-7.8, 110.36),
+    "Surabaya": (-7.25, 112.75), "Denpasar": (-8.65, 115.22), "Malang": (-7.98, 112.63),
+}
+PLACE_CATEGORIES = ["Beach", "Cultural", "Family", "Historical", "Landmark", "Museum", "Nature", "Shopping", "Theme Park"]
+# Words seeded place descriptions are made of, per category
+PLACE_WORDS = {
+    "Beach": ["sandy beach", "sunset views", "surfing", "seafood stalls", "calm waves"],
+    "Cultural": ["traditional dance", "batik workshop", "local crafts", "gamelan music", "heritage village"],
+    "Family": ["playground", "kids friendly", "picnic lawn", "family rides", "petting farm"],
+    "Historical": ["colonial building", "old town", "ancient temple", "war memorial", "royal palace"],
+    "Landmark": ["city icon", "observation deck", "famous monument", "skyline views", "photo spot"],
+    "Museum": ["art collection", "history exhibits", "interactive gallery", "archaeology", "science displays"],
+    "Nature": ["waterfall", "hiking trail", "rice terraces", "botanical garden", "volcano crater"],
+    "Shopping": ["night market", "shopping mall", "souvenir shops", "street food", "handicraft bazaar"],
+    "Theme Park": ["roller coaster", "water slides", "thrill rides", "parades", "arcade games"],
+}
+
+# Mean model latency per agent role in seconds, roughly what gemini-2.5-flash takes per turn before text output
+ROLE_LATENCY = {"extract": 0.8, "place": 1.0, "hotel": 1.2, "itinerary": 1.0, "root": 1.0}
+# Text output is generated at about 200 tokens/s on top of that, so long outputs take longer
+SECONDS_PER_TOKEN = 0.005
+
+
+def default_script(city="Jakarta", vacation_period=2):
+    """Turns each agent role plays, a tool call turn is followed by the final text turn."""
+    start = date(2025, 12, 2)
+    end = start + timedelta(days=vacation_period - 1)
+    return {
+        "extract": [{"tool": "TripRequest", "input": {
+            "city": city,
+            "check_in": f"{start.day} {start:%B %Y}",
+            "check_out": f"{end.day} {end:%B %Y}",
+            "vacation_period": vacation_period,
+            "hotel_criteria": f"city: {city}",
+            "hotel_wishes": "",
+            "place_description": f"Cultural and historical places in {city}",
+        }}],
+        "place": [
+            {"tool": "find_places", "input": {"city": city, "max_ticket_price": 100000, "category": ["Cultural", "Historical", "Museum"],
+                                              "description": f"Cultural and historical places in {city}"}},
+            {"text": "{choosen_places}"},
+        ],
+        "hotel": [
+            {"tool": "pick_hotel", "input": {"city": city, "rating": 4, "swimming_pool": True, "restaurant": True,
+                                             "wifi": True, "parking": False, "gym": False, "max_price_per_night": 1500000}},
+            {"text": "{hotel}"},
+        ],
+        "itinerary": [{"text": "{itinerary}"}],
+        "root": [{"text": "Done"}],
+    }
+
+
+def agent_role(system_prompt, tool_specs):
+    names = [spec["name"] for spec in tool_specs or []]
+    if "TripRequest" in names:
+        return "extract"
+    if any("find_places" in name for name in names):
+        return "place"
+    if any("pick_hotel" in name for name in names):
+        return "hotel"
+    if not names and "itinerary" in (system_prompt or "").lower():
+        return "itinerary"
+    return "root"
+
+
+def message_text(message):
+    return "".join(block.get("text", "") for block in message.get("content", []))
+
+
+def last_tool_result(messages):
+    for block in messages[-1].get("content", []):
+        if "toolResult" in block:
+            return message_text(block["toolResult"])
+    return ""
+
+
+def render_itinerary(messages):
+    # One day per call, like ItineraryAgent asks for
+    prompt = message_text(messages[-1])
+    number = int((re.search(r"day:\s*(\d+)", prompt) or [None, 1])[1])
+    current = (re.search(r"date:\s*(.+)", prompt) or [None, "2 December 2025"])[1].strip()
+    itinerary = {}
+    for hour in range(7, 21, 2):
+        itinerary[f"{current} | {hour:02d}.00 - {hour + 2:02d}.00"] = f"Visit stop {hour // 2 - 2} of day {number}"
+
+    return json.dumps({"summary": f"Day {number} in the city", "itinerary": itinerary})
+
+
+def render_places(messages):
+    # The place prompt's answer: the places the tool returned, as {"choosen_places": [...]}
+    try:
+        places = json.loads(last_tool_result(messages))
+    except ValueError:
+        places = []
+    return json.dumps({"choosen_places": places if isinstance(places, list) else []})
+
+
+def render_hotel(messages):
+    try:
+        found = json.loads(last_tool_result(messages)).get("data") or [{}]
+    except ValueError:
+        found = [{}]
+    hotel = found[0] if isinstance(found, list) and found else {}
+    return json.dumps({
+        "name": hotel.get("name", ""), "check-in": "2 December 2025", "check-out": "3 December 2025",
+        "facilities": "wifi", "price_per_night": hotel.get("price_per_night", 0),
+        "rating": hotel.get("rating", 0), "city": hotel.get("city", ""),
+        "latitude": hotel.get("latitude"), "longitude": hotel.get("longitude"),
+    })
+
+
+class ScriptedModel(StrandsModel):
+    """
+    Strands model that plays scripted turns per agent role instead of calling Gemini.
+    A script can also be a recording (role -> list of turns) loaded from JSON.
+    Latency per turn is lognormal around ROLE_LATENCY plus SECONDS_PER_TOKEN per output token, multiplied by time_scale.
+    """
+    def __init__(self, script=None, time_scale=1.0, jitter=0.25, chunk_size=24, seed=None):
+        self.script = script or default_script()
+        self.time_scale = time_scale
+        self.jitter = jitter
+        self.chunk_size = chunk_size
+        self.config = {"model_id": "scripted"}
+        self.calls = 0
+        self.__random = random.Random(seed)
+        self.__lock = threading.Lock()
+
+    def update_config(self, **model_config):
+        self.config.update(model_config)
+
+    def get_config(self):
+        return self.config
+
+    def __latency(self, role):
+        with self.__lock:
+            self.calls += 1
+            factor = self.__random.lognormvariate(0, self.jitter)
+        return ROLE_LATENCY.get(role, 1.0) * factor * self.time_scale
+
+    def __turn(self, role, messages):
+        turns = self.script.get(role) or [{"text": ""}]
+        # Each tool result the agent sent back moves the role one turn further
+        done = sum(1 for message in messages if message["role"] == "assistant")
+        return turns[min(done, len(turns) - 1)]
+
+    def __render(self, text, messages):
+        if text == "{itinerary}":
+            return render_itinerary(messages)
+        if text == "{hotel}":
+            return render_hotel(messages)
+        if text == "{choosen_places}":
+            return render_places(messages)
+        if text == "{tool_result}":
+            return last_tool_result(messages)
+        return text
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, *, tool_choice=None, **kwargs):
+        role = agent_role(system_prompt, tool_specs)
+        turn = self.__turn(role, messages)
+        latency = self.__latency(role)
+
+        if "tool" in turn:
+            output = json.dumps(turn["input"])
+            await asyncio.sleep(latency)
+            # Like Gemini, nothing is streamed until the response starts
+            yield {"messageStart": {"role": "assistant"}}
+            name = next((spec["name"] for spec in tool_specs or [] if turn["tool"] in spec["name"]), turn["tool"])
+            yield {"contentBlockStart": {"start": {"toolUse": {"toolUseId": f"tooluse_{uuid.uuid4().hex[:12]}", "name": name}}}}
+            yield {"contentBlockDelta": {"delta": {"toolUse": {"input": output}}}}
+            yield {"contentBlockStop": {}}
+            yield {"messageStop": {"stopReason": "tool_use"}}
+        else:
+            # A third of the turn latency before the first token, the rest and the generation time spread over the chunks
+            output = self.__render(turn["text"], messages)
+            chunks = [output[i:i + self.chunk_size] for i in range(0, len(output), self.chunk_size)] or [""]
+            generation = latency * 2 / 3 + len(output) / 4 * SECONDS_PER_TOKEN * self.time_scale
+            await asyncio.sleep(latency / 3)
+            yield {"messageStart": {"role": "assistant"}}
+            yield {"contentBlockStart": {"start": {}}}
+            for chunk in chunks:
+                await asyncio.sleep(generation / len(chunks))
+                yield {"contentBlockDelta": {"delta": {"text": chunk}}}
+            yield {"contentBlockStop": {}}
+            yield {"messageStop": {"stopReason": "end_turn"}}
+
+        output_tokens = len(output) // 4
+        input_tokens = (len(system_prompt or "") + len(json.dumps(messages))) // 4
+        yield {"metadata": {
+            "usage": {"inputTokens": input_tokens, "outputTokens": output_tokens, "totalTokens": input_tokens + output_tokens},
+            "metrics": {"latencyMs": int(latency * 1000)},
+        }}
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        turn = self.__turn("extract", prompt)
+        await asyncio.sleep(self.__latency("extract"))
+        yield {"output": output_model(**turn["input"])}
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    def __init__(self, client, schema, table):
+        self.__client = client
+        self.__schema = schema
+        self.__table = table
+        self.__filters = []
+        self.__columns = None
+        self.__order = []
+        self.__limit = None
+        self.__offset = 0
+        self.__insert = None
+        self.__update = None
+        self.__upsert = None
+
+    def select(self, columns="*"):
+        if columns != "*":
+            self.__columns = [column.strip() for column in columns.split(",")]
+        return self
+
+    def __where(self, test):
+        self.__filters.append(test)
+        return self
+
+    def eq(self, column, value):
+        return self.__where(lambda row: row.get(column) == value)
+
+    def gt(self, column, value):
+        return self.__where(lambda row: row.get(column) is not None and row[column] > value)
+
+    def gte(self, column, value):
+        return self.__where(lambda row: row.get(column) is not None and row[column] >= value)
+
+    def lte(self, column, value):
+        return self.__where(lambda row: row.get(column) is not None and row[column] <= value)
+
+    def in_(self, column, values):
+        return self.__where(lambda row: row.get(column) in values)
+
+    def order(self, column, desc=False):
+        self.__order.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.__limit = count
+        return self
+
+    def range(self, start, end):
+        self.__offset = start
+        self.__limit = end - start + 1
+        return self
+
+    def insert(self, rows):
+        self.__insert = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def update(self, values):
+        self.__update = values
+        return self
+
+    def upsert(self, rows, on_conflict="id", ignore_duplicates=False):
+        self.__upsert = (rows if isinstance(rows, list) else [rows], on_conflict, ignore_duplicates)
+        return self
+
+    def execute(self):
+        return self.__client.execute(self.__schema, self.__table, self)
+
+    def run(self, rows, missing_columns=()):
+        if self.__insert is not None:
+            rows.extend(dict(row) for row in self.__insert)
+            return [dict(row) for row in self.__insert]
+        if self.__upsert is not None:
+            upserted, key, ignore_duplicates = self.__upsert
+            existing = {row.get(key): row for row in rows}
+            changed = []
+            for row in upserted:
+                if row.get(key) not in existing:
+                    existing[row.get(key)] = dict(row)
+                    rows.append(existing[row.get(key)])
+                elif ignore_duplicates:
+                    continue
+                else:
+                    existing[row.get(key)].update(row)
+                changed.append(dict(row))
+            return changed
+
+        missing = [column for column in self.__columns or [] if column in missing_columns]
+        if missing:
+            # What Postgres answers for a column a migration would have added
+            raise APIError({"code": "42703", "message": f"column {self.__table}.{missing[0]} does not exist"})
+
+        matched = [row for row in rows if all(test(row) for test in self.__filters)]
+        if self.__update is not None:
+            for row in matched:
+                row.update(self.__update)
+            return [dict(row) for row in matched]
+        # Sorted by the last order first, sorts are stable so the first order() wins ties
+        for column, desc in reversed(self.__order):
+            matched.sort(key=lambda row: row.get(column), reverse=desc)
+        end = None if self.__limit is None else self.__offset + self.__limit
+        matched = matched[self.__offset:end]
+        if self.__columns:
+            matched = [{column: row.get(column) for column in self.__columns} for row in matched]
+        return [dict(row) for row in matched]
+
+
+class FakeSupabase:
+    """In-memory Supabase client, every execute() sleeps latency seconds to stand in for the round trip."""
+    def __init__(self, tables=None, latency=0.0):
+        self.tables = tables or {}
+        self.latency = latency
+        self.queries = 0
+        self.functions = {}
+        # "schema.table" -> columns a select fails on, like a database without a migration
+        self.missing_columns = {}
+        self.__lock = threading.Lock()
+
+    def schema(self, name):
+        return FakeSchema(self, name)
+
+    def table(self, name):
+        return FakeQuery(self, "public", name)
+
+    def execute(self, schema, table, query):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.__lock:
+            self.queries += 1
+            rows = self.tables.setdefault(f"{schema}.{table}", [])
+            return FakeResponse(query.run(rows, self.missing_columns.get(f"{schema}.{table}", ())))
+
+    def call(self, schema, function, params):
+        # Functions run under the client lock, one at a time like a serializable transaction
+        if self.latency:
+            time.sleep(self.latency)
+        with self.__lock:
+            self.queries += 1
+            if f"{schema}.{function}" not in self.functions:
+                # What PostgREST answers for a function the database does not have
+                raise APIError({"code": "PGRST202", "message": f"Could not find the function {schema}.{function}"})
+            return FakeResponse(self.functions[f"{schema}.{function}"](**params))
+
+
+class FakeSchema:
+    def __init__(self, client, name):
+        self.__client = client
+        self.__name = name
+
+    def table(self, name):
+        return FakeQuery(self.__client, self.__name, name)
+
+    def rpc(self, function, params=None):
+        return FakeRpc(self.__client, self.__name, function, params or {})
+
+
+class FakeRpc:
+    def __init__(self, client, schema, function, params):
+        self.__client = client
+        self.__schema = schema
+        self.__function = function
+        self.__params = params
+
+    def execute(self):
+        return self.__client.call(self.__schema, self.__function, self.__params)
+
+
+class FakeReservations:
+    """Python version of sql/reservations.sql on a FakeSupabase's tables, install() registers the planner functions."""
+    def __init__(self, client, rooms=10):
+        self.tables = client.tables
+        self.rooms = rooms
+        self.hotels = {}
+        self.inventory = {}
+        self.wallets = {}
+        self.reservations = {}
+        self.keys = {}
+        for name in ("travel.room_inventory", "planner.wallets", "planner.reservations", "planner.bookings"):
+            self.tables.setdefault(name, [])
+
+    def install(self, client):
+        for name in ("hold_reservation", "confirm_reservation", "release_reservation", "expire_reservations"):
+            client.functions[f"planner.{name}"] = getattr(self, name)
+        return self
+
+    def __hotel(self, name):
+        if not self.hotels:
+            for row in self.tables.get("travel.hotels", []):
+                self.hotels.setdefault(row["name"], row)
+        return self.hotels.get(name)
+
+    def __return_hold(self, r):
+        for night in r["nights"]:
+            self.inventory[(r["hotel_id"], night)]["rooms_held"] -= 1
+        self.wallets[r["user_email"]]["held"] -= r["amount"]
+
+    def expire_reservations(self, p_limit=500):
+        now, expired = time.time(), 0
+        for r in self.reservations.values():
+            if expired < p_limit and r["status"] == "held" and r["expires_at"] <= now:
+                r["status"] = "expired"
+                self.__return_hold(r)
+                expired += 1
+        return expired
+
+    def hold_reservation(self, p_reservation_id, p_idempotency_key, p_hotel_name, p_user_email, p_nights,
+                         p_price_per_night, p_opening_balance, p_ttl_seconds):
+        existing = self.reservations.get(self.keys.get(p_idempotency_key))
+        if existing and existing["status"] in ("held", "confirmed"):
+            return {"status": existing["status"], "reservation_id": existing["reservation_id"],
+                    "booking_id": existing["booking_id"], "amount": existing["amount"], "created": False}
+
+        hotel = self.__hotel(p_hotel_name)
+        if hotel is None:
+            return {"status": "unknown_hotel"}
+        # The SQL version sweeps a bounded batch, all of them is the same here
+        self.expire_reservations(50)
+
+        amount = p_price_per_night * len(p_nights)
+        for night in p_nights:
+            if (hotel["id"], night) not in self.inventory:
+                row = {"hotel_id": hotel["id"], "night": night, "rooms_total": hotel.get("rooms", self.rooms),
+                       "rooms_held": 0, "rooms_booked": 0}
+                self.inventory[(hotel["id"], night)] = row
+                self.tables["travel.room_inventory"].append(row)
+        if p_user_email not in self.wallets:
+            self.wallets[p_user_email] = {"user_email": p_user_email, "balance": p_opening_balance, "held": 0}
+            self.tables["planner.wallets"].append(self.wallets[p_user_email])
+
+        nights = [self.inventory[(hotel["id"], night)] for night in p_nights]
+        if any(row["rooms_held"] + row["rooms_booked"] >= row["rooms_total"] for row in nights):
+            return {"status": "sold_out", "amount": amount}
+        wallet = self.wallets[p_user_email]
+        if wallet["balance"] - wallet["held"] < amount:
+            return {"status": "insufficient_balance", "amount": amount}
+
+        for row in nights:
+            row["rooms_held"] += 1
+        wallet["held"] += amount
+        r = {"reservation_id": p_reservation_id, "idempotency_key": p_idempotency_key, "hotel_id": hotel["id"],
+             "user_email": p_user_email, "nights": list(p_nights), "amount": amount, "status": "held",
+             "booking_id": None, "expires_at": time.time() + p_ttl_seconds}
+        self.reservations[p_reservation_id] = r
+        self.keys[p_idempotency_key] = p_reservation_id
+        self.tables["planner.reservations"].append(r)
+        return {"status": "held", "reservation_id": p_reservation_id, "amount": amount, "created": True}
+
+    def confirm_reservation(self, p_reservation_id, p_booking):
+        r = self.reservations.get(p_reservation_id)
+        if r is None:
+            return {"status": "unknown_reservation"}
+        if r["status"] == "confirmed":
+            return {"status": "confirmed", "booking_id": r["booking_id"], "created": False}
+        if r["status"] != "held" or r["expires_at"] <= time.time():
+            return {"status": r["status"]}
+
+        r["status"], r["booking_id"] = "confirmed", p_booking["booking_id"]
+        for night in r["nights"]:
+            row = self.inventory[(r["hotel_id"], night)]
+            row["rooms_held"] -= 1
+            row["rooms_booked"] += 1
+        wallet = self.wallets[r["user_email"]]
+        wallet["held"] -= r["amount"]
+        wallet["balance"] -= r["amount"]
+        self.tables["planner.bookings"].append(dict(p_booking))
+        return {"status": "confirmed", "booking_id": r["booking_id"], "created": True}
+
+    def release_reservation(self, p_reservation_id):
+        r = self.reservations.get(p_reservation_id)
+        if r is None or r["status"] != "held":
+            return {"status": r["status"] if r else "unknown_reservation"}
+        r["status"] = "released"
+        self.__return_hold(r)
+        return {"status": "released"}
+
+
+def seed_travel_data(hotels_per_city=200, places_per_city=100, plans=500, seed=7):
+    rng = random.Random(seed)
+    # Coordinates have their own generator so the other seeded columns stay the same
+    location_rng = random.Random(seed + 1)
+    description_rng = random.Random(seed + 2)
+
+    def describe(category):
+        # Mostly the category's own words, one borrowed from another category like real descriptions
+        words = description_rng.sample(PLACE_WORDS[category], 2) + [description_rng.choice(PLACE_WORDS[description_rng.choice(PLACE_CATEGORIES)])]
+        return f"{category} spot with {words[0]}, {words[1]} and {words[2]}"
+
+    def location(city, spread=0.1):
+        lat, lon = CITY_CENTERS[city]
+        return {"latitude": round(lat + location_rng.uniform(-spread, spread), 6),
+                "longitude": round(lon + location_rng.uniform(-spread, spread), 6)}
+
+    tables = {"travel.hotels": [], "travel.places": [], "planner.plans": [], "planner.bookings": [], "planner.approvals": []}
+
+    for city in CITIES:
+        for i in range(hotels_per_city):
+            tables["travel.hotels"].append({
+                "id": len(tables["travel.hotels"]) + 1,
+                "name": f"{city} Hotel {i}",
+                "city": city,
+                "rating": rng.choice([3, 3.5, 4, 4.5, 5]),
+                "price_per_night": rng.randrange(300000, 3000000, 50000),
+                "swimming_pool": rng.random() < 0.5,
+                "restaurant": rng.random() < 0.7,
+                "wifi": rng.random() < 0.9,
+                "parking": rng.random() < 0.6,
+                "gym": rng.random() < 0.3,
+                **location(city),
+            })
+        for i in range(places_per_city):
+            category = rng.choice(PLACE_CATEGORIES)
+            tables["travel.places"].append({
+                "id": len(tables["travel.places"]) + 1,
+                "name": f"{city} Place {i}",
+                "city": city,
+                "category": category,
+                "ticket_price": rng.randrange(0, 200000, 5000),
+                "description": describe(category),
+                **location(city),
+            })
+
+    for i in range(plans):
+        booking_id = f"BOOK-{i:08x}" if i % 2 else None
+        tables["planner.plans"].append({
+            "plan_id": f"PLAN-{i:08x}", "start": "2025-12-02T07:00:00Z", "end": "2025-12-03T21:00:00Z",
+            "description": "Seeded plan", "booking_id": booking_id, "itinerary": "{}",
+        })
+        if booking_id:
+            tables["planner.bookings"].append({
+                "booking_id": booking_id, "name": f"{rng.choice(CITIES)} Hotel {i % hotels_per_city}",
+                "check-in": "2 December 2025", "check-out": "3 December 2025", "price_per_night": 1000000,
+            })
+
+    return tables
+
+
+def install_fake_supabase(client):
+    """Make `from supabaseClient import supabase_client` return client, call before importing agents."""
+    module = types.ModuleType("supabaseClient")
+    module.supabase_client = client
+    module.supabase_admin = client
+    sys.modules["supabaseClient"] = module
+    return client
+
+
+def use_scratch_files():
+    """Point the local write-ahead logs (planner writes, invoice outbox) and the place index at a temporary directory, so fake rows never reach Supabase or later runs."""
+    import config
+    workdir = tempfile.mkdtemp(prefix="planner-bench-")
+    config.planner_write_path = os.path.join(workdir, "planner_writes.sqlite3")
+    config.planner_write_dead_letter_path = os.path.join(workdir, "planner_write_dead_letter.jsonl")
+    config.invoice_outbox_path = os.path.join(workdir, "invoice_outbox.sqlite3")
+    config.invoice_dead_letter_path = os.path.join(workdir, "invoice_dead_letter.jsonl")
+    config.place_index_path = os.path.join(workdir, "place_index")
+    return workdir
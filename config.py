@@ -1 +1,151 @@
-prompt = "I want go to jakarta for 1 day start from 2 december 2025"
\ No newline at end of file
+prompt = "I want go to jakarta for 1 day start from 2 december 2025"
+
+# "parallel": extract trip once, run hotel & place agents concurrently
+# "router": let root agent route every step
+orchestration = "parallel"
+
+# Batch planning (batch.py)
+batch_input = "requests.jsonl"
+batch_output = "batch_output.jsonl"
+batch_concurrency = 4
+batch_insert_size = 50
+
+# Serve hotel & place tool lookups from an in-process copy of the travel schema
+use_travel_replica = False
+travel_replica_cursor = "id"  # or "updated_at" when rows are edited in place
+travel_replica_refresh_seconds = 300
+travel_replica_reconcile_seconds = 3600  # ids are listed this often to drop hotels and places deleted from Supabase
+
+# Cache sub-agent responses (place agent, hotel search) keyed on model, prompt and input
+llm_cache_enabled = True
+llm_cache_bypass = False  # True forces fresh responses
+llm_cache_ttl_seconds = 6 * 60 * 60
+llm_cache_max_entries = 2048
+llm_cache_max_bytes = 32 * 1024 * 1024
+llm_cache_path = "llm_cache.sqlite3"  # None keeps the cache in memory only
+
+# Pick hotels by rating, price headroom and amenity match without the hotel LLM when criteria is structured
+hotel_fast_path = True
+hotel_fast_path_candidates = 50
+
+# Backend: seconds between planner table polls pushed to dashboards
+feed_poll_seconds = 2
+feed_reconcile_seconds = 60  # keys of both tables are listed this often to find deleted rows
+
+# Backend database access
+db_max_workers = 8  # threads running Supabase queries for the backend
+db_max_page_size = 500
+
+# Invoice outbox: bookings queue invoices, a background worker posts them to N8N
+invoice_outbox_path = "invoice_outbox.sqlite3"
+invoice_dead_letter_path = "invoice_dead_letter.jsonl"
+invoice_batch_size = 20
+invoice_concurrency = 4
+invoice_timeout_seconds = 10
+invoice_max_attempts = 6
+invoice_drain_seconds = 15  # how long CLI runs wait for pending invoices before exiting
+
+# Stream itinerary entries to the dashboard while the itinerary agent is generating (parallel orchestration)
+stream_itinerary = True
+itinerary_stream_url = "ws://localhost:8000/ws/itinerary-stream?role=publisher"
+
+# Tracing: spans for agent invocations, tool calls, Supabase queries and webhook posts, served as /metrics by the backend
+trace_enabled = True
+trace_path = "traces.jsonl"
+trace_max_bytes = 64 * 1024 * 1024  # rotated to traces.jsonl.1 past this size
+trace_flush_seconds = 1.0
+log_sample_every = 20  # hot tool paths print the first call, then one in every N
+
+# Gemini request scheduler shared by all agents: rate limits, adaptive concurrency, priorities, hedging
+scheduler_enabled = True
+scheduler_rpm = 1000  # requests per minute, set to the project quota
+scheduler_tpm = 1000000  # tokens per minute
+scheduler_initial_concurrency = 16  # a 14-day itinerary fans out into 14 concurrent calls
+scheduler_min_concurrency = 1
+scheduler_max_concurrency = 32
+scheduler_max_retries = 4  # retries of throttled (429) calls
+scheduler_hedge_percentile = 0.95  # duplicate a call once it waits past this time-to-first-token percentile
+scheduler_hedge_priorities = ("interactive",)  # () disables hedging
+
+# Context encoding: token budgets for what each agent is sent (about 4 characters per token)
+context_budgets = {
+    "hotel_profile": 150,
+    "place_profile": 200,
+    "itinerary_profile": 150,
+    "itinerary_input": 1200,  # hotel and places, places are trimmed first
+}
+context_ref_min_tokens = 60  # root agent tool results above this are kept out of its history as refs
+context_ref_preview_tokens = 40
+
+# Itinerary days generated concurrently, trips up to this many days take about as long as a one-day trip
+itinerary_day_workers = 14
+
+# Order each day's places locally from their coordinates (nearest neighbour + 2-opt) before the itinerary agent
+route_places = True
+route_speed_kmh = 20  # average city travel speed for travel_minutes between stops
+
+# Human-in-the-loop approvals: "console" asks with input(), "queue" sends them to the dashboard and plans wait without blocking
+approval_mode = "console"
+approval_url = "ws://localhost:8000/ws/approvals?role=planner"
+approval_timeout_seconds = 15 * 60
+approval_defaults = {"hotel_search": True, "hotel_booking": False}  # decision when nobody answers in time
+approval_poll_seconds = 5  # planner.approvals is polled for decisions made while the websocket was down
+pipeline_stage_workers = 32  # threads for model and database stages of async plans (approval_mode = "queue")
+
+# Planner writes: plans and bookings go to a local write-ahead log, a background worker upserts them in batches
+planner_write_path = "planner_writes.sqlite3"
+planner_write_dead_letter_path = "planner_write_dead_letter.jsonl"
+planner_write_batch_size = 100
+planner_write_flush_seconds = 0.5  # longest a row waits for its batch to fill
+planner_write_max_attempts = 20  # with backoff capped at planner_write_max_backoff, about 15 minutes of outage
+planner_write_max_backoff = 60
+planner_write_key_ttl_seconds = 7 * 24 * 3600  # how long idempotency keys of written rows are remembered
+planner_write_drain_seconds = 15  # how long CLI runs wait for pending writes before exiting
+
+# Hotel bookings hold a room and the stay price first (sql/reservations.sql), False books without inventory or balance checks.
+# Until sql/reservations.sql is applied, bookings fall back to booking without them
+booking_reservations = True
+reservation_hold_seconds = 15 * 60  # holds last as long as a booking approval may wait
+
+# User profiles: "local" reads profile_store_path and user_profile.json, "supabase" reads planner.user_profiles (sql/user_profiles.sql)
+profile_store = "local"
+profile_store_path = "user_profiles.json"
+default_user_id = "USR001"  # user planned for when a request names none, the user_id of user_profile.json
+profile_prompt_cache_size = 1024  # system prompts compiled per user and agent, least recently used dropped first
+profile_refresh_seconds = 30  # how often a cached profile version is checked, saves through the store apply at once
+
+# Planning jobs in the backend (POST /plans/jobs): plans run on plan_job_workers async workers, submissions beyond plan_job_queue_size waiting get 429.
+# Plans waiting for a human approval give their worker back until decided
+plan_job_workers = 8
+plan_job_queue_size = 32
+plan_job_timeout_seconds = 35 * 60  # a plan may wait for two approvals of approval_timeout_seconds
+plan_job_history = 500  # finished jobs kept for GET /plans/jobs/{job_id}
+plan_job_retry_after_seconds = 5
+
+# Speculative prefetch: the city named in a plan prompt and the user profile bound what the tools will ask, those hotels and places are fetched while the models think
+prefetch_enabled = True  # off when use_travel_replica answers tools locally
+prefetch_workers = 8
+prefetch_hotel_rows = 500  # a city with more matching rows only answers lookups that find enough of them
+prefetch_place_rows = 500
+prefetch_wait_seconds = 3  # longest a tool waits for a running prefetch before querying itself
+
+# Place search: TF-IDF index of travel.places name, category and description, a memory-mapped NumPy matrix searched in process (place_index.py)
+place_search = True
+place_index_path = "place_index"  # vectors.npy and places.json, built from travel.places in the background when missing
+place_index_dimensions = 1024  # hashed terms, 4 KB per place
+place_index_max_age_seconds = 24 * 3600  # rebuilt in the background past this age, or run python place_index.py
+place_search_top_k = 5
+
+# Model tiers: each agent runs on its tier's model, output failing validation (agents/output_checks.py) is asked again once of the fallback tier.
+# Every agent stays on "standard" until fixtures recorded with benchmarks/bench_model_tiers.py show "fast" holds up for it
+model_tiers = {
+    "fast": {"model_id": "gemini-2.5-flash-lite", "fallback": "standard"},
+    "standard": {"model_id": "gemini-2.5-flash", "fallback": None},
+}
+agent_models = {
+    "root": {"tier": "standard", "temperature": 0.7, "max_output_tokens": 8192},  # routing, in "router" orchestration it also writes the final plan
+    "extract": {"tier": "standard", "temperature": 0.7, "max_output_tokens": 2048},  # trip fields as structured output
+    "hotel": {"tier": "standard", "temperature": 0.7, "max_output_tokens": 2048},  # __pick_hotel arguments and one hotel
+    "place": {"tier": "standard", "temperature": 0.7, "max_output_tokens": 4096},  # __find_places arguments and a few places
+    "itinerary": {"tier": "standard", "temperature": 0.7, "max_output_tokens": 8192},
+}
\ No newline at end of file
@@ -0,0 +1,199 @@
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from tracing import span
+from settings import get_settings
+
+import config
+import json
+import random
+import requests
+import sqlite3
+import threading
+import time
+
+from rich.console import Console
+console = Console()
+
+
+class InvoiceOutbox:
+    """
+    Durable outbox for N8N invoice webhooks.
+    Bookings only enqueue a job in a local sqlite file; a background worker delivers due jobs
+    in batches over a keep-alive session with bounded concurrency, retries with exponential
+    backoff, and moves jobs that keep failing to a dead-letter JSONL file.
+    """
+    def __init__(self, path, endpoint, batch_size=20, concurrency=4, timeout=10,
+                 max_attempts=6, base_backoff=1.0, max_backoff=300.0,
+                 dead_letter_path="invoice_dead_letter.jsonl", poll_seconds=5.0):
+        self.__endpoint = endpoint
+        self.__batch_size = batch_size
+        self.__concurrency = concurrency
+        self.__timeout = timeout
+        self.__max_attempts = max_attempts
+        self.__base_backoff = base_backoff
+        self.__max_backoff = max_backoff
+        self.__dead_letter_path = dead_letter_path
+        self.__poll_seconds = poll_seconds
+
+        self.__lock = threading.Lock()
+        self.__wake = threading.Event()
+        self.__stop = threading.Event()
+        self.__idle = threading.Event()
+        self.__worker = None
+
+        self.sent = 0
+        self.retried = 0
+        self.dead = 0
+
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        self.__db.execute("PRAGMA journal_mode=WAL")
+        self.__db.execute("PRAGMA synchronous=NORMAL")
+        self.__db.execute(
+            "CREATE TABLE IF NOT EXISTS invoices ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL, "
+            "last_error TEXT, created_at REAL NOT NULL)"
+        )
+        self.__db.commit()
+
+        self.__session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.__session.mount("http://", adapter)
+        self.__session.mount("https://", adapter)
+        self.__session.headers.update({'Content-Type': 'application/json'})
+
+    def enqueue(self, payload):
+        now = time.time()
+        with self.__lock:
+            cursor = self.__db.execute(
+                "INSERT INTO invoices (payload, next_attempt_at, created_at) VALUES (?, ?, ?)",
+                (json.dumps(payload), now, now)
+            )
+            self.__db.commit()
+            self.__idle.clear()
+        self.__wake.set()
+        return cursor.lastrowid
+
+    def pending_count(self):
+        with self.__lock:
+            return self.__db.execute("SELECT COUNT(*) FROM invoices").fetchone()[0]
+
+    def __due_jobs(self):
+        with self.__lock:
+            return self.__db.execute(
+                "SELECT id, payload, attempts FROM invoices WHERE next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (time.time(), self.__batch_size)
+            ).fetchall()
+
+    def __next_due_in(self):
+        with self.__lock:
+            row = self.__db.execute("SELECT MIN(next_attempt_at) FROM invoices").fetchone()
+            if row[0] is None:
+                self.__idle.set()
+                return None
+        return max(0.0, row[0] - time.time())
+
+    def __send(self, job):
+        job_id, payload, attempts = job
+        try:
+            with span("webhook", "n8n_invoice", job_id=job_id, attempt=attempts + 1):
+                response = self.__session.post(self.__endpoint, data=payload, timeout=self.__timeout)
+                response.raise_for_status()
+            return job, None
+        except Exception as e:
+            return job, e
+
+    def __complete(self, job):
+        with self.__lock:
+            self.__db.execute("DELETE FROM invoices WHERE id = ?", (job[0],))
+            self.__db.commit()
+        self.sent += 1
+
+    def __fail(self, job, error):
+        job_id, payload, attempts = job
+        attempts += 1
+
+        if attempts >= self.__max_attempts:
+            with open(self.__dead_letter_path, "a") as f:
+                f.write(json.dumps({
+                    "id": job_id, "payload": json.loads(payload), "attempts": attempts,
+                    "error": str(error), "failed_at": time.time()
+                }) + "\n")
+            with self.__lock:
+                self.__db.execute("DELETE FROM invoices WHERE id = ?", (job_id,))
+                self.__db.commit()
+            self.dead += 1
+            console.print(f"[red](invoice_outbox.py) | Invoice {job_id} moved to dead letter:[/red]: {error}")
+            return
+
+        # Exponential backoff with full jitter
+        delay = random.uniform(0, min(self.__max_backoff, self.__base_backoff * 2 ** attempts))
+        with self.__lock:
+            self.__db.execute(
+                "UPDATE invoices SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (attempts, time.time() + delay, str(error), job_id)
+            )
+            self.__db.commit()
+        self.retried += 1
+
+    def __run(self):
+        with ThreadPoolExecutor(max_workers=self.__concurrency, thread_name_prefix="invoice-send") as executor:
+            while not self.__stop.is_set():
+                self.__wake.clear()
+                jobs = self.__due_jobs()
+                if not jobs:
+                    due_in = self.__next_due_in()
+                    self.__wake.wait(self.__poll_seconds if due_in is None else min(due_in, self.__poll_seconds))
+                    continue
+
+                for job, error in executor.map(self.__send, jobs):
+                    if error is None:
+                        self.__complete(job)
+                    else:
+                        self.__fail(job, error)
+
+    def start(self):
+        if self.__worker is None:
+            self.__worker = threading.Thread(target=self.__run, name="invoice-outbox", daemon=True)
+            self.__worker.start()
+
+    def stop(self):
+        self.__stop.set()
+        self.__wake.set()
+
+    def drain(self, timeout):
+        """Wait until every queued invoice is delivered or dead-lettered, up to timeout seconds."""
+        self.__wake.set()
+        return self.__idle.wait(timeout)
+
+    def stats(self):
+        return {"sent": self.sent, "retried": self.retried, "dead": self.dead, "pending": self.pending_count()}
+
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+def get_invoice_outbox():
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = InvoiceOutbox(
+                path=config.invoice_outbox_path,
+                endpoint=get_settings().n8n_endpoint,
+                batch_size=config.invoice_batch_size,
+                concurrency=config.invoice_concurrency,
+                timeout=config.invoice_timeout_seconds,
+                max_attempts=config.invoice_max_attempts,
+                dead_letter_path=config.invoice_dead_letter_path,
+            )
+            _outbox.start()
+        return _outbox
+
+def drain_invoice_outbox(timeout):
+    """Give queued invoices a chance to go out before a CLI process exits; undelivered ones stay queued."""
+    if _outbox is None:
+        return True
+    delivered = _outbox.drain(timeout)
+    if not delivered:
+        console.print(f"[yellow](invoice_outbox.py) | Invoices still pending, they will be sent on next run:[/yellow] {_outbox.stats()}")
+    return delivered
@@ -1,17 +1,14 @@
-from agents.root_agent import StrandsAgent
-from supabaseClient import supabase_client
+from invoice_outbox import drain_invoice_outbox
+from planner_writer import get_planner_writer, drain_planner_writer, idempotency_key, new_id
 
 import config
+import argparse
+import asyncio
 import uuid
 import json
-import os
-from dotenv import load_dotenv
-load_dotenv()
 
-from rich.traceback import install
 from rich.console import Console
 console = Console()
-install(show_locals=True)
 
 def parse_json(response_text):
     if '```json' in response_text:
@@ -22,32 +19,90 @@ def parse_json(response_text):
     data = json.loads(response_text.strip())
     return data
 
-def insert_plan_to_planner(data):
-    plan_id = "PLAN-" + str(uuid.uuid1()).split("-")[0]
-    data["plan_id"] = plan_id
+def prepare_plan(data):
+    data["plan_id"] = new_id("PLAN")
 
-    if data['booking_id'] == "":
+    if data.get('booking_id', "") == "":
         data["booking_id"] = None
 
+    return data
+
+def plan(agent, prompt, on_itinerary_entry=None, on_itinerary_reset=None):
+    if config.approval_mode == "queue":
+        # Approvals are answered on the dashboard, the plan waits on the event loop instead of input()
+        return asyncio.run(agent.call_agent_parallel_async(
+            prompt, on_itinerary_entry=on_itinerary_entry, on_itinerary_reset=on_itinerary_reset
+        ))
+    return agent.call_agent_parallel(prompt, on_itinerary_entry=on_itinerary_entry, on_itinerary_reset=on_itinerary_reset)
+
+def insert_plan_to_planner(data, key=None):
+    return insert_plans_to_planner([data], [key])
+
+def insert_plans_to_planner(rows, keys=None):
+    """
+    Queue plans for planner.plans through the planner writer, they are upserted in batches in the background.
+    keys are idempotency keys, one per row: a plan retried under the same key is not inserted again.
+    Return the rows as written, with the plan_id first given to a retried key.
+    """
+    writer = get_planner_writer()
+    keys = keys or [None] * len(rows)
+
     try:
-        res = supabase_client.schema('planner').table("plans").insert([data]).execute()
-        console.print("[green]Planning Success[/green]")
-        return res
+        results = [writer.write("plans", prepare_plan(data), key) for data, key in zip(rows, keys)]
+        created = sum(1 for _, new in results if new)
+        if created:
+            console.print(f"[green]Planning Success ({created} plans)[/green]")
+        if created < len(results):
+            console.print(f"[yellow](main.py) | {len(results) - created} plans were already written under the same idempotency key, not inserted again[/yellow]")
+        return [row for row, _ in results]
 
     except Exception as e:
         console.print(f"[red]Planning Failed: {e}[/red]")
         return 
 
-if __name__ =='__main__':
-    try:
-        agent = StrandsAgent()
+def run_cli(run_id):
+    # Every run writes a new plan, only a retry of this run id returns the plan it already wrote
+    key = idempotency_key("cli", config.default_user_id, run_id)
+    written = get_planner_writer().lookup("plans", key)
+    if written is not None:
+        console.print(f"[yellow](main.py) | Run {run_id} already wrote plan {written['plan_id']}, not planned again[/yellow]")
+        return written
+
+    # Strands and the agents load here, a retried run that has nothing to plan never pays for them
+    from agents.root_agent import StrandsAgent
+    from agents.itinerary_stream import ItineraryStreamPublisher
+    agent = StrandsAgent()
+    if config.orchestration == "parallel" and config.stream_itinerary:
+        publisher = ItineraryStreamPublisher(config.itinerary_stream_url, stream_id=str(uuid.uuid4()))
+        publisher.started(prompt=config.prompt)
+        try:
+            res = plan(agent, config.prompt, on_itinerary_entry=publisher.entry, on_itinerary_reset=publisher.day_reset)
+        finally:
+            publisher.finished()
+            publisher.close()
+    elif config.orchestration == "parallel":
+        res = plan(agent, config.prompt)
+    else:
         res = agent.call_agent(config.prompt)
 
-        response_text = str(res.message['content'][0]['text'])
-        console.print(f"[cyan](main.py) | itenerary:[/cyan]: {response_text}")
-            
-        data = parse_json(response_text.strip())
-        insert_plan_to_planner(data)
+    response_text = str(res.message['content'][0]['text'])
+    console.print(f"[cyan](main.py) | itenerary:[/cyan]: {response_text}")
+
+    data = parse_json(response_text.strip())
+    written = insert_plan_to_planner(data, key)
+    return written[0] if written else None
+
+if __name__ =='__main__':
+    parser = argparse.ArgumentParser(description="Plan config.prompt and write it to planner.plans")
+    parser.add_argument("--run-id", default=None, help="run id printed by a failed run, to retry it without planning or inserting its plan twice")
+    args = parser.parse_args()
+    run_id = args.run_id or new_id("RUN")
+    console.print(f"[cyan](main.py) | run id:[/cyan] {run_id}")
+
+    try:
+        run_cli(run_id)
+        drain_planner_writer(config.planner_write_drain_seconds)
+        drain_invoice_outbox(config.invoice_drain_seconds)
 
     except Exception as e:
         console.print_exception(show_locals=True)
@@ -0,0 +1,240 @@
+from supabaseClient import supabase_client
+from settings import ROOT
+from tracing import span
+from travel_schema import PLACE_COLUMNS
+
+import config
+import json
+import math
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from rich.console import Console
+console = Console()
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOP_WORDS = {
+    "a", "an", "and", "are", "at", "be", "by", "for", "from", "i", "in", "is", "it", "of", "on", "or",
+    "place", "places", "some", "that", "the", "to", "want", "with",
+}
+RETRY_SECONDS = 60
+
+
+def tokenize(text):
+    return [token for token in TOKEN.findall((text or "").lower()) if token not in STOP_WORDS]
+
+
+def hash_terms(text, dimensions):
+    """
+    Sublinear term frequencies of text's words and word pairs hashed into dimensions buckets, as (buckets, values).
+    crc32 keeps buckets the same across processes, a second bit of the hash signs the term so collisions cancel out.
+    """
+    tokens = tokenize(text)
+    counts = {}
+    for term in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+        code = zlib.crc32(term.encode())
+        bucket = code % dimensions
+        counts[bucket] = counts.get(bucket, 0) + (1 if code & 0x80000000 else -1)
+
+    counts = {bucket: count for bucket, count in counts.items() if count}
+    buckets = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.array([math.copysign(1 + math.log(abs(count)), count) for count in counts.values()], dtype=np.float32)
+    return buckets, values
+
+
+def document(row):
+    return " ".join(str(row.get(column) or "") for column in ("name", "category", "description"))
+
+
+class PlaceIndex:
+    """
+    TF-IDF vectors of travel.places name, category and description, one L2-normalized float32 row per place.
+    Rows are sorted by city, so a search reads one contiguous slice of the memory-mapped matrix
+    and filters it by category and ticket price before ranking by cosine similarity.
+    """
+    def __init__(self, path, vectors, idf, places, built_at):
+        self.path = path
+        self.built_at = built_at
+        self.__vectors = vectors
+        self.__idf = idf
+        self.__places = places
+        self.__cities = {}
+        for number, place in enumerate(places):
+            lo, _ = self.__cities.get(place["city"], (number, number))
+            self.__cities[place["city"]] = (lo, number + 1)
+        self.__categories = np.array([place.get("category") or "" for place in places], dtype=object)
+        self.__prices = np.array([place.get("ticket_price") or 0 for place in places], dtype=np.float64)
+
+    def __len__(self):
+        return len(self.__places)
+
+    @classmethod
+    def build(cls, rows, path, dimensions=1024):
+        """Index rows and write them to path (vectors.npy and places.json), return the index read back memory-mapped."""
+        places = sorted(rows, key=lambda row: (row.get("city") or "", row["id"]))
+        terms = [hash_terms(document(place), dimensions) for place in places]
+
+        # Smoothed idf per bucket, then every row scaled to unit length so a dot product is the cosine
+        df = np.zeros(dimensions, dtype=np.int64)
+        for buckets, _ in terms:
+            df[buckets] += 1
+        idf = (np.log((1 + len(places)) / (1 + df)) + 1).astype(np.float32)
+
+        os.makedirs(path, exist_ok=True)
+        # Rows go straight to the file, a large table is never held as a dense matrix in memory
+        vectors = np.lib.format.open_memmap(
+            os.path.join(path, "vectors.tmp.npy"), mode="w+", dtype=np.float32, shape=(len(places), dimensions)
+        )
+        for number, (buckets, values) in enumerate(terms):
+            weights = values * idf[buckets]
+            norm = np.linalg.norm(weights)
+            vectors[number, buckets] = weights / norm if norm else weights
+        vectors.flush()
+        del vectors
+
+        built_at = time.time()
+        meta = {
+            "built_at": built_at,
+            "dimensions": dimensions,
+            "idf": idf.tolist(),
+            "places": [{key: place.get(key) for key in ("id", "city", "ticket_price", *PLACE_COLUMNS)} for place in places],
+        }
+        # Written beside the old files and swapped in, a running search never reads half an index
+        with open(os.path.join(path, "places.json.tmp"), "w") as f:
+            json.dump(meta, f)
+        os.replace(os.path.join(path, "vectors.tmp.npy"), os.path.join(path, "vectors.npy"))
+        os.replace(os.path.join(path, "places.json.tmp"), os.path.join(path, "places.json"))
+        return cls.load(path)
+
+    @classmethod
+    def load(cls, path):
+        """The index at path, None when it was never built or its files do not match."""
+        try:
+            with open(os.path.join(path, "places.json"), "r") as f:
+                meta = json.load(f)
+            vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        except (FileNotFoundError, ValueError):
+            return None
+        if vectors.shape != (len(meta["places"]), meta["dimensions"]):
+            return None
+        return cls(path, vectors, np.array(meta["idf"], dtype=np.float32), meta["places"], meta["built_at"])
+
+    def embed(self, text):
+        """text's unit TF-IDF vector, as its non-zero (buckets, weights)."""
+        buckets, values = hash_terms(text, len(self.__idf))
+        weights = values * self.__idf[buckets]
+        norm = np.linalg.norm(weights)
+        return buckets, weights / norm if norm else weights
+
+    def search(self, text, city, category=None, max_ticket_price=None, k=5):
+        """
+        Top k places of city for text by cosine similarity, with the filters of the travel.places query:
+        category IN (any when empty) and max ticket price. Ties and an empty text keep id order.
+        """
+        lo, hi = self.__cities.get(city, (0, 0))
+        mask = np.ones(hi - lo, dtype=bool)
+        if category:
+            mask &= np.isin(self.__categories[lo:hi], list(category))
+        if max_ticket_price is not None:
+            mask &= self.__prices[lo:hi] <= max_ticket_price
+        candidates = np.flatnonzero(mask) + lo
+        if not len(candidates):
+            return []
+
+        # Only the query's few buckets of each row are read from the mapped file
+        buckets, weights = self.embed(text)
+        scores = np.asarray(self.__vectors[lo:hi, buckets])[candidates - lo] @ weights
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.lexsort((candidates[top], -scores[top]))]
+        else:
+            top = np.lexsort((candidates, -scores))
+
+        return [
+            {column: self.__places[candidates[i]].get(column) for column in PLACE_COLUMNS}
+            for i in top
+        ]
+
+
+def fetch_places(page_size=1000):
+    rows = []
+    start = 0
+    while True:
+        with span("supabase", "travel.places", op="select"):
+            page = supabase_client.schema('travel')\
+                    .table("places")\
+                    .select("*")\
+                    .order("id")\
+                    .range(start, start + page_size - 1)\
+                    .execute()
+
+        rows.extend(page.data)
+        if len(page.data) < page_size:
+            return rows
+        start += page_size
+
+
+def build_place_index():
+    path = ROOT / config.place_index_path
+    start = time.perf_counter()
+    index = PlaceIndex.build(fetch_places(), path, dimensions=config.place_index_dimensions)
+    console.print(f"[green](place_index.py) | Indexed {len(index)} places in {time.perf_counter() - start:.1f}s[/green]")
+    return index
+
+
+_index = None
+_index_lock = threading.Lock()
+_rebuilding = False
+_failed_at = None
+
+def _rebuild():
+    global _index, _rebuilding, _failed_at
+    try:
+        index = build_place_index()
+    except Exception as e:
+        console.print(f"[red](place_index.py) | Error building place index:[/red]: {e}")
+        index = None
+    with _index_lock:
+        if index is not None:
+            _index = index
+            _failed_at = None
+        else:
+            _failed_at = time.time()
+        _rebuilding = False
+
+def get_place_index():
+    """
+    The place index when config.place_search is on, otherwise None. Read from place_index_path, or
+    built from travel.places in the background when missing and past place_index_max_age_seconds.
+    None until the first build is done. A failed build is retried after RETRY_SECONDS, the tool queries
+    Supabase meanwhile when there is no index, or searches the stale one.
+    """
+    global _index, _rebuilding
+    if not config.place_search:
+        return None
+
+    with _index_lock:
+        if _index is None:
+            _index = PlaceIndex.load(ROOT / config.place_index_path)
+
+        if _rebuilding:
+            return _index
+        if _index is not None and time.time() - _index.built_at <= config.place_index_max_age_seconds:
+            return _index
+        if _failed_at is not None and time.time() - _failed_at < RETRY_SECONDS:
+            return _index
+
+        # Downloading every place takes a while, searches never wait for it
+        _rebuilding = True
+        threading.Thread(target=_rebuild, name="place-index-build", daemon=True).start()
+        return _index
+
+
+if __name__ == '__main__':
+    # Rebuild now, e.g. after loading new places
+    build_place_index()
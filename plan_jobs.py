@@ -0,0 +1,280 @@
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from planner_writer import new_id, idempotency_key
+from approvals import parking
+
+import config
+import asyncio
+
+from rich.console import Console
+console = Console()
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class QueueFull(Exception):
+    """Every worker is busy and the job queue is full, the client should retry later."""
+
+
+def utc_now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class PlanJobs:
+    """
+    Planning jobs run inside the backend's event loop.
+    submit() queues a prompt and returns its job at once, or raises QueueFull when queue_size jobs already wait.
+    At most workers StrandsAgent async pipelines run at once, a plan waiting for a model holds its worker
+    but no thread. A plan parked on a human approval gives its worker back to the queue and takes the
+    next free one once decided. Progress is sent with the coroutine publish(message) as itinerary stream
+    messages keyed by job id: queued, started, stage (started/finished), entry, parked/resumed,
+    and finished with the job status.
+    """
+    def __init__(self, publish, workers=4, queue_size=16, timeout=1800, history=500):
+        self.__publish = publish
+        self.__timeout = timeout
+        self.__history = history
+        self.__queue = asyncio.Queue(maxsize=queue_size)
+        self.__slots = asyncio.Semaphore(workers)
+        self.__holding = set()
+        self.__jobs = OrderedDict()
+        self.__keys = {}
+        self.__tasks = {}
+        self.__worker_tasks = []
+        self.__publishing = set()
+        self.__agent = None
+        self.__agent_lock = asyncio.Lock()
+
+        self.rejected = 0
+
+    def start(self):
+        self.__worker_tasks.append(asyncio.create_task(self.__dispatch(), name="plan-jobs"))
+        self.__worker_tasks.append(asyncio.create_task(self.__warm_up()))
+
+    async def stop(self):
+        tasks = self.__worker_tasks + list(self.__tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def __warm_up(self):
+        # Build the agent now, so the first job does not pay for it
+        try:
+            await self.__get_agent()
+        except Exception as e:
+            console.print(f"[yellow](plan_jobs.py) | Planner not built at startup, retried by the first job:[/yellow] {e}")
+
+    async def __get_agent(self):
+        async with self.__agent_lock:
+            if self.__agent is None:
+                self.__agent = await asyncio.to_thread(self.__build_agent)
+            return self.__agent
+
+    def __build_agent(self):
+        # Imported here so the backend serves reads without loading the agents until planning is used
+        from agents.root_agent import StrandsAgent
+        # Approvals go to the dashboard, in console mode nobody could answer so hotels are found but not booked
+        return StrandsAgent(hitl=config.approval_mode == "queue")
+
+    async def __send(self, job_id, message):
+        try:
+            await self.__publish({"stream_id": job_id, **message})
+        except Exception as e:
+            console.print(f"[yellow](plan_jobs.py) | Progress of {job_id} not published:[/yellow] {e}")
+
+    def __emit(self, job, message):
+        # Progress never holds up the plan, tasks are kept until sent
+        task = asyncio.create_task(self.__send(job["job_id"], message))
+        self.__publishing.add(task)
+        task.add_done_callback(self.__publishing.discard)
+
+    def __forget_finished(self):
+        finished = [job_id for job_id, job in self.__jobs.items() if job["status"] in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.__history)]:
+            job = self.__jobs.pop(job_id)
+            self.__keys.pop(job.get("idempotency_key"), None)
+
+    def submit(self, prompt, user_id=None, key=None):
+        """
+        Queue a plan. Return (job, created): a job submitted again under the same idempotency key
+        is returned as is, unless it failed or was cancelled.
+        """
+        if key is not None and key in self.__keys:
+            job = self.__jobs.get(self.__keys[key])
+            if job is not None and job["status"] not in (FAILED, CANCELLED):
+                return job, False
+
+        job = {
+            "job_id": new_id("JOB"),
+            "status": QUEUED,
+            "prompt": prompt,
+            "user_id": user_id or config.default_user_id,
+            "idempotency_key": key,
+            "created_at": utc_now(),
+            "started_at": None,
+            "finished_at": None,
+            "stage": None,
+            "stages": {},
+            "plan_id": None,
+            "error": None,
+        }
+        try:
+            self.__queue.put_nowait(job["job_id"])
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFull(f"{self.__queue.qsize()} plans are already waiting")
+
+        self.__jobs[job["job_id"]] = job
+        if key is not None:
+            self.__keys[key] = job["job_id"]
+        self.__forget_finished()
+        self.__emit(job, {"type": "queued", "position": self.__queue.qsize()})
+        return job, True
+
+    def get(self, job_id):
+        return self.__jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job. Return the job, None when unknown."""
+        job = self.__jobs.get(job_id)
+        if job is None or job["status"] in FINISHED:
+            return job
+
+        task = self.__tasks.get(job_id)
+        if task is not None:
+            # The plan stops at its next await, stage work already running in a thread finishes unused
+            task.cancel()
+        else:
+            self.__finish(job, CANCELLED)
+        return job
+
+    def __finish(self, job, status, error=None):
+        job["status"] = status
+        job["error"] = error
+        job["stage"] = None
+        job["finished_at"] = utc_now()
+        self.__emit(job, {"type": "finished", "status": status, "plan_id": job["plan_id"], "error": error})
+
+    async def __dispatch(self):
+        # No worker is held while the queue is empty, plans resuming after an approval would wait for it
+        while True:
+            job_id = await self.__queue.get()
+            self.__queue.task_done()
+            await self.__slots.acquire()
+            job = self.__jobs.get(job_id)
+            if job is None or job["status"] != QUEUED:
+                self.__slots.release()
+                continue
+            self.__holding.add(job_id)
+            self.__tasks[job_id] = asyncio.create_task(self.__work(job), name=f"plan-job-{job_id}")
+
+    async def __work(self, job):
+        job_id = job["job_id"]
+        try:
+            with parking(lambda: self.__park(job)):
+                await self.__run(job)
+        except asyncio.CancelledError:
+            self.__finish(job, CANCELLED)
+        except asyncio.TimeoutError:
+            self.__finish(job, FAILED, f"plan took longer than {self.__timeout}s")
+        except Exception as e:
+            console.print(f"[red](plan_jobs.py) | Error running plan job {job_id}:[/red]: {e}")
+            self.__finish(job, FAILED, str(e))
+        finally:
+            self.__tasks.pop(job_id, None)
+            if job_id in self.__holding:
+                self.__holding.discard(job_id)
+                self.__slots.release()
+
+    @asynccontextmanager
+    async def __park(self, job):
+        # Approvals wait for minutes, the worker runs queued plans meanwhile
+        job_id = job["job_id"]
+        if job_id not in self.__holding:
+            # Already parked by another approval of the same plan
+            yield
+            return
+
+        self.__holding.discard(job_id)
+        self.__slots.release()
+        self.__emit(job, {"type": "parked", "stage": job["stage"]})
+        cancelled = False
+        try:
+            yield
+        except asyncio.CancelledError:
+            # A cancelled plan does not wait for a worker just to finish
+            cancelled = True
+            raise
+        finally:
+            if not cancelled:
+                # Not holding a worker until acquired, so a plan cancelled while waiting releases nothing
+                await self.__slots.acquire()
+                self.__holding.add(job_id)
+                self.__emit(job, {"type": "resumed", "stage": job["stage"]})
+
+    async def __run(self, job):
+        agent = await self.__get_agent()
+        # main is an entry point, the backend only imports it once planning is used
+        from main import parse_json, insert_plans_to_planner
+
+        job["status"] = RUNNING
+        job["started_at"] = utc_now()
+        self.__emit(job, {"type": "started", "prompt": job["prompt"], "user_id": job["user_id"]})
+
+        loop = asyncio.get_running_loop()
+
+        def on_stage_start(stage):
+            job["stage"] = stage
+            self.__emit(job, {"type": "stage", "stage": stage, "status": "started"})
+
+        def on_stage(stage, seconds):
+            job["stages"][stage] = round(seconds, 3)
+            self.__emit(job, {"type": "stage", "stage": stage, "status": "finished", "seconds": round(seconds, 3)})
+
+        def on_entry(key, value):
+            # Itinerary days stream from worker threads
+            loop.call_soon_threadsafe(self.__emit, job, {"type": "entry", "key": key, "value": value})
+
+        def on_reset(keys):
+            loop.call_soon_threadsafe(self.__emit, job, {"type": "day_reset", "keys": keys})
+
+        res = await asyncio.wait_for(
+            agent.call_agent_parallel_async(
+                job["prompt"],
+                on_itinerary_entry=on_entry if config.stream_itinerary else None,
+                on_stage=on_stage,
+                user_id=job["user_id"],
+                on_stage_start=on_stage_start,
+                on_itinerary_reset=on_reset,
+            ),
+            self.__timeout,
+        )
+        if isinstance(res, str):
+            raise RuntimeError(res)
+
+        data = parse_json(str(res.message['content'][0]['text']).strip())
+        # A client retrying under its idempotency key never gets the plan inserted twice
+        key = idempotency_key("job", job["user_id"], job["idempotency_key"] or job["job_id"])
+        written = await asyncio.to_thread(insert_plans_to_planner, [data], [key])
+        if not written:
+            raise RuntimeError("plan could not be queued for planner.plans")
+        job["plan_id"] = written[0]["plan_id"]
+        self.__finish(job, SUCCEEDED)
+
+    def stats(self):
+        statuses = {}
+        for job in self.__jobs.values():
+            statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+        return {
+            "waiting": self.__queue.qsize(),
+            "running": len(self.__holding),
+            "parked": len(self.__tasks) - len(self.__holding),
+            "rejected": self.rejected,
+            "jobs": statuses,
+        }
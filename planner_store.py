@@ -0,0 +1,81 @@
+from supabaseClient import supabase_client
+from concurrent.futures import ThreadPoolExecutor
+from tracing import span
+
+import config
+import asyncio
+
+TABLE_KEYS = {"plans": "plan_id", "bookings": "booking_id"}
+DATE_COLUMNS = {"plans": "start", "bookings": "check-in"}
+FILTER_COLUMNS = {"plans": ["plan_id", "booking_id"], "bookings": ["booking_id"]}
+UPDATED_COLUMN = "updated_at"  # stamped on insert and update by sql/planner_feed.sql
+
+# supabase-py is synchronous, every query runs here so the event loop never blocks
+db_executor = ThreadPoolExecutor(max_workers=config.db_max_workers, thread_name_prefix="planner-db")
+
+async def run_db(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, fn, *args)
+
+def fetch_page(table, after=None, page_size=100, filters=None, columns="*"):
+    """
+    Keyset-paginated read of a planner table, ordered by its primary key.
+    Return the page rows and the cursor for the next page (None on the last page).
+    filters["updated_since"] keeps rows inserted or updated at or after that timestamp.
+    """
+    if table not in TABLE_KEYS:
+        raise ValueError(f"unknown planner table: {table}")
+
+    filters = filters or {}
+    key = TABLE_KEYS[table]
+    page_size = max(1, min(page_size, config.db_max_page_size))
+
+    query = supabase_client.schema('planner').table(table).select(columns)
+    if after is not None:
+        query = query.gt(key, after)
+    for column in FILTER_COLUMNS[table]:
+        if filters.get(column):
+            query = query.eq(column, filters[column])
+    if filters.get("date_from"):
+        query = query.gte(DATE_COLUMNS[table], filters["date_from"])
+    if filters.get("date_to"):
+        query = query.lte(DATE_COLUMNS[table], filters["date_to"])
+    if filters.get("updated_since"):
+        query = query.gte(UPDATED_COLUMN, filters["updated_since"])
+
+    with span("supabase", f"planner.{table}", op="select"):
+        rows = query.order(key).limit(page_size).execute().data or []
+    next_cursor = rows[-1][key] if len(rows) == page_size else None
+    return {"table": table, "rows": rows, "next": next_cursor}
+
+async def iter_pages(table, after=None, page_size=100, filters=None, max_pages=None, columns="*"):
+    """Yield pages one at a time, the next page is only fetched once the caller asks for it."""
+    pages = 0
+    while True:
+        page = await run_db(fetch_page, table, after, page_size, filters, columns)
+        yield page
+
+        pages += 1
+        after = page["next"]
+        if after is None or (max_pages and pages >= max_pages):
+            return
+
+def fetch_pending_approvals():
+    with span("supabase", "planner.approvals", op="select"):
+        return supabase_client.schema('planner')\
+                .table("approvals")\
+                .select('*')\
+                .eq("status", "pending")\
+                .order("created_at")\
+                .limit(config.db_max_page_size)\
+                .execute().data or []
+
+def save_approval_decision(approval_id, status, decided_at):
+    """Mark a pending approval approved or rejected. Return the updated rows, empty when it was already decided."""
+    with span("supabase", "planner.approvals", op="update"):
+        return supabase_client.schema('planner')\
+                .table("approvals")\
+                .update({"status": status, "decision": status == "approved", "decided_at": decided_at})\
+                .eq("approval_id", approval_id)\
+                .eq("status", "pending")\
+                .execute().data or []
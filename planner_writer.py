@@ -0,0 +1,344 @@
+from supabaseClient import supabase_client
+from planner_store import TABLE_KEYS
+from postgrest.exceptions import APIError
+from tracing import span
+
+import config
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from rich.console import Console
+console = Console()
+
+CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+RANDOM_BITS = 80
+# Postgres error classes a retry cannot fix: data exceptions, constraint violations, undefined columns and the like
+PERMANENT_ERROR_CLASSES = ("22", "23", "42", "PGRST1", "PGRST2")
+
+_id_lock = threading.Lock()
+_last_ms = 0
+_last_random = 0
+
+def new_id(prefix):
+    """
+    Collision-free, time-sortable id such as PLAN-01JC3Z8Q5G7N2M4K6P8R0T2V4X (ULID layout).
+    48 bits of milliseconds then 80 random bits, in Crockford base32. Ids made in the same millisecond
+    increment the random part, so one process never repeats an id and its ids sort in creation order.
+    """
+    global _last_ms, _last_random
+    with _id_lock:
+        ms = time.time_ns() // 1_000_000
+        if ms <= _last_ms:
+            ms, rand = _last_ms, _last_random + 1
+            if rand >> RANDOM_BITS:
+                ms, rand = ms + 1, 0
+        else:
+            rand = int.from_bytes(os.urandom(RANDOM_BITS // 8), "big")
+        _last_ms, _last_random = ms, rand
+
+    value = (ms << RANDOM_BITS) | rand
+    chars = []
+    for _ in range(26):
+        chars.append(CROCKFORD[value & 31])
+        value >>= 5
+    return f"{prefix}-{''.join(reversed(chars))}"
+
+def is_retryable(error):
+    """False for errors the row itself causes, such as a constraint or type error, True for outages and throttling."""
+    if isinstance(error, APIError) and error.code:
+        return not str(error.code).startswith(PERMANENT_ERROR_CLASSES)
+    return True
+
+def idempotency_key(*parts):
+    """Stable key for a logical write, e.g. idempotency_key("booking", email, hotel, check_in, check_out)."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class PlannerWriter:
+    """
+    Write-behind buffer for planner.plans and planner.bookings.
+    write() appends the row to a local sqlite write-ahead log and returns at once; a background worker
+    upserts pending rows of a table in batches of batch_size, or flush_seconds after the oldest was written.
+    Every row has an idempotency key: writing a key again returns the row first written under it, and
+    upserts skip primary keys already in the table, so retried plans and retried batches never insert twice.
+    Failed batches stay in the log and are retried with backoff, also by the next process that starts.
+    A batch refused for one of its rows (is_retryable false) is split in halves until that row is alone,
+    the others are written and only it goes to the dead letter file.
+    """
+    def __init__(self, path, batch_size=100, flush_seconds=0.5, max_attempts=20, base_backoff=0.5,
+                 max_backoff=60.0, dead_letter_path="planner_write_dead_letter.jsonl",
+                 key_ttl_seconds=7 * 24 * 3600, poll_seconds=5.0):
+        self.__batch_size = batch_size
+        self.__flush_seconds = flush_seconds
+        self.__max_attempts = max_attempts
+        self.__base_backoff = base_backoff
+        self.__max_backoff = max_backoff
+        self.__dead_letter_path = dead_letter_path
+        self.__key_ttl_seconds = key_ttl_seconds
+        self.__poll_seconds = poll_seconds
+
+        self.__lock = threading.Lock()
+        self.__wake = threading.Event()
+        self.__stop = threading.Event()
+        self.__idle = threading.Event()
+        self.__draining = False
+        self.__worker = None
+
+        self.written = 0
+        self.batches = 0
+        self.duplicates = 0
+        self.retried = 0
+        self.dead = 0
+
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        self.__db.execute("PRAGMA journal_mode=WAL")
+        self.__db.execute("PRAGMA synchronous=NORMAL")
+        self.__db.execute(
+            "CREATE TABLE IF NOT EXISTS writes ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, tbl TEXT NOT NULL, key TEXT NOT NULL, payload TEXT NOT NULL, "
+            "status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, "
+            "next_attempt_at REAL NOT NULL, last_error TEXT, created_at REAL NOT NULL, written_at REAL, "
+            "UNIQUE (tbl, key))"
+        )
+        self.__db.execute("CREATE INDEX IF NOT EXISTS writes_pending ON writes (status, next_attempt_at)")
+        # A write_now() the last process did not finish may or may not have reached Supabase, the upsert settles it
+        self.__db.execute("UPDATE writes SET status = 'pending' WHERE status = 'sending'")
+        self.__db.commit()
+        self.__pending = self.pending_count()
+
+    def write(self, table, row, key=None):
+        """
+        Queue row for planner.<table>. Return (row, True), or (first row, False) when key was already written.
+        Without a key the row's id is used, callers that may retry pass a key naming the logical write.
+        """
+        if table not in TABLE_KEYS:
+            raise ValueError(f"unknown planner table: {table}")
+        key = key or row[TABLE_KEYS[table]]
+
+        now = time.time()
+        with self.__lock:
+            cursor = self.__db.execute(
+                "INSERT OR IGNORE INTO writes (tbl, key, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                (table, key, json.dumps(row, default=str), now, now)
+            )
+            self.__db.commit()
+            if cursor.rowcount == 0:
+                existing = self.__db.execute("SELECT payload FROM writes WHERE tbl = ? AND key = ?", (table, key)).fetchone()
+                self.duplicates += 1
+                return json.loads(existing[0]), False
+            self.__pending += 1
+            self.__idle.clear()
+            full = self.__pending >= self.__batch_size
+
+        if full:
+            self.__wake.set()
+        return row, True
+
+    def lookup(self, table, key):
+        """The row first written under key, None when key was never written or has expired."""
+        with self.__lock:
+            existing = self.__db.execute("SELECT payload FROM writes WHERE tbl = ? AND key = ?", (table, key)).fetchone()
+        return json.loads(existing[0]) if existing else None
+
+    def write_now(self, table, row, key=None):
+        """
+        Write row to planner.<table> before returning, for rows the caller acts on at once (a booking is invoiced).
+        Same keys as write(): return (row, True), or (first row, False) when key was already written.
+        Raises when Supabase refuses the row, its key is then forgotten so the same write can be tried again.
+        """
+        if table not in TABLE_KEYS:
+            raise ValueError(f"unknown planner table: {table}")
+        key = key or row[TABLE_KEYS[table]]
+
+        now = time.time()
+        with self.__lock:
+            cursor = self.__db.execute(
+                "INSERT OR IGNORE INTO writes (tbl, key, payload, status, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, 'sending', ?, ?)",
+                (table, key, json.dumps(row, default=str), now, now)
+            )
+            self.__db.commit()
+            if cursor.rowcount == 0:
+                existing = self.__db.execute("SELECT payload FROM writes WHERE tbl = ? AND key = ?", (table, key)).fetchone()
+                self.duplicates += 1
+                return json.loads(existing[0]), False
+            job_id = cursor.lastrowid
+
+        try:
+            with span("supabase", f"planner.{table}", op="upsert", rows=1):
+                supabase_client.schema('planner')\
+                    .table(table)\
+                    .upsert([row], on_conflict=TABLE_KEYS[table], ignore_duplicates=True)\
+                    .execute()
+        except Exception:
+            with self.__lock:
+                self.__db.execute("DELETE FROM writes WHERE id = ?", (job_id,))
+                self.__db.commit()
+            raise
+
+        with self.__lock:
+            self.__db.execute("UPDATE writes SET status = 'written', written_at = ? WHERE id = ?", (time.time(), job_id))
+            self.__db.commit()
+        self.written += 1
+        return row, True
+
+    def pending_count(self):
+        with self.__lock:
+            return self.__db.execute("SELECT COUNT(*) FROM writes WHERE status = 'pending'").fetchone()[0]
+
+    def __next_batch(self):
+        """Rows of one table ready to go out, oldest first, or the seconds until some will be."""
+        now = time.time()
+        with self.__lock:
+            due, oldest = self.__db.execute(
+                "SELECT COUNT(*), MIN(created_at) FROM writes WHERE status = 'pending' AND next_attempt_at <= ?", (now,)
+            ).fetchone()
+            if due and (self.__draining or due >= self.__batch_size or oldest + self.__flush_seconds <= now):
+                table = self.__db.execute(
+                    "SELECT tbl FROM writes WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id LIMIT 1", (now,)
+                ).fetchone()[0]
+                return table, self.__db.execute(
+                    "SELECT id, payload, attempts FROM writes WHERE status = 'pending' AND tbl = ? AND next_attempt_at <= ? "
+                    "ORDER BY id LIMIT ?", (table, now, self.__batch_size)
+                ).fetchall()
+
+            next_retry = self.__db.execute(
+                "SELECT MIN(next_attempt_at) FROM writes WHERE status = 'pending' AND next_attempt_at > ?", (now,)
+            ).fetchone()[0]
+            if not due and next_retry is None:
+                self.__idle.set()
+                self.__draining = False
+                return None, None
+
+        waits = [self.__poll_seconds]
+        if due:
+            waits.append(oldest + self.__flush_seconds - now)
+        if next_retry is not None:
+            waits.append(next_retry - now)
+        return None, max(0.0, min(waits))
+
+    def __flush(self, table, jobs):
+        rows = [json.loads(payload) for _, payload, _ in jobs]
+        try:
+            with span("supabase", f"planner.{table}", op="upsert", rows=len(rows)):
+                supabase_client.schema('planner')\
+                    .table(table)\
+                    .upsert(rows, on_conflict=TABLE_KEYS[table], ignore_duplicates=True)\
+                    .execute()
+        except Exception as e:
+            if len(jobs) > 1 and not is_retryable(e):
+                # One bad row fails the whole upsert, halving isolates it and the other rows are written
+                middle = len(jobs) // 2
+                self.__flush(table, jobs[:middle])
+                self.__flush(table, jobs[middle:])
+                return
+            self.__fail(table, jobs, e)
+            return
+
+        now = time.time()
+        with self.__lock:
+            self.__db.executemany(
+                "UPDATE writes SET status = 'written', written_at = ? WHERE id = ?", [(now, job[0]) for job in jobs]
+            )
+            # Keys are remembered for key_ttl_seconds, long enough for any retry of the same plan
+            self.__db.execute(
+                "DELETE FROM writes WHERE status = 'written' AND written_at < ?", (now - self.__key_ttl_seconds,)
+            )
+            self.__db.commit()
+            self.__pending -= len(jobs)
+        self.written += len(jobs)
+        self.batches += 1
+
+    def __fail(self, table, jobs, error):
+        attempts = jobs[0][2] + 1
+        if attempts >= self.__max_attempts or not is_retryable(error):
+            with open(self.__dead_letter_path, "a") as f:
+                for job_id, payload, _ in jobs:
+                    f.write(json.dumps({
+                        "id": job_id, "table": table, "row": json.loads(payload), "attempts": attempts,
+                        "error": str(error), "failed_at": time.time()
+                    }) + "\n")
+            with self.__lock:
+                # Forgetting their keys lets a retry of the same plan write it again
+                self.__db.executemany("DELETE FROM writes WHERE id = ?", [(job[0],) for job in jobs])
+                self.__db.commit()
+                self.__pending -= len(jobs)
+            self.dead += len(jobs)
+            console.print(f"[red](planner_writer.py) | {len(jobs)} planner.{table} rows moved to dead letter:[/red]: {error}")
+            return
+
+        # Exponential backoff with full jitter, the rows wait in the log meanwhile
+        delay = random.uniform(0, min(self.__max_backoff, self.__base_backoff * 2 ** attempts))
+        with self.__lock:
+            self.__db.executemany(
+                "UPDATE writes SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                [(attempts, time.time() + delay, str(error), job[0]) for job in jobs]
+            )
+            self.__db.commit()
+        self.retried += len(jobs)
+        console.print(f"[yellow](planner_writer.py) | Writing {len(jobs)} planner.{table} rows failed, retry in {delay:.1f}s:[/yellow] {error}")
+
+    def __run(self):
+        while not self.__stop.is_set():
+            self.__wake.clear()
+            table, batch = self.__next_batch()
+            if table is None:
+                self.__wake.wait(self.__poll_seconds if batch is None else batch)
+                continue
+            self.__flush(table, batch)
+
+    def start(self):
+        if self.__worker is None:
+            self.__worker = threading.Thread(target=self.__run, name="planner-writer", daemon=True)
+            self.__worker.start()
+
+    def stop(self):
+        self.__stop.set()
+        self.__wake.set()
+
+    def drain(self, timeout):
+        """Flush every pending row now, without waiting for batches to fill, up to timeout seconds."""
+        with self.__lock:
+            self.__draining = True
+        self.__wake.set()
+        return self.__idle.wait(timeout)
+
+    def stats(self):
+        return {
+            "written": self.written, "batches": self.batches, "duplicates": self.duplicates,
+            "retried": self.retried, "dead": self.dead, "pending": self.pending_count(),
+        }
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_planner_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = PlannerWriter(
+                path=config.planner_write_path,
+                batch_size=config.planner_write_batch_size,
+                flush_seconds=config.planner_write_flush_seconds,
+                max_attempts=config.planner_write_max_attempts,
+                max_backoff=config.planner_write_max_backoff,
+                dead_letter_path=config.planner_write_dead_letter_path,
+                key_ttl_seconds=config.planner_write_key_ttl_seconds,
+            )
+            _writer.start()
+        return _writer
+
+def drain_planner_writer(timeout):
+    """Give queued plans and bookings a chance to reach Supabase before a CLI process exits; the rest stay in the log."""
+    if _writer is None:
+        return True
+    written = _writer.drain(timeout)
+    if not written:
+        console.print(f"[yellow](planner_writer.py) | Writes still pending, they will be retried on next run:[/yellow] {_writer.stats()}")
+    return written
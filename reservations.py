@@ -0,0 +1,123 @@
+from supabaseClient import supabase_client
+from postgrest.exceptions import APIError
+from tracing import span
+
+import config
+import atexit
+import threading
+
+from rich.console import Console
+console = Console()
+
+HELD = "held"
+CONFIRMED = "confirmed"
+# PostgREST or Postgres saying the reservation functions, tables or columns do not exist
+MISSING_MIGRATION_CODES = ("PGRST202", "42883", "42P01", "42703")
+
+
+def missing_migration(error):
+    """True when error means sql/reservations.sql was never applied to this database."""
+    return isinstance(error, APIError) and error.code in MISSING_MIGRATION_CODES
+
+
+class ReservationDesk:
+    """
+    Room and balance holds for hotel bookings, enforced by the planner SQL functions in sql/reservations.sql.
+    hold() takes a room for every night of the stay and the stay's price from the user's wallet for ttl_seconds,
+    confirm() turns the hold into a booking and debits the wallet in one database transaction, and release()
+    gives both back. Holds of abandoned plans are released here, or expire in the database after ttl_seconds.
+    available turns False the first time the database has no reservation functions, bookings then skip the desk.
+    """
+    def __init__(self, ttl_seconds):
+        self.__ttl_seconds = ttl_seconds
+        self.__open = set()
+        self.__lock = threading.Lock()
+
+        self.held = 0
+        self.confirmed = 0
+        self.released = 0
+        self.refused = 0
+        self.available = True
+
+    def __call(self, function, params):
+        with span("supabase", f"planner.{function}", op="rpc"):
+            return supabase_client.schema('planner').rpc(function, params).execute().data
+
+    def hold(self, reservation_id, key, hotel_name, user_email, nights, price_per_night, opening_balance):
+        """
+        Hold a room at hotel_name for nights (ISO dates) and price_per_night * len(nights) of the balance.
+        Return the database answer: status is "held" (or "confirmed" for a key already booked),
+        "sold_out", "insufficient_balance" or "unknown_hotel".
+        opening_balance seeds the user's wallet the first time it is seen.
+        """
+        try:
+            result = self.__call("hold_reservation", {
+                "p_reservation_id": reservation_id,
+                "p_idempotency_key": key,
+                "p_hotel_name": hotel_name,
+                "p_user_email": user_email,
+                "p_nights": nights,
+                "p_price_per_night": price_per_night,
+                "p_opening_balance": opening_balance,
+                "p_ttl_seconds": self.__ttl_seconds,
+            })
+        except Exception as e:
+            if missing_migration(e) and self.available:
+                self.available = False
+                console.print(f"[yellow](reservations.py) | sql/reservations.sql is not applied, hotels are booked without reservations:[/yellow] {e}")
+            raise
+        if result.get("status") == HELD:
+            with self.__lock:
+                self.__open.add(result["reservation_id"])
+            self.held += 1
+        elif result.get("status") != CONFIRMED:
+            self.refused += 1
+        return result
+
+    def confirm(self, reservation_id, booking):
+        """Book a held reservation, booking is the planner.bookings row. status is "confirmed" or why the hold is gone."""
+        result = self.__call("confirm_reservation", {"p_reservation_id": reservation_id, "p_booking": booking})
+        with self.__lock:
+            self.__open.discard(reservation_id)
+        if result.get("status") == CONFIRMED:
+            self.confirmed += 1
+        return result
+
+    def release(self, reservation_id):
+        """Give back a hold that was not confirmed, a no-op for confirmed or already released reservations."""
+        with self.__lock:
+            if reservation_id not in self.__open:
+                return None
+            self.__open.discard(reservation_id)
+        try:
+            result = self.__call("release_reservation", {"p_reservation_id": reservation_id})
+            self.released += 1
+            return result
+        except Exception as e:
+            console.print(f"[yellow](reservations.py) | Hold {reservation_id} not released, it expires by itself:[/yellow] {e}")
+            return None
+
+    def release_all(self):
+        """Release every hold this process still has open, called when the process exits."""
+        with self.__lock:
+            open_ids = list(self.__open)
+        for reservation_id in open_ids:
+            self.release(reservation_id)
+
+    def stats(self):
+        with self.__lock:
+            open_holds = len(self.__open)
+        return {"held": self.held, "confirmed": self.confirmed, "released": self.released,
+                "refused": self.refused, "open": open_holds}
+
+
+_desk = None
+_desk_lock = threading.Lock()
+
+def get_reservation_desk():
+    global _desk
+    with _desk_lock:
+        if _desk is None:
+            _desk = ReservationDesk(ttl_seconds=config.reservation_hold_seconds)
+            atexit.register(_desk.release_all)
+        return _desk
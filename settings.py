@@ -0,0 +1,53 @@
+from pydantic import BaseModel
+from pathlib import Path
+from dotenv import load_dotenv
+
+import copy
+import json
+import os
+import threading
+
+ROOT = Path(__file__).resolve().parent
+ENV_FILES = (ROOT / ".env", ROOT / "agents" / ".env")
+
+
+class Settings(BaseModel):
+    """Secrets and endpoints from .env and agents/.env (variables already set in the environment win)."""
+    supabase_url: str | None = None
+    supabase_secret_key: str | None = None
+    supabase_anon_key: str | None = None
+    gemini_api_key: str | None = None
+    n8n_endpoint: str | None = None
+
+
+_lock = threading.Lock()
+_settings = None
+_user_profile = None
+_prompts = {}
+
+def get_settings():
+    """Read both .env files once per process, every module shares the result."""
+    global _settings
+    with _lock:
+        if _settings is None:
+            for path in ENV_FILES:
+                load_dotenv(dotenv_path=path)
+            _settings = Settings(**{name: os.getenv(name.upper()) for name in Settings.model_fields})
+        return _settings
+
+def load_user_profile():
+    """user_profile.json from the repository root, read once. Callers get their own copy to edit."""
+    global _user_profile
+    with _lock:
+        if _user_profile is None:
+            with open(ROOT / "user_profile.json", "r") as f:
+                _user_profile = json.load(f)
+        return copy.deepcopy(_user_profile)
+
+def read_prompt(name):
+    """System prompt system_prompts/<name>, read once whatever the working directory is."""
+    with _lock:
+        if name not in _prompts:
+            with open(ROOT / "system_prompts" / name, "r") as f:
+                _prompts[name] = f.read()
+        return _prompts[name]
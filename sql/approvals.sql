@@ -0,0 +1,19 @@
+-- Human-in-the-loop approvals (approvals.py, config.approval_mode = "queue").
+-- Run once in the Supabase SQL editor. Planners insert each approval pending and wait for a decision,
+-- the backend saves dashboard decisions, and rows nobody answered are closed as expired, or cancelled
+-- when the plan waiting for them was cancelled or timed out.
+
+create table if not exists planner.approvals (
+    approval_id text primary key,
+    kind text not null,
+    payload jsonb not null default '{}'::jsonb,
+    status text not null default 'pending'
+        check (status in ('pending', 'approved', 'rejected', 'expired', 'cancelled')),
+    decision boolean,
+    created_at timestamptz not null default now(),
+    expires_at timestamptz not null,
+    decided_at timestamptz
+);
+
+-- The backend lists pending approvals on startup, planners poll the ones they wait for by id
+create index if not exists approvals_pending_created on planner.approvals (created_at) where status = 'pending';
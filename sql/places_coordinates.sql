@@ -0,0 +1,11 @@
+-- Coordinates for routing each itinerary day (agents/route_planner.py).
+-- Run once in the Supabase SQL editor. The place agent, prefetch and the place index select these columns,
+-- so without them every travel.places query fails. Rows left null are kept, only unrouted.
+
+alter table travel.places
+    add column if not exists latitude double precision,
+    add column if not exists longitude double precision;
+
+alter table travel.hotels
+    add column if not exists latitude double precision,
+    add column if not exists longitude double precision;
@@ -0,0 +1,25 @@
+-- Change cursor for the backend's planner feed (backend.py PlannerFeed).
+-- Run once in the Supabase SQL editor. Every insert and update stamps updated_at, so the feed only reads
+-- rows changed since its last poll instead of both tables. Deleted rows are found by listing keys.
+
+alter table planner.plans add column if not exists updated_at timestamptz not null default now();
+alter table planner.bookings add column if not exists updated_at timestamptz not null default now();
+
+create or replace function planner.touch_updated_at() returns trigger
+language plpgsql as $$
+begin
+    new.updated_at = now();
+    return new;
+end;
+$$;
+
+drop trigger if exists plans_touch_updated_at on planner.plans;
+create trigger plans_touch_updated_at before update on planner.plans
+    for each row execute function planner.touch_updated_at();
+
+drop trigger if exists bookings_touch_updated_at on planner.bookings;
+create trigger bookings_touch_updated_at before update on planner.bookings
+    for each row execute function planner.touch_updated_at();
+
+create index if not exists plans_updated_at on planner.plans (updated_at);
+create index if not exists bookings_updated_at on planner.bookings (updated_at);
@@ -0,0 +1,192 @@
+-- Room inventory and balance reservations for hotel bookings (reservations.py).
+-- Run once in the Supabase SQL editor. Every function is one transaction and only uses
+-- conditional single-statement updates, so concurrent bookings never wait on each other's locks
+-- between round trips: a hold or confirm either applies in full or reports why it could not.
+
+alter table travel.hotels add column if not exists rooms integer not null default 10;
+
+create table if not exists travel.room_inventory (
+    hotel_id bigint not null references travel.hotels (id),
+    night date not null,
+    rooms_total integer not null,
+    rooms_held integer not null default 0,
+    rooms_booked integer not null default 0,
+    version bigint not null default 0,
+    primary key (hotel_id, night),
+    check (rooms_held >= 0 and rooms_booked >= 0 and rooms_held + rooms_booked <= rooms_total)
+);
+
+create table if not exists planner.wallets (
+    user_email text primary key,
+    balance bigint not null,
+    held bigint not null default 0,
+    version bigint not null default 0,
+    check (held >= 0 and held <= balance)
+);
+
+create table if not exists planner.reservations (
+    reservation_id text primary key,
+    idempotency_key text unique,
+    hotel_id bigint not null,
+    user_email text not null,
+    nights date[] not null,
+    amount bigint not null,
+    status text not null default 'held',  -- held, confirmed, released, expired
+    booking_id text,
+    expires_at timestamptz not null,
+    created_at timestamptz not null default now(),
+    version bigint not null default 0
+);
+create index if not exists reservations_held on planner.reservations (expires_at) where status = 'held';
+
+
+-- Give back the rooms and balance of one reservation that is no longer held
+create or replace function planner.return_hold(r planner.reservations) returns void
+language sql as $$
+    update travel.room_inventory
+       set rooms_held = rooms_held - 1, version = version + 1
+     where hotel_id = r.hotel_id and night = any (r.nights);
+    update planner.wallets
+       set held = held - r.amount, version = version + 1
+     where user_email = r.user_email;
+$$;
+
+
+create or replace function planner.expire_reservations(p_limit integer default 500) returns integer
+language plpgsql as $$
+declare
+    r planner.reservations;
+    expired integer := 0;
+begin
+    for r in
+        update planner.reservations
+           set status = 'expired', version = version + 1
+         where reservation_id in (
+               select reservation_id from planner.reservations
+                where status = 'held' and expires_at <= now()
+                limit p_limit for update skip locked)
+        returning *
+    loop
+        perform planner.return_hold(r);
+        expired := expired + 1;
+    end loop;
+    return expired;
+end;
+$$;
+
+
+create or replace function planner.hold_reservation(
+    p_reservation_id text, p_idempotency_key text, p_hotel_name text, p_user_email text,
+    p_nights date[], p_price_per_night bigint, p_opening_balance bigint, p_ttl_seconds integer
+) returns jsonb
+language plpgsql as $$
+declare
+    existing planner.reservations;
+    hotel travel.hotels;
+    amount bigint := p_price_per_night * cardinality(p_nights);
+    expires timestamptz := now() + make_interval(secs => p_ttl_seconds);
+    updated integer;
+begin
+    select * into existing from planner.reservations where idempotency_key = p_idempotency_key;
+    if found and existing.status in ('held', 'confirmed') then
+        return jsonb_build_object('status', existing.status, 'reservation_id', existing.reservation_id,
+                                  'booking_id', existing.booking_id, 'amount', existing.amount,
+                                  'expires_at', existing.expires_at, 'created', false);
+    end if;
+    -- A released or expired attempt of the same stay may be held again
+    delete from planner.reservations where idempotency_key = p_idempotency_key;
+
+    select * into hotel from travel.hotels where name = p_hotel_name order by id limit 1;
+    if not found then
+        return jsonb_build_object('status', 'unknown_hotel');
+    end if;
+    perform planner.expire_reservations(50);
+
+    insert into travel.room_inventory (hotel_id, night, rooms_total)
+    select hotel.id, night, hotel.rooms from unnest(p_nights) as night
+    on conflict do nothing;
+    insert into planner.wallets (user_email, balance) values (p_user_email, p_opening_balance)
+    on conflict do nothing;
+
+    begin
+        update travel.room_inventory
+           set rooms_held = rooms_held + 1, version = version + 1
+         where hotel_id = hotel.id and night = any (p_nights)
+           and rooms_held + rooms_booked < rooms_total;
+        get diagnostics updated = row_count;
+        if updated < cardinality(p_nights) then
+            raise exception 'sold_out';
+        end if;
+
+        update planner.wallets
+           set held = held + amount, version = version + 1
+         where user_email = p_user_email and balance - held >= amount;
+        get diagnostics updated = row_count;
+        if updated = 0 then
+            raise exception 'insufficient_balance';
+        end if;
+    exception when raise_exception then
+        -- The block is rolled back, no room or balance stays held
+        return jsonb_build_object('status', sqlerrm, 'amount', amount);
+    end;
+
+    insert into planner.reservations (reservation_id, idempotency_key, hotel_id, user_email, nights, amount, expires_at)
+    values (p_reservation_id, p_idempotency_key, hotel.id, p_user_email, p_nights, amount, expires);
+
+    return jsonb_build_object('status', 'held', 'reservation_id', p_reservation_id, 'amount', amount,
+                              'expires_at', expires, 'created', true);
+end;
+$$;
+
+
+create or replace function planner.confirm_reservation(p_reservation_id text, p_booking jsonb) returns jsonb
+language plpgsql as $$
+declare
+    r planner.reservations;
+begin
+    -- Optimistic: the reservation only moves on if it is still held and unexpired
+    update planner.reservations
+       set status = 'confirmed', booking_id = p_booking ->> 'booking_id', version = version + 1
+     where reservation_id = p_reservation_id and status = 'held' and expires_at > now()
+    returning * into r;
+
+    if not found then
+        select * into r from planner.reservations where reservation_id = p_reservation_id;
+        if found and r.status = 'confirmed' then
+            return jsonb_build_object('status', 'confirmed', 'booking_id', r.booking_id, 'created', false);
+        end if;
+        return jsonb_build_object('status', coalesce(r.status, 'unknown_reservation'));
+    end if;
+
+    update travel.room_inventory
+       set rooms_held = rooms_held - 1, rooms_booked = rooms_booked + 1, version = version + 1
+     where hotel_id = r.hotel_id and night = any (r.nights);
+    update planner.wallets
+       set held = held - r.amount, balance = balance - r.amount, version = version + 1
+     where user_email = r.user_email;
+    insert into planner.bookings select * from jsonb_populate_record(null::planner.bookings, p_booking);
+
+    return jsonb_build_object('status', 'confirmed', 'booking_id', r.booking_id, 'created', true);
+end;
+$$;
+
+
+create or replace function planner.release_reservation(p_reservation_id text) returns jsonb
+language plpgsql as $$
+declare
+    r planner.reservations;
+begin
+    update planner.reservations
+       set status = 'released', version = version + 1
+     where reservation_id = p_reservation_id and status = 'held'
+    returning * into r;
+
+    if not found then
+        select * into r from planner.reservations where reservation_id = p_reservation_id;
+        return jsonb_build_object('status', coalesce(r.status, 'unknown_reservation'));
+    end if;
+
+    perform planner.return_hold(r);
+    return jsonb_build_object('status', 'released');
+end;
+$$;
@@ -0,0 +1,19 @@
+-- User profiles for multi-user planning (agents/profile_store.py, config.profile_store = "supabase").
+-- Run once in the Supabase SQL editor. Planners cache profiles and the system prompts compiled from them,
+-- and compare versions to notice a changed profile, so every save goes through save_user_profile.
+
+create table if not exists planner.user_profiles (
+    user_id text primary key,
+    profile jsonb not null,
+    version bigint not null default 1,
+    updated_at timestamptz not null default now()
+);
+
+
+create or replace function planner.save_user_profile(p_user_id text, p_profile jsonb) returns bigint
+language sql as $$
+    insert into planner.user_profiles (user_id, profile) values (p_user_id, p_profile)
+    on conflict (user_id) do update
+       set profile = excluded.profile, version = planner.user_profiles.version + 1, updated_at = now()
+    returning version;
+$$;
@@ -1,14 +1,29 @@
-from supabase import create_client
-from dotenv import load_dotenv
-import os
-load_dotenv()
-
-supabase_admin = create_client(
-    os.getenv("SUPABASE_URL"), 
-    os.getenv("SUPABASE_SECRET_KEY")
-)
-
-supabase_client = create_client(
-    os.getenv("SUPABASE_URL"), 
-    os.getenv("SUPABASE_ANON_KEY")
-)
\ No newline at end of file
+from settings import get_settings
+import threading
+
+
+class LazyClient:
+    """
+    Supabase client built on first use. Importing a module that queries Supabase costs nothing,
+    the supabase package is only imported once a query is actually made.
+    """
+    def __init__(self, key_setting):
+        self.__key_setting = key_setting
+        self.__client = None
+        self.__lock = threading.Lock()
+
+    def __get(self):
+        if self.__client is None:
+            with self.__lock:
+                if self.__client is None:
+                    from supabase import create_client
+                    settings = get_settings()
+                    self.__client = create_client(settings.supabase_url, getattr(settings, self.__key_setting))
+        return self.__client
+
+    def __getattr__(self, name):
+        return getattr(self.__get(), name)
+
+
+supabase_admin = LazyClient("supabase_secret_key")
+supabase_client = LazyClient("supabase_anon_key")
@@ -0,0 +1,26 @@
+"""
+Tests run against the in-memory Supabase and scripted models of benchmarks/fakes.py, nothing leaves the process.
+The fake client is installed here, before any test imports a module that queries Supabase.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fakes import FakeSupabase, install_fake_supabase, use_scratch_files
+
+import pytest
+
+_db = install_fake_supabase(FakeSupabase({}))
+
+
+@pytest.fixture
+def fake_db():
+    """The fake Supabase with empty tables, and local files under a scratch directory."""
+    import config
+    _db.tables.clear()
+    _db.functions.clear()
+    use_scratch_files()
+    config.trace_enabled = False
+    return _db
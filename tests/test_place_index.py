@@ -0,0 +1,57 @@
+from benchmarks.fakes import seed_travel_data
+
+import config
+import place_index
+import pytest
+import time
+
+
+@pytest.fixture
+def fresh_index(fake_db, monkeypatch):
+    """No index loaded yet, place search on, and travel.places seeded."""
+    fake_db.tables.update(seed_travel_data(hotels_per_city=1, places_per_city=20, plans=0))
+    monkeypatch.setattr(config, "place_search", True)
+    monkeypatch.setattr(place_index, "_index", None)
+    monkeypatch.setattr(place_index, "_rebuilding", False)
+    monkeypatch.setattr(place_index, "_failed_at", None)
+    return fake_db
+
+
+def settle():
+    for _ in range(500):
+        with place_index._index_lock:
+            if not place_index._rebuilding:
+                return
+        time.sleep(0.01)
+    raise AssertionError("index build still running")
+
+
+def test_missing_index_is_built_in_the_background(fresh_index):
+    assert place_index.get_place_index() is None
+    settle()
+    index = place_index.get_place_index()
+    assert index is not None and len(index) == len(fresh_index.tables["travel.places"])
+
+
+def test_failing_rebuild_of_a_stale_index_backs_off(fresh_index, monkeypatch):
+    place_index.get_place_index()
+    settle()
+    stale = place_index.get_place_index()
+
+    attempts = []
+    def failing_fetch(page_size=1000):
+        attempts.append(time.time())
+        raise RuntimeError("Supabase is down")
+
+    monkeypatch.setattr(place_index, "fetch_places", failing_fetch)
+    monkeypatch.setattr(config, "place_index_max_age_seconds", -1)
+    for _ in range(20):
+        assert place_index.get_place_index() is stale
+        settle()
+    assert len(attempts) == 1
+
+    # Retried once RETRY_SECONDS have passed
+    monkeypatch.setattr(place_index, "_failed_at", time.time() - place_index.RETRY_SECONDS)
+    place_index.get_place_index()
+    settle()
+    assert len(attempts) == 2
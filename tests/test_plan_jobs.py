@@ -0,0 +1,100 @@
+from approvals import ApprovalQueue, get_approval_queue
+from plan_jobs import PlanJobs, CANCELLED, SUCCEEDED
+
+import asyncio
+import pytest
+import time
+
+
+@pytest.fixture
+def approvals(fake_db, monkeypatch):
+    """An approval queue without a backend, whose dashboard messages are collected in approvals.published."""
+    queue = ApprovalQueue(url=None, timeout=30, defaults={})
+    queue.published = []
+    monkeypatch.setattr(queue, "_ApprovalQueue__publish", queue.published.append)
+    monkeypatch.setattr("approvals._queue", queue)
+    return queue
+
+
+def plan_jobs(workers):
+    """PlanJobs whose plans ask for one approval when their prompt says so, then succeed."""
+    async def publish(message):
+        pass
+
+    jobs = PlanJobs(publish, workers=workers)
+
+    async def run(job):
+        job["status"] = "running"
+        if job["prompt"] == "approve":
+            await get_approval_queue().request("hotel_booking", {"job_id": job["job_id"]})
+        jobs._PlanJobs__finish(job, SUCCEEDED)
+
+    async def warm_up():
+        pass
+
+    jobs._PlanJobs__run = run
+    jobs._PlanJobs__warm_up = warm_up
+    return jobs
+
+
+async def wait_for(condition, seconds=5.0):
+    for _ in range(int(seconds / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not met in time")
+
+
+def test_parked_plan_gives_its_worker_to_queued_jobs(approvals):
+    async def main():
+        jobs = plan_jobs(workers=1)
+        jobs.start()
+        parked, _ = jobs.submit("approve")
+        await wait_for(lambda: jobs.stats()["parked"] == 1)
+
+        plain, _ = jobs.submit("plain")
+        await wait_for(lambda: plain["status"] == SUCCEEDED)
+        assert parked["status"] == "running"
+
+        approval = approvals.pending()[0]
+        approvals.resolve(approval["approval_id"], True)
+        await wait_for(lambda: parked["status"] == SUCCEEDED)
+        assert jobs.stats()["running"] == 0 and jobs.stats()["parked"] == 0
+        await jobs.stop()
+
+    asyncio.run(main())
+
+
+def test_cancelled_parked_plan_restores_its_worker_and_resolves_its_approval(fake_db, approvals):
+    async def main():
+        jobs = plan_jobs(workers=1)
+        jobs.start()
+        parked, _ = jobs.submit("approve")
+        await wait_for(lambda: jobs.stats()["parked"] == 1)
+        approval_id = approvals.pending()[0]["approval_id"]
+
+        jobs.cancel(parked["job_id"])
+        await wait_for(lambda: parked["status"] == CANCELLED)
+        assert jobs.stats()["running"] == 0 and jobs.stats()["parked"] == 0
+
+        # The only worker is free again: one job runs at once, the next waits for it
+        first, _ = jobs.submit("plain")
+        second, _ = jobs.submit("plain")
+        await wait_for(lambda: first["status"] == SUCCEEDED and second["status"] == SUCCEEDED)
+        assert jobs._PlanJobs__slots._value == 1
+        await jobs.stop()
+        return approval_id
+
+    approval_id = asyncio.run(main())
+
+    assert {"type": "resolved", "approval_id": approval_id, "status": "cancelled"} in approvals.published
+    assert approvals.pending() == []
+    assert approvals.stats()["cancelled"] == 1
+
+    # The row is closed on the approval db threads
+    rows = fake_db.tables["planner.approvals"]
+    for _ in range(100):
+        if rows[0]["status"] != "pending":
+            break
+        time.sleep(0.01)
+    assert [row["status"] for row in rows] == ["cancelled"]
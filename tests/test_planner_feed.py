@@ -0,0 +1,58 @@
+from backend import PlannerFeed
+
+import asyncio
+import json
+
+
+class StalledSocket:
+    """A dashboard whose sends block while stalled is clear, messages are kept once sent."""
+    def __init__(self):
+        self.sent = []
+        self.flowing = asyncio.Event()
+
+    async def send_text(self, text):
+        await self.flowing.wait()
+        self.sent.append(json.loads(text))
+
+
+class Socket(StalledSocket):
+    def __init__(self):
+        super().__init__()
+        self.flowing.set()
+
+
+def plan(plan_id, destination, stamp):
+    return {"plan_id": plan_id, "destination": destination, "updated_at": f"2026-01-01T00:00:0{stamp}+00:00"}
+
+
+def test_stalled_snapshot_does_not_hold_up_polls_and_gets_missed_deltas(fake_db):
+    fake_db.tables["planner.plans"] = [plan("PLAN-1", "Jakarta", 1)]
+    fake_db.tables["planner.bookings"] = []
+
+    async def main():
+        feed = PlannerFeed(interval=60)
+        fast = Socket()
+        await feed.subscribe(fast)
+        assert [message["type"] for message in fast.sent][-1] == "snapshot_end"
+        base = feed.version
+
+        slow = StalledSocket()
+        snapshot = asyncio.create_task(feed.subscribe(slow))
+        await asyncio.sleep(0.05)
+
+        fake_db.tables["planner.plans"].append(plan("PLAN-2", "Bali", 2))
+        await asyncio.wait_for(feed.poll_once(), 5)
+        assert fast.sent[-1]["type"] == "delta" and fast.sent[-1]["version"] == base + 1
+        assert slow.sent == []
+
+        slow.flowing.set()
+        await asyncio.wait_for(snapshot, 5)
+        return slow.sent, feed, base
+
+    sent, feed, base = asyncio.run(main())
+
+    types = [message["type"] for message in sent]
+    assert types[0] == "snapshot" and types[-2:] == ["snapshot_end", "delta"]
+    assert sent[0]["version"] == base and sent[-1]["version"] == base + 1
+    assert [row["plan_id"] for row in sent[-1]["plans"]["inserted"]] == ["PLAN-2"]
+    assert len(feed.subscribers) == 2 and feed.catching_up == {}
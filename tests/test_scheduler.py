@@ -0,0 +1,79 @@
+from strands.models import Model as StrandsModel
+from agents.scheduler import RequestScheduler, ScheduledModel
+
+import asyncio
+import threading
+
+
+class SlowFirstModel(StrandsModel):
+    """The first call stalls before its first event, every later call answers right away."""
+    def __init__(self, stall):
+        self.stall = stall
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def update_config(self, **model_config):
+        pass
+
+    def get_config(self):
+        return {"model_id": "slow-first"}
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+        if call == 1:
+            await asyncio.sleep(self.stall)
+        yield {"messageStart": {"role": "assistant"}}
+        yield {"contentBlockDelta": {"delta": {"text": f"call {call}"}}}
+        yield {"messageStop": {"stopReason": "end_turn"}}
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        yield {}
+
+
+def scheduler():
+    # Room for a hedge next to every primary, a hedge is only sent when a slot is free right away
+    scheduler = RequestScheduler(rpm=10 ** 6, tpm=10 ** 9, initial_concurrency=16)
+    # Time-to-first-event history of fast calls, so a stalled primary is past the hedge percentile
+    for _ in range(20):
+        scheduler.observe_first_event(0.01)
+    return scheduler
+
+
+async def text(model):
+    chunks = []
+    async for event in model.stream([{"role": "user", "content": [{"text": "hi"}]}]):
+        if "contentBlockDelta" in event:
+            chunks.append(event["contentBlockDelta"]["delta"]["text"])
+    return "".join(chunks)
+
+
+def test_stalled_primary_is_hedged_and_the_hedge_wins():
+    shared = scheduler()
+    backend = SlowFirstModel(stall=5)
+    model = ScheduledModel(backend, shared)
+
+    assert asyncio.run(asyncio.wait_for(text(model), 2)) == "call 2"
+    stats = shared.stats()
+    assert backend.calls == 2
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_hedge_counters_from_many_threads():
+    shared = scheduler()
+    runs = 8
+
+    def one():
+        asyncio.run(text(ScheduledModel(SlowFirstModel(stall=0.5), shared)))
+
+    threads = [threading.Thread(target=one) for _ in range(runs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    stats = shared.stats()
+    assert stats["hedged"] == runs and stats["hedge_wins"] == runs
+    assert stats["in_flight"] == 0
@@ -0,0 +1,40 @@
+from benchmarks.fakes import seed_travel_data
+from supabaseClient import supabase_client
+
+import pytest
+import travel_schema
+
+
+@pytest.fixture
+def places(fake_db, monkeypatch):
+    fake_db.tables.update(seed_travel_data(hotels_per_city=1, places_per_city=5, plans=0))
+    monkeypatch.setattr(travel_schema, "_coordinates", True)
+    return fake_db
+
+
+def jakarta_places(columns):
+    return supabase_client.schema('travel').table("places").select(columns).eq("city", "Jakarta").execute().data
+
+
+def test_places_keep_coordinates_when_the_columns_exist(places):
+    rows = travel_schema.select_places(jakarta_places, "id")
+    assert rows and set(rows[0]) == {"id", "name", "category", "latitude", "longitude"}
+
+
+def test_places_are_selected_without_coordinates_before_the_migration(places):
+    places.missing_columns["travel.places"] = {"latitude", "longitude"}
+    queries = places.queries
+
+    rows = travel_schema.select_places(jakarta_places, "id")
+    assert rows and set(rows[0]) == {"id", "name", "category"}
+    assert places.queries - queries == 2
+
+    # Later queries go straight to the columns that exist
+    travel_schema.select_places(jakarta_places)
+    assert places.queries - queries == 3
+
+
+def test_other_errors_are_raised(places):
+    places.missing_columns["travel.places"] = {"name"}
+    with pytest.raises(Exception):
+        travel_schema.select_places(jakarta_places)
@@ -0,0 +1,269 @@
+from contextlib import contextmanager
+
+import atexit
+import config
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+
+from rich.console import Console
+console = Console()
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class TraceWriter:
+    """
+    Buffered JSONL span exporter, one span per line.
+    Spans are flushed every flush_seconds or max_buffer spans, the file is rotated to <path>.1 past max_bytes.
+    """
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, flush_seconds=1.0, max_buffer=200):
+        self.__path = path
+        self.__max_bytes = max_bytes
+        self.__flush_seconds = flush_seconds
+        self.__max_buffer = max_buffer
+        self.__buffer = []
+        self.__last_flush = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def write(self, span):
+        with self.__lock:
+            self.__buffer.append(json.dumps(span, default=str))
+            if len(self.__buffer) >= self.__max_buffer or time.monotonic() - self.__last_flush >= self.__flush_seconds:
+                self.__flush()
+
+    def flush(self):
+        with self.__lock:
+            self.__flush()
+
+    def __flush(self):
+        self.__last_flush = time.monotonic()
+        if not self.__buffer:
+            return
+        try:
+            if os.path.exists(self.__path) and os.path.getsize(self.__path) > self.__max_bytes:
+                os.replace(self.__path, self.__path + ".1")
+            with open(self.__path, "a") as f:
+                f.write("\n".join(self.__buffer) + "\n")
+        except OSError as e:
+            console.print(f"[yellow](tracing.py) | Spans dropped:[/yellow] {e}")
+        self.__buffer = []
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_trace_writer():
+    """Return the process-wide trace writer, or None when config.trace_enabled is off."""
+    global _writer
+    if not config.trace_enabled:
+        return None
+
+    with _writer_lock:
+        if _writer is None:
+            _writer = TraceWriter(
+                path=config.trace_path,
+                max_bytes=config.trace_max_bytes,
+                flush_seconds=config.trace_flush_seconds,
+            )
+            atexit.register(_writer.flush)
+        return _writer
+
+
+class Span:
+    def __init__(self, kind, name, attributes):
+        parent = _current_span.get()
+        self.kind = kind
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes)
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.status = "ok"
+        self.error = None
+        self.start = time.time()
+        self.__started = time.perf_counter()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add_tokens(self, prompt=0, completion=0):
+        self.prompt_tokens += prompt or 0
+        self.completion_tokens += completion or 0
+
+    def fail(self, error):
+        self.status = "error"
+        self.error = str(error)
+
+    def end(self):
+        record = {
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "kind": self.kind, "name": self.name, "start": self.start,
+            "duration": time.perf_counter() - self.__started, "status": self.status,
+            "prompt_tokens": self.prompt_tokens, "completion_tokens": self.completion_tokens,
+            "attributes": self.attributes,
+        }
+        if self.error:
+            record["error"] = self.error
+
+        writer = get_trace_writer()
+        if writer is not None:
+            writer.write(record)
+        return record
+
+
+@contextmanager
+def span(kind, name, **attributes):
+    """
+    Time the block as a span (kind: agent, tool, stage, supabase, webhook).
+    Spans opened inside become its children, an exception marks it failed and is re-raised.
+    """
+    current = Span(kind, name, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.fail(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+def current_span():
+    return _current_span.get()
+
+
+def activate(span):
+    """
+    Make span the parent of spans opened later in this context, for spans started outside span().
+    Return the token to pass to deactivate() once span ends.
+    """
+    return _current_span.set(span)
+
+
+def deactivate(token):
+    """Make the span that was current before activate() the parent again."""
+    try:
+        _current_span.reset(token)
+    except ValueError:
+        # Ended from another context than it was activated in, put back the previous parent there
+        _current_span.set(None if token.old_value is contextvars.Token.MISSING else token.old_value)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class TraceMetrics:
+    """
+    Prometheus-style aggregation of a JSONL trace file.
+    collect() reads only the lines appended since the last call, so /metrics stays cheap under load.
+    """
+    def __init__(self, path, buckets=DURATION_BUCKETS):
+        self.__path = path
+        self.__buckets = buckets
+        self.__offset = 0
+        self.__inode = None
+        self.__lock = threading.Lock()
+        self.spans = {}
+        self.durations = {}
+        self.tokens = {}
+
+    def observe(self, record):
+        key = (record.get("kind", ""), record.get("name", ""))
+        status = record.get("status", "ok")
+        self.spans[key + (status,)] = self.spans.get(key + (status,), 0) + 1
+
+        histogram = self.durations.setdefault(key, {"buckets": [0] * len(self.__buckets), "sum": 0.0, "count": 0})
+        duration = record.get("duration", 0.0)
+        for i, bound in enumerate(self.__buckets):
+            if duration <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += duration
+        histogram["count"] += 1
+
+        for direction in ("prompt", "completion"):
+            count = record.get(f"{direction}_tokens") or 0
+            if count:
+                self.tokens[key + (direction,)] = self.tokens.get(key + (direction,), 0) + count
+
+    def collect(self):
+        with self.__lock:
+            try:
+                stat = os.stat(self.__path)
+            except FileNotFoundError:
+                return
+
+            # The writer rotated or truncated the file, start from the top of the new one
+            if stat.st_ino != self.__inode or stat.st_size < self.__offset:
+                self.__inode = stat.st_ino
+                self.__offset = 0
+
+            with open(self.__path, "rb") as f:
+                f.seek(self.__offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    self.__offset += len(line)
+                    try:
+                        self.observe(json.loads(line))
+                    except ValueError:
+                        continue
+
+    def render(self):
+        self.collect()
+        lines = [
+            "# HELP planner_spans_total Finished spans by kind, name and status.",
+            "# TYPE planner_spans_total counter",
+        ]
+        for (kind, name, status), count in sorted(self.spans.items()):
+            lines.append(f'planner_spans_total{{kind="{escape_label(kind)}",name="{escape_label(name)}",status="{status}"}} {count}')
+
+        lines += [
+            "# HELP planner_span_duration_seconds Span duration.",
+            "# TYPE planner_span_duration_seconds histogram",
+        ]
+        for (kind, name), histogram in sorted(self.durations.items()):
+            labels = f'kind="{escape_label(kind)}",name="{escape_label(name)}"'
+            for bound, count in zip(self.__buckets, histogram["buckets"]):
+                lines.append(f'planner_span_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'planner_span_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram["count"]}')
+            lines.append(f'planner_span_duration_seconds_sum{{{labels}}} {histogram["sum"]:.6f}')
+            lines.append(f'planner_span_duration_seconds_count{{{labels}}} {histogram["count"]}')
+
+        lines += [
+            "# HELP planner_tokens_total Model tokens by kind, name and direction (prompt or completion).",
+            "# TYPE planner_tokens_total counter",
+        ]
+        for (kind, name, direction), count in sorted(self.tokens.items()):
+            lines.append(f'planner_tokens_total{{kind="{escape_label(kind)}",name="{escape_label(name)}",direction="{direction}"}} {count}')
+
+        return "\n".join(lines) + "\n"
+
+
+class SampledLogger:
+    """
+    Console logging for hot paths: the first message per key is printed, then one in every `every`.
+    Keeps per-call parameter dumps readable when many plans run concurrently.
+    """
+    def __init__(self, console, every=None):
+        self.__console = console
+        self.__every = every
+        self.__counts = {}
+        self.__lock = threading.Lock()
+
+    def print(self, key, *args, **kwargs):
+        every = self.__every or config.log_sample_every
+        with self.__lock:
+            count = self.__counts.get(key, 0)
+            self.__counts[key] = count + 1
+        if every <= 1 or count % every == 0:
+            self.__console.print(*args, **kwargs)
@@ -0,0 +1,265 @@
+from supabaseClient import supabase_client
+from tracing import span
+from travel_schema import PLACE_COLUMNS
+
+import config
+import bisect
+import threading
+import time
+
+from rich.console import Console
+console = Console()
+
+HOTEL_AMENITIES = ["swimming_pool", "restaurant", "wifi", "parking", "gym"]
+
+def amenity_mask(amenities):
+    """Pack boolean hotel amenities into a bitmask (bit order follows HOTEL_AMENITIES)."""
+    mask = 0
+    for bit, amenity in enumerate(HOTEL_AMENITIES):
+        if amenities.get(amenity):
+            mask |= 1 << bit
+    return mask
+
+
+class _HotelBucket:
+    def __init__(self, rows):
+        self.by_price = sorted(rows, key=lambda row: (row.get("price_per_night") or 0, row["id"]))
+        self.price_keys = [row.get("price_per_night") or 0 for row in self.by_price]
+
+        self.by_rating = sorted(rows, key=lambda row: (row.get("rating") or 0, row["id"]))
+        self.rating_keys = [row.get("rating") or 0 for row in self.by_rating]
+
+
+class _CityHotels:
+    def __init__(self, rows):
+        # Amenities are matched exactly, so hotels are bucketed by amenity bitmask first
+        by_mask = {}
+        for row in rows:
+            by_mask.setdefault(amenity_mask(row), []).append(row)
+        self.buckets = {mask: _HotelBucket(mask_rows) for mask, mask_rows in by_mask.items()}
+
+
+class _CityPlaces:
+    def __init__(self, rows):
+        self.categories = {}
+        for row in sorted(rows, key=lambda row: (row.get("ticket_price") or 0, row["id"])):
+            self.categories.setdefault(row.get("category"), []).append(row)
+        self.price_keys = {
+            category: [row.get("ticket_price") or 0 for row in category_rows]
+            for category, category_rows in self.categories.items()
+        }
+
+
+class TravelReplica:
+    """
+    In-process copy of travel.hotels and travel.places.
+    Loaded in bulk once, refreshed incrementally by a cursor column (id or updated timestamp)
+    and indexed by city so tool lookups are answered without a Supabase round-trip.
+    Deleted rows leave no trace for the cursor, so every reconcile_seconds the ids are listed
+    and rows gone from Supabase are dropped.
+    """
+    def __init__(self, cursor_column="id", page_size=1000, reconcile_seconds=3600):
+        self.__cursor_column = cursor_column
+        self.__page_size = page_size
+        self.__reconcile_seconds = reconcile_seconds
+        self.__reconciled_at = None
+        self.__lock = threading.Lock()
+        self.__rows = {"hotels": {}, "places": {}}
+        self.__cursors = {"hotels": None, "places": None}
+        self.__hotel_index = {}
+        self.__place_index = {}
+        self.__refresh_thread = None
+        self.__stop = threading.Event()
+
+    def __fetch(self, table, cursor=None, columns="*"):
+        rows = []
+        start = 0
+        while True:
+            query = supabase_client.schema('travel').table(table).select(columns)
+            if cursor is not None:
+                # gte, rows written later with the cursor's own timestamp would be skipped by gt.
+                # The rows at the cursor come back every refresh and are dropped by __apply when unchanged
+                query = query.gte(self.__cursor_column, cursor)
+            with span("supabase", f"travel.{table}", op="select"):
+                page = query.order(self.__cursor_column)\
+                        .order("id")\
+                        .range(start, start + self.__page_size - 1)\
+                        .execute()
+
+            rows.extend(page.data)
+            if len(page.data) < self.__page_size:
+                return rows
+            start += self.__page_size
+
+    def __apply(self, table, rows):
+        if not rows:
+            return set()
+
+        table_rows = self.__rows[table]
+        cities = set()
+        for row in rows:
+            previous = table_rows.get(row["id"])
+            if previous == row:
+                continue
+            if previous is not None:
+                cities.add(previous.get("city"))
+            cities.add(row.get("city"))
+            table_rows[row["id"]] = row
+
+        cursor = max(row[self.__cursor_column] for row in rows)
+        if self.__cursors[table] is None or cursor > self.__cursors[table]:
+            self.__cursors[table] = cursor
+
+        return cities
+
+    def __drop_deleted(self, table, ids):
+        """Remove rows whose id is no longer in ids, return their cities."""
+        table_rows = self.__rows[table]
+        cities = set()
+        for key in [key for key in table_rows if key not in ids]:
+            cities.add(table_rows.pop(key).get("city"))
+        return cities
+
+    def __reindex(self, hotel_cities, place_cities):
+        hotels_by_city = {}
+        for row in self.__rows["hotels"].values():
+            if row.get("city") in hotel_cities:
+                hotels_by_city.setdefault(row.get("city"), []).append(row)
+        for city in hotel_cities:
+            self.__hotel_index[city] = _CityHotels(hotels_by_city.get(city, []))
+
+        places_by_city = {}
+        for row in self.__rows["places"].values():
+            if row.get("city") in place_cities:
+                places_by_city.setdefault(row.get("city"), []).append(row)
+        for city in place_cities:
+            self.__place_index[city] = _CityPlaces(places_by_city.get(city, []))
+
+    def load(self):
+        hotels = self.__fetch("hotels")
+        places = self.__fetch("places")
+
+        with self.__lock:
+            self.__rows = {"hotels": {}, "places": {}}
+            self.__cursors = {"hotels": None, "places": None}
+            self.__hotel_index = {}
+            self.__place_index = {}
+            self.__reindex(self.__apply("hotels", hotels), self.__apply("places", places))
+        self.__reconciled_at = time.monotonic()
+
+        console.print(f"[green](travel_replica.py) | Loaded {len(hotels)} hotels, {len(places)} places[/green]")
+
+    def refresh(self):
+        hotels = self.__fetch("hotels", self.__cursors["hotels"])
+        places = self.__fetch("places", self.__cursors["places"])
+
+        with self.__lock:
+            self.__reindex(self.__apply("hotels", hotels), self.__apply("places", places))
+
+        if self.__reconciled_at is None or time.monotonic() - self.__reconciled_at >= self.__reconcile_seconds:
+            self.reconcile()
+
+        return len(hotels) + len(places)
+
+    def reconcile(self):
+        """Drop rows deleted from Supabase since they were loaded, return how many were dropped."""
+        hotel_ids = {row["id"] for row in self.__fetch("hotels", columns="id")}
+        place_ids = {row["id"] for row in self.__fetch("places", columns="id")}
+
+        with self.__lock:
+            before = len(self.__rows["hotels"]) + len(self.__rows["places"])
+            self.__reindex(self.__drop_deleted("hotels", hotel_ids), self.__drop_deleted("places", place_ids))
+            dropped = before - len(self.__rows["hotels"]) - len(self.__rows["places"])
+        self.__reconciled_at = time.monotonic()
+
+        if dropped:
+            console.print(f"[yellow](travel_replica.py) | Dropped {dropped} deleted rows[/yellow]")
+        return dropped
+
+    def start(self, refresh_seconds):
+        def run():
+            while not self.__stop.wait(refresh_seconds):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    console.print(f"[red](travel_replica.py) | Error refresh replica:[/red]: {e}")
+
+        self.__refresh_thread = threading.Thread(target=run, name="travel-replica-refresh", daemon=True)
+        self.__refresh_thread.start()
+
+    def stop(self):
+        self.__stop.set()
+
+    def find_hotels(self, city, rating, amenities, max_price_per_night, limit=1):
+        """Same filters as the travel.hotels query in HotelAgent: equal city and amenities, min rating, max price."""
+        index = self.__hotel_index.get(city)
+        if index is None:
+            return []
+
+        bucket = index.buckets.get(amenity_mask(amenities))
+        if bucket is None:
+            return []
+
+        # Scan whichever sorted range is narrower: cheap enough hotels or well rated hotels
+        price_hi = bisect.bisect_right(bucket.price_keys, max_price_per_night)
+        rating_lo = bisect.bisect_left(bucket.rating_keys, rating)
+        if price_hi <= len(bucket.rating_keys) - rating_lo:
+            matches = [row for row in bucket.by_price[:price_hi] if (row.get("rating") or 0) >= rating]
+        else:
+            matches = [row for row in bucket.by_rating[rating_lo:] if (row.get("price_per_night") or 0) <= max_price_per_night]
+
+        matches.sort(key=lambda row: row["id"])
+        return matches[:limit]
+
+    def find_hotel_candidates(self, city, rating, max_price_per_night=None, limit=50):
+        """Hotels in a city above a rating and under a price, whatever their amenities."""
+        index = self.__hotel_index.get(city)
+        if index is None:
+            return []
+
+        matches = []
+        for bucket in index.buckets.values():
+            rating_lo = bisect.bisect_left(bucket.rating_keys, rating)
+            matches.extend(
+                row for row in bucket.by_rating[rating_lo:]
+                if max_price_per_night is None or (row.get("price_per_night") or 0) <= max_price_per_night
+            )
+
+        matches.sort(key=lambda row: row["id"])
+        return matches[:limit]
+
+    def find_places(self, city, category, max_ticket_price, limit=5, columns=PLACE_COLUMNS):
+        """Same filters as the travel.places query in PlaceAgent: equal city, category IN (any when empty), max ticket price."""
+        index = self.__place_index.get(city)
+        if index is None:
+            return []
+
+        matches = []
+        for name in category or index.categories:
+            category_rows = index.categories.get(name, [])
+            hi = bisect.bisect_right(index.price_keys.get(name, []), max_ticket_price)
+            matches.extend(category_rows[:hi])
+
+        matches.sort(key=lambda row: row["id"])
+        return [{column: row.get(column) for column in columns} for row in matches[:limit]]
+
+
+_replica = None
+_replica_lock = threading.Lock()
+
+def get_travel_replica():
+    """Return the loaded replica when config.use_travel_replica is on, otherwise None."""
+    global _replica
+    if not config.use_travel_replica:
+        return None
+
+    with _replica_lock:
+        if _replica is None:
+            replica = TravelReplica(
+                cursor_column=config.travel_replica_cursor,
+                reconcile_seconds=config.travel_replica_reconcile_seconds,
+            )
+            replica.load()
+            replica.start(config.travel_replica_refresh_seconds)
+            _replica = replica
+        return _replica
@@ -0,0 +1,44 @@
+from postgrest.exceptions import APIError
+
+import threading
+
+from rich.console import Console
+console = Console()
+
+PLACE_COLUMNS = ("name", "category", "latitude", "longitude")
+PLACE_COORDINATES = ("latitude", "longitude")
+# Postgres or PostgREST saying a selected column does not exist
+MISSING_COLUMN_CODES = ("42703", "PGRST204")
+
+_coordinates = True
+_lock = threading.Lock()
+
+
+def missing_column(error):
+    """True when error means a selected column does not exist, e.g. sql/places_coordinates.sql was never applied."""
+    return isinstance(error, APIError) and error.code in MISSING_COLUMN_CODES
+
+
+def place_columns(*extra):
+    """extra columns then the place columns as a select list, without coordinates once they were found missing."""
+    columns = PLACE_COLUMNS if _coordinates else tuple(c for c in PLACE_COLUMNS if c not in PLACE_COORDINATES)
+    return ", ".join((*extra, *columns))
+
+
+def select_places(query, *extra):
+    """
+    Return query(columns) for the select list of place_columns(*extra).
+    On a database without sql/places_coordinates.sql the first query fails on latitude, it is run again
+    without coordinates and so is every query after it. Places without coordinates are left unrouted.
+    """
+    global _coordinates
+    try:
+        return query(place_columns(*extra))
+    except Exception as e:
+        if not missing_column(e) or not _coordinates:
+            raise
+        with _lock:
+            if _coordinates:
+                _coordinates = False
+                console.print(f"[yellow](travel_schema.py) | sql/places_coordinates.sql is not applied, places are selected without coordinates:[/yellow] {e}")
+        return query(place_columns(*extra))